@@ -5,23 +5,38 @@ import json
 import sys
 import types
 from collections import defaultdict
-from contextlib import contextmanager
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, suppress
 from datetime import datetime, timedelta
-from typing import TYPE_CHECKING, Any
+from typing import TYPE_CHECKING, Any, Self, cast
 
 import click
+import httpx
 import minify_html
 import typer.cli
 from fastapi.params import Depends, Header
 from rich.console import Console
 from rich.table import Table
+from sqlalchemy import func, insert, true
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, joinedload
-
-from app import aws, mail, main, models, util
-from app.db import get_db, handle_skipped_award, rollback_on_error
+from sqlmodel import col
+
+import app.utils.statistics as statistics_utils
+from app import aws, mail, main, models, sources, storage, util
+from app.db import (
+    batch_engine,
+    get_db,
+    handle_skipped_award,
+    rollback_on_error,
+    use_batch_engine,
+    violates_unique_constraint,
+)
 from app.exceptions import SkippedAwardError, SourceFormatError
 from app.settings import app_settings
 from app.sources import colombia as data_access
+from app.utils.cache import TTLCache
 
 if TYPE_CHECKING:
     from fastapi.routing import APIRoute
@@ -44,16 +59,109 @@ dev = typer.Typer()
 app.add_typer(dev, name="dev", help="Commands for maintainers of Credere.")
 
 
+class _RemoteLookup:
+    """
+    Memoize the data source lookups for an award entry, including any :exc:`~app.exceptions.SkippedAwardError`.
+
+    The lookups can be performed ahead of time in a worker thread (see :meth:`prefetch`), and then replayed in the
+    same order as in a serial run, so that the same award is skipped for the same reason.
+
+    If ``remote_contracts`` is provided (see :func:`app.sources.colombia.get_remote_contracts`), the award lookup
+    uses it instead of requesting the award's contracts. If a ``borrower_cache`` is provided, borrower lookups are
+    shared across award entries with the same supplier.
+    """
+
+    def __init__(
+        self,
+        award_entry: dict[str, str],
+        borrower_cache: TTLCache | None = None,
+        remote_contracts: dict[str, tuple[list[dict[str, str]], str]] | None = None,
+    ):
+        self.award_entry = award_entry
+        self.borrower_cache = borrower_cache
+        self.remote_contracts = remote_contracts
+        self._results: dict[str, tuple[Any, SkippedAwardError | None]] = {}
+
+    def _get(self, key: str, function: Callable[..., Any], *args: Any) -> Any:
+        if key not in self._results:
+            try:
+                self._results[key] = (function(*args), None)
+            except SkippedAwardError as e:
+                self._results[key] = (None, e)
+
+        value, error = self._results[key]
+        if error:
+            raise error
+        return value
+
+    def award(self) -> dict[str, str | None]:
+        return cast("dict[str, str | None]", self._get("award", self._get_award))
+
+    def _get_award(self) -> dict[str, str | None]:
+        return data_access.get_award(self.award_entry, remote_contracts=self.remote_contracts)
+
+    def supplier_id(self) -> str:
+        return cast("str", self._get("supplier_id", data_access.get_supplier_id, self.award_entry))
+
+    def borrower(self, borrower_identifier: str, supplier_id: str) -> dict[str, str]:
+        return cast("dict[str, str]", self._get("borrower", self._get_borrower, borrower_identifier, supplier_id))
+
+    def _get_borrower(self, borrower_identifier: str, supplier_id: str) -> dict[str, str]:
+        if self.borrower_cache is None:
+            return data_access.get_borrower(borrower_identifier, supplier_id, self.award_entry)
+
+        # The borrower URL depends on these values, only. (borrower_identifier is derived from supplier_id.)
+        key = (supplier_id, self.award_entry.get("codigoproveedor", ""))
+        try:
+            return cast(
+                "dict[str, str]",
+                self.borrower_cache.get(
+                    key, data_access.get_borrower, borrower_identifier, supplier_id, self.award_entry
+                ),
+            )
+        except SkippedAwardError as e:
+            # Raise a new exception, so that each award's EventLog entry has its own traceback.
+            raise SkippedAwardError(e.message, url=e.url, data=e.data) from None
+
+    def prefetch(self, existing: set[str] | frozenset[str] = frozenset()) -> Self:
+        """
+        Perform the lookups that :func:`_create_application` would perform, stopping at the first skip.
+
+        :param existing: The source contract IDs of existing awards, which :func:`_create_application` skips.
+        """
+        with suppress(SkippedAwardError):
+            if self.award()["source_contract_id"] in existing:
+                return self
+            supplier_id = self.supplier_id()
+            self.borrower(util.get_secret_hash(supplier_id), supplier_id)
+        return self
+
+
 # Called by fetch-award* commands.
-def _create_application(session: Session, award_entry: dict[str, str]) -> None:
+def _create_application(session: Session, award_entry: dict[str, str], lookup: _RemoteLookup | None = None) -> None:
+    if lookup is None:
+        lookup = _RemoteLookup(award_entry)
+
+    # Another process, like another backfill shard, can create the same borrower after this process checks whether it
+    # exists. If so, try again (the lookups are memoized), so that the existing borrower is updated. (If it creates the
+    # same award, the award is skipped by create_award_from_data_source().)
+    try:
+        _create_application_once(session, award_entry, lookup)
+    except IntegrityError as e:
+        if not violates_unique_constraint(e, "borrower_borrower_identifier_key"):
+            raise
+        _create_application_once(session, award_entry, lookup)
+
+
+def _create_application_once(session: Session, award_entry: dict[str, str], lookup: _RemoteLookup) -> None:
     with handle_skipped_award(session, "Error creating application"):
         # Create the award. If it exists, skip this award.
-        award = util.create_award_from_data_source(session, award_entry)
+        award = util.create_award_from_data_source(session, award_entry, data=lookup.award())
 
         # Create a new borrower or update an existing borrower based on the entry data.
-        supplier_id = data_access.get_supplier_id(award_entry)
+        supplier_id = lookup.supplier_id()
         borrower_identifier = util.get_secret_hash(supplier_id)
-        data = data_access.get_borrower(borrower_identifier, supplier_id, award_entry)
+        data = lookup.borrower(borrower_identifier, supplier_id)
         if borrower := models.Borrower.first_by(session, "borrower_identifier", borrower_identifier):
             if borrower.status == models.BorrowerStatus.DECLINE_OPPORTUNITIES:
                 raise SkippedAwardError(
@@ -94,10 +202,125 @@ def _create_application(session: Session, award_entry: dict[str, str]) -> None:
         session.commit()
 
 
+def _init_backfill_worker() -> None:
+    # Don't share the parent's database connections or HTTP connections with the forked worker.
+    # sqlalchemy2-stubs predates the close argument.
+    batch_engine.dispose(close=False)  # type: ignore[call-arg]
+    sources.client = sources.create_client()
+
+
+def _backfill_shard(from_date: datetime, until_date: datetime, concurrency: int) -> int:
+    return _fetch_awards(_create_borrower_cache(), from_date, until_date, concurrency=concurrency)
+
+
+def _fetch_page(
+    index: int, from_date: datetime | None, until_date: datetime | None, cursor: tuple[str | None, str] | None
+) -> tuple[httpx.Response, list[dict[str, str]], dict[str, tuple[list[dict[str, str]], str]]]:
+    awards_response = data_access.get_new_awards(index, from_date, until_date, cursor)
+    awards_response_json = util.loads(awards_response)
+    return awards_response, awards_response_json, data_access.get_remote_contracts(awards_response_json)
+
+
+def _existing_source_contract_ids(
+    session: Session, remote_contracts: dict[str, tuple[list[dict[str, str]], str]]
+) -> set[str]:
+    source_contract_ids = {
+        remote_contract["id_contrato"]
+        for contracts, _url in remote_contracts.values()
+        for remote_contract in contracts
+        if remote_contract.get("id_contrato")
+    }
+    if not source_contract_ids:
+        return set()
+    return {
+        source_contract_id
+        for (source_contract_id,) in session.query(models.Award.source_contract_id).filter(
+            col(models.Award.source_contract_id).in_(source_contract_ids)
+        )
+    }
+
+
+def _create_borrower_cache() -> TTLCache:
+    return TTLCache(
+        app_settings.secop_borrower_cache_size,
+        app_settings.secop_borrower_cache_ttl,
+        cached_exceptions=(SkippedAwardError,),
+    )
+
+
+# Called by fetch-awards and backfill commands.
+def _fetch_awards(
+    borrower_cache: TTLCache,
+    from_date: datetime | None,
+    until_date: datetime | None,
+    *,
+    concurrency: int = 1,
+    resume: bool = False,
+) -> int:
+    with contextmanager(get_db)() as session, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        run = models.IngestionRun.incomplete(session) if resume else None
+        if run is None:
+            if from_date is None:
+                from_date = models.IngestionRun.last_watermark(session)
+            # Fix the window on a fresh database, in case the run is resumed later.
+            if from_date is None:
+                from_date = datetime.now() - timedelta(days=app_settings.secop_default_days_from_ultima_actualizacion)
+            run = models.IngestionRun.create(session, from_date=from_date, until_date=until_date)
+            session.commit()
+
+        from_date = run.from_date
+        until_date = run.until_date
+        index = run.last_page + 1
+        cursor = cast("tuple[str | None, str]", tuple(run.cursor)) if run.cursor else None
+        awards_response, awards_response_json, remote_contracts = _fetch_page(index, from_date, until_date, cursor)
+
+        total = 0
+        while awards_response_json:
+            total += len(awards_response_json)
+            cursor = data_access.get_cursor(awards_response_json)
+
+            # Fetch the next page and its remote contracts while this page's awards are written.
+            if concurrency > 1:
+                next_page = executor.submit(_fetch_page, index + 1, from_date, until_date, cursor)
+
+            lookups = [_RemoteLookup(entry, borrower_cache, remote_contracts) for entry in awards_response_json]
+            if concurrency > 1:
+                # Don't prefetch the borrowers of awards that already exist (found with one query).
+                existing = _existing_source_contract_ids(session, remote_contracts)
+                prefetched = [executor.submit(lookup.prefetch, existing) for lookup in lookups]
+
+            for i, entry in enumerate(awards_response_json):
+                if not all(key in entry for key in ("id_del_portafolio", "nit_del_proveedor_adjudicado")):
+                    raise SourceFormatError(
+                        "Source contract is missing required fields:"
+                        f" url={awards_response.url}, data={awards_response_json}"
+                    )
+                _create_application(session, entry, prefetched[i].result() if concurrency > 1 else lookups[i])
+
+            run.checkpoint(session, index, awards_response_json, cursor)
+            session.commit()
+
+            index += 1
+            if concurrency > 1:
+                awards_response, awards_response_json, remote_contracts = next_page.result()
+            else:
+                awards_response, awards_response_json, remote_contracts = _fetch_page(
+                    index, from_date, until_date, cursor
+                )
+
+        run.completed_at = datetime.utcnow()
+        session.commit()
+
+    return total
+
+
 @app.command()
 def fetch_awards(
+    *,
     from_date: datetime = typer.Option(default=None, formats=["%Y-%m-%d"]),
     until_date: datetime = typer.Option(default=None, formats=["%Y-%m-%d"]),
+    concurrency: int = typer.Option(default=1, min=1, help="Number of worker threads for data source requests."),
+    resume: bool = typer.Option(default=False, help="Resume the most recent run, if it didn't complete."),
 ) -> None:
     """
     Fetch new awards from the date of the most recently updated award, or in the selected period.
@@ -109,39 +332,92 @@ def fetch_awards(
        Otherwise, create or update the borrower.
     -  If the application already exists, skip the award.
        Otherwise, create a PENDING application and email an invitation to the borrower.
+
+    If --concurrency is greater than 1, the next page and its contracts are fetched and the contract and borrower
+    lookups for a page's awards are performed in worker threads, while awards are written to the database one at a
+    time, in order. Borrowers aren't looked up for awards that already exist.
+
+    The contracts for a page's awards are retrieved in batches. Borrower lookups, including those that cause an award
+    to be skipped, are cached for the duration of the run.
+
+    The run is checkpointed after each page. If --resume is set and the most recent run (without --from-date and
+    --until-date) didn't complete, it continues from the page after its last checkpoint, with the same period.
     """
     if bool(from_date) ^ bool(until_date):
         raise click.UsageError("--from-date and --until-date must either be both set or both not set.")
     if from_date and until_date and from_date > until_date:
         raise click.UsageError("--from-date must be earlier than --until-date.")
+    if resume and from_date:
+        raise click.UsageError("--resume can't be combined with --from-date and --until-date.")
 
-    with contextmanager(get_db)() as session:
-        if from_date is None:
-            # Mypy considers this unreachable, because the annotation is typer.Option, without None.
-            from_date = models.Award.last_updated(session)  # type: ignore[unreachable]
+    borrower_cache = _create_borrower_cache()
+    total = _fetch_awards(borrower_cache, from_date, until_date, concurrency=concurrency, resume=resume)
 
-        index = 0
-        awards_response = data_access.get_new_awards(index, from_date, until_date)
-        awards_response_json = util.loads(awards_response)
+    if not state["quiet"]:
+        print(f"Fetched {total} contracts")
+        print(f"Borrower lookups: {borrower_cache.hits} cached, {borrower_cache.misses} requested")
 
-        total = 0
-        while awards_response_json:
-            total += len(awards_response_json)
 
-            for entry in awards_response_json:
-                if not all(key in entry for key in ("id_del_portafolio", "nit_del_proveedor_adjudicado")):
-                    raise SourceFormatError(
-                        "Source contract is missing required fields:"
-                        f" url={awards_response.url}, data={awards_response_json}"
-                    )
-                _create_application(session, entry)
+@app.command()
+def backfill(
+    *,
+    from_date: datetime = typer.Option(formats=["%Y-%m-%d"]),
+    until_date: datetime = typer.Option(formats=["%Y-%m-%d"]),
+    shards: int = typer.Option(default=4, min=1, help="Number of periods into which to split the selected period."),
+    processes: int = typer.Option(default=None, min=1, help="Number of worker processes. [default: --shards]"),
+    concurrency: int = typer.Option(default=1, min=1, help="Number of worker threads per process."),
+) -> None:
+    """
+    Fetch awards in the selected period, like fetch-awards, splitting the period into shards that are processed by
+    worker processes in parallel.
 
-            index += 1
-            awards_response = data_access.get_new_awards(index, from_date, until_date)
-            awards_response_json = util.loads(awards_response)
+    Each shard is a separate fetch-awards run, with its own database session and HTTP client. Once all shards are
+    processed, report the number of awards and applications created, and the number of awards skipped per reason.
+    """
+    if from_date >= until_date:
+        raise click.UsageError("--from-date must be earlier than --until-date.")
+
+    step = (until_date - from_date) / shards
+    windows = [
+        (from_date + step * i, from_date + step * (i + 1) if i < shards - 1 else until_date) for i in range(shards)
+    ]
+
+    # Timestamps default to the time at which the module was imported, so compare IDs, instead.
+    summarized = (models.Award, models.Application, models.EventLog)
+    with contextmanager(get_db)() as session:
+        last_ids = {model: session.query(func.coalesce(func.max(model.id), 0)).scalar() for model in summarized}
+
+    total = 0
+    with ProcessPoolExecutor(max_workers=processes or shards, initializer=_init_backfill_worker) as executor:
+        futures = {executor.submit(_backfill_shard, start, end, concurrency): (start, end) for start, end in windows}
+        for i, future in enumerate(as_completed(futures), 1):
+            start, end = futures[future]
+            fetched = future.result()
+            total += fetched
+            if not state["quiet"]:
+                print(
+                    f"[{i}/{shards}] Fetched {fetched} contracts from {start:%Y-%m-%d %H:%M} to {end:%Y-%m-%d %H:%M}"
+                )
+
+    with contextmanager(get_db)() as session:
+        awards = session.query(models.Award).filter(models.Award.id > last_ids[models.Award]).count()
+        applications = (
+            session.query(models.Application).filter(models.Application.id > last_ids[models.Application]).count()
+        )
+        skipped = (
+            session.query(models.EventLog.message, func.count(models.EventLog.id))
+            .filter(models.EventLog.id > last_ids[models.EventLog], models.EventLog.category == "SKIPPED_AWARD")
+            .group_by(models.EventLog.message)
+            .order_by(func.count(models.EventLog.id).desc(), models.EventLog.message)
+            .all()
+        )
 
-        if not state["quiet"]:
-            print(f"Fetched {total} contracts")
+    if not state["quiet"]:
+        print(f"Fetched {total} contracts")
+        print(f"Created {awards} awards and {applications} applications")
+        print(f"Skipped {sum(count for _, count in skipped)} awards")
+        for message, count in skipped:
+            print(f"  {count}\t{message}")
 
 
 @app.command()
@@ -186,17 +462,40 @@ def send_reminders() -> None:
 
 
 @app.command()
-def update_applications_to_lapsed() -> None:
-    """Lapse applications that have been waiting for the borrower to respond for some time."""
+def update_applications_to_lapsed(
+    batch_size: int = typer.Option(default=0, min=0, help="Number of applications to lapse per transaction, or 0."),
+) -> None:
+    """
+    Lapse applications that have been waiting for the borrower to respond for some time.
+
+    Applications are updated with one UPDATE statement, without loading them. If --batch-size is set, applications
+    are updated in batches of that size, each in its own transaction.
+    """
     with contextmanager(get_db)() as session, rollback_on_error(session):
-        for application in models.Application.lapseable(session).options(
-            joinedload(models.Application.borrower),
-            joinedload(models.Application.borrower_documents),
-        ):
-            application.status = models.ApplicationStatus.LAPSED
-            application.application_lapsed_at = datetime.utcnow()
+        while True:
+            ids = (
+                models.Application.lapseable(session)
+                .with_entities(models.Application.id)
+                .order_by(models.Application.id)
+            )
+            if batch_size:
+                ids = ids.limit(batch_size)
+
+            updated = (
+                session.query(models.Application)
+                .filter(col(models.Application.id).in_(ids.scalar_subquery()))
+                .update(
+                    {
+                        models.Application.status: models.ApplicationStatus.LAPSED,
+                        models.Application.application_lapsed_at: datetime.utcnow(),
+                    },
+                    synchronize_session=False,
+                )
+            )
+            session.commit()
 
-        session.commit()
+            if not batch_size or updated < batch_size:
+                break
 
 
 @app.command()
@@ -204,18 +503,21 @@ def sla_overdue_applications() -> None:
     """Send reminders to lenders and OCP about overdue applications."""
     with contextmanager(get_db)() as session:
         overdue_lenders: dict[int, Any] = defaultdict(lambda: {"count": 0})
-        for application in session.query(models.Application).filter(
-            models.Application.status == models.ApplicationStatus.STARTED
-        ):
-            with rollback_on_error(session):
-                days_passed = application.days_waiting_for_lender(session)
+        for application_id, lender_id, days_passed, sla_days in models.Application.days_waiting_for_lenders(
+            session
+        ).all():
+            # The lender has no SLA.
+            if sla_days is None:
+                continue
 
+            with rollback_on_error(session):
                 # Email lenders if the SLA days are dwindling.
-                if days_passed > application.lender.sla_days * app_settings.progress_to_remind_started_applications:
-                    overdue_lenders[application.lender.id]["count"] += 1
+                if days_passed > sla_days * app_settings.progress_to_remind_started_applications:
+                    overdue_lenders[lender_id]["count"] += 1
 
                     # Email administrators if the SLA days are exceeded.
-                    if days_passed > application.lender.sla_days:
+                    if days_passed > sla_days:
+                        application = models.Application.get(session, application_id)
                         application.overdued_at = datetime.now(application.created_at.tzinfo)
 
                         mail.send(session, aws.ses_client, models.MessageType.OVERDUE_APPLICATION, application)
@@ -233,38 +535,162 @@ def sla_overdue_applications() -> None:
 
 
 @app.command()
-def remove_dated_application_data() -> None:
+def remove_dated_application_data(
+    batch_size: int = typer.Option(default=1000, min=1, help="Number of applications to archive per transaction."),
+) -> None:
     """
     Clear personal data and delete borrower documents from applications that have been in a final state for some time.
 
     If the borrower has no other active applications, clear the borrower's personal data.
+
+    Applications are archived in batches, in order of ID, each in its own transaction. Each batch is archived with a
+    few UPDATE and DELETE statements, without loading the applications or their documents.
     """
+    last_id: int = 0
     with contextmanager(get_db)() as session, rollback_on_error(session):
-        for application in models.Application.archivable(session).options(
-            joinedload(models.Application.borrower),
-            joinedload(models.Application.borrower_documents),
-        ):
-            application.award.previous = True
-            application.primary_email = ""
-            application.archived_at = datetime.utcnow()
+        while True:
+            # The IDs must be selected first, because archived applications are no longer archivable. The next batch
+            # starts after the last ID, so that earlier applications aren't scanned again.
+            ids = [
+                cast("int", application_id)
+                for (application_id,) in models.Application.archivable(session)
+                .with_entities(models.Application.id)
+                .filter(col(models.Application.id) > last_id)
+                .order_by(models.Application.id)
+                .limit(batch_size)
+            ]
+            if not ids:
+                break
+
+            session.query(models.Award).filter(
+                col(models.Award.id).in_(
+                    session.query(models.Application.award_id)
+                    .filter(col(models.Application.id).in_(ids))
+                    .scalar_subquery()
+                )
+            ).update({models.Award.previous: True}, synchronize_session=False)
+
+            storage.remove_references(
+                session,
+                dict(
+                    session.query(models.BorrowerDocument.storage_key, func.count())
+                    .filter(
+                        col(models.BorrowerDocument.application_id).in_(ids),
+                        col(models.BorrowerDocument.storage_key).isnot(None),
+                    )
+                    .group_by(models.BorrowerDocument.storage_key)
+                    .all()
+                ),
+            )
 
-            for document in application.borrower_documents:
-                session.delete(document)
+            session.query(models.BorrowerDocument).filter(col(models.BorrowerDocument.application_id).in_(ids)).delete(
+                synchronize_session=False
+            )
 
-            # Clear the associated borrower's personal data if they have no other active applications.
-            if not session.query(
-                models.Application.unarchived(session)
+            session.query(models.Application).filter(col(models.Application.id).in_(ids)).update(
+                {models.Application.primary_email: "", models.Application.archived_at: datetime.utcnow()},
+                synchronize_session=False,
+            )
+
+            # Clear the associated borrowers' personal data if they have no other active applications.
+            session.query(models.Borrower).filter(
+                col(models.Borrower.id).in_(
+                    session.query(models.Application.borrower_id)
+                    .filter(col(models.Application.id).in_(ids))
+                    .scalar_subquery()
+                ),
+                ~models.Application.unarchived(session)
+                .filter(models.Application.borrower_id == models.Borrower.id)
+                .exists(),
+            ).update(
+                {
+                    models.Borrower.legal_name: "",
+                    models.Borrower.email: "",
+                    models.Borrower.address: "",
+                    models.Borrower.legal_identifier: "",
+                    models.Borrower.source_data: {},
+                },
+                synchronize_session=False,
+            )
+
+            session.commit()
+
+            # Contents are shared by documents, and are deleted only if no documents reference them.
+            storage.delete_unreferenced_contents(session)
+
+            if len(ids) < batch_size:
+                break
+            last_id = ids[-1]
+
+
+@app.command()
+def move_documents_to_storage(
+    batch_size: int = typer.Option(default=100, min=1, help="Number of documents to move per transaction."),
+) -> None:
+    """
+    Move the contents of borrower documents from the borrower_document.file column to the storage set by
+    DOCUMENT_STORAGE, storing identical contents once.
+
+    Documents are moved in batches, in order of ID, each in its own transaction. The command can be interrupted and run
+    again.
+    """
+    with contextmanager(get_db)() as session, rollback_on_error(session):
+        while True:
+            ids = [
+                document_id
+                for (document_id,) in session.query(models.BorrowerDocument.id)
                 .filter(
-                    models.Application.borrower_id == application.borrower_id,
-                    models.Application.id != application.id,
+                    col(models.BorrowerDocument.storage_key).is_(None),
+                    col(models.BorrowerDocument.file).isnot(None),
+                )
+                .order_by(models.BorrowerDocument.id)
+                .limit(batch_size)
+            ]
+            if not ids:
+                break
+
+            # Read one document's contents at a time, to limit memory use.
+            for document_id in ids:
+                query = session.query(models.BorrowerDocument).filter(models.BorrowerDocument.id == document_id)
+                file = storage.HashedFile.from_bytes(query.with_entities(models.BorrowerDocument.file).scalar())
+                query.update(
+                    {
+                        models.BorrowerDocument.storage_key: storage.add_content(session, file),
+                        models.BorrowerDocument.file: None,
+                    },
+                    synchronize_session=False,
                 )
-                .exists()
-            ).scalar():
-                application.borrower.legal_name = ""
-                application.borrower.email = ""
-                application.borrower.address = ""
-                application.borrower.legal_identifier = ""
-                application.borrower.source_data = {}
+
+            session.commit()
+
+            if not state["quiet"]:
+                print(f"Moved {len(ids)} documents (up to ID {ids[-1]})")
+
+
+@app.command()
+def update_statistics() -> None:
+    """
+    Snapshot the components of the general statistics for each day and lender, up to yesterday.
+
+    All snapshots are replaced, so that they reflect the applications' current state. If STATISTICS_SNAPSHOTS is set,
+    the statistics endpoints use the snapshots. Run this command daily.
+    """
+    with contextmanager(get_db)() as session, rollback_on_error(session):
+        day = func.date(models.Application.created_at)
+        columns = statistics_utils.get_general_statistics_columns(true())
+        query = (
+            session.query(day, models.Application.lender_id, *columns, func.now())
+            .outerjoin(models.CreditProduct, models.CreditProduct.id == models.Application.credit_product_id)
+            .filter(col(models.Application.created_at) < func.current_date())
+            .group_by(day, models.Application.lender_id)
+        )
+
+        session.query(models.StatisticSnapshot).delete(synchronize_session=False)
+        session.execute(
+            insert(models.StatisticSnapshot).from_select(
+                ["day", "lender_id", *(column.name for column in columns), "updated_at"], query.statement
+            )
+        )
 
         session.commit()
 
@@ -356,6 +782,7 @@ def cli_input_json(name: str, file: typer.FileText) -> None:
 # https://typer.tiangolo.com/tutorial/commands/callback/
 @app.callback()
 def cli(*, quiet: bool = typer.Option(False, "--quiet", "-q")) -> None:  # noqa: FBT003 # false positive
+    use_batch_engine()
     if quiet:
         state["quiet"] = True
 
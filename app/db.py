@@ -1,18 +1,79 @@
+import logging
 import traceback
 from collections.abc import Generator
 from contextlib import contextmanager
 
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError, OperationalError
 from sqlalchemy.orm import Session, sessionmaker
 
 from app import models
 from app.exceptions import SkippedAwardError
 from app.settings import app_settings
 
+logger = logging.getLogger(__name__)
+
+
+def _create_engine(url: str, *, pool_size: int, max_overflow: int, statement_timeout: int) -> Engine:
+    """
+    Create an engine with the pool settings.
+
+    :param url: The PostgreSQL connection string.
+    :param pool_size: The number of connections to keep open.
+    :param max_overflow: The number of connections to open beyond ``pool_size``.
+    :param statement_timeout: The number of milliseconds after which to cancel a statement, or 0 for no limit.
+    """
+    # https://docs.sqlalchemy.org/en/20/core/engines.html#sqlalchemy.create_engine
+    return create_engine(
+        url,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=app_settings.database_pool_timeout,
+        pool_recycle=app_settings.database_pool_recycle,
+        pool_pre_ping=app_settings.database_pool_pre_ping,
+        # https://www.postgresql.org/docs/current/runtime-config-client.html#GUC-STATEMENT-TIMEOUT
+        connect_args={"options": f"-c statement_timeout={statement_timeout}"} if statement_timeout else {},
+    )
+
+
+#: The engine of the web application.
+engine = _create_engine(
+    app_settings.test_database_url or app_settings.database_url,
+    pool_size=app_settings.database_pool_size,
+    max_overflow=app_settings.database_max_overflow,
+    statement_timeout=app_settings.database_statement_timeout,
+)
+#: The engine of commands, bound by :func:`app.db.use_batch_engine`, so that commands run by cron jobs have their own
+#: limits, and don't compete with the web application for its connections.
+batch_engine = _create_engine(
+    app_settings.test_database_url or app_settings.database_url,
+    pool_size=app_settings.batch_database_pool_size,
+    max_overflow=app_settings.batch_database_max_overflow,
+    statement_timeout=app_settings.batch_database_statement_timeout,
+)
+#: The engine of the read-only replica, or of the primary if
+#: :attr:`READ_DATABASE_URL<app.settings.Settings.read_database_url>` is not set.
+read_engine = (
+    _create_engine(
+        app_settings.read_database_url,
+        pool_size=app_settings.database_pool_size,
+        max_overflow=app_settings.database_max_overflow,
+        statement_timeout=app_settings.database_statement_timeout,
+    )
+    if app_settings.read_database_url and not app_settings.test_database_url
+    else engine
+)
+
 # https://docs.sqlalchemy.org/en/20/orm/session_basics.html#using-a-sessionmaker
-engine = create_engine(app_settings.test_database_url or app_settings.database_url)
 # https://docs.sqlalchemy.org/en/20/orm/session_api.html#sqlalchemy.orm.Session.__init__
 SessionLocal = sessionmaker(expire_on_commit=False, bind=engine)
+ReadSessionLocal = sessionmaker(expire_on_commit=False, bind=read_engine)
+
+
+def use_batch_engine() -> None:
+    """Bind new sessions to the engine of commands."""
+    SessionLocal.configure(bind=batch_engine)
 
 
 @contextmanager
@@ -49,8 +110,33 @@ def handle_skipped_award(session: Session, msg: str) -> Generator[None, None, No
         raise
 
 
+def violates_unique_constraint(error: IntegrityError, name: str) -> bool:
+    """Return whether the error is a violation of the unique constraint or unique index with the given name."""
+    # https://www.postgresql.org/docs/current/errcodes-appendix.html
+    return getattr(error.orig, "pgcode", None) == "23505" and error.orig.diag.constraint_name == name
+
+
 # This is a FastAPI dependency.
 def get_db() -> Generator[Session, None, None]:
     """Get a SQLAlchemy session."""
     with SessionLocal() as session:
         yield session
+
+
+# This is a FastAPI dependency.
+def get_read_db() -> Generator[Session, None, None]:
+    """
+    Get a SQLAlchemy session on the read-only replica, for routes that only read, like reports and lists.
+
+    If the replica can't be connected to, get a session on the primary, instead.
+    """
+    session = ReadSessionLocal()
+    if read_engine is not engine:
+        try:
+            session.connection()
+        except OperationalError:
+            logger.warning("Read replica is unavailable, falling back to primary", exc_info=True)
+            session.close()
+            session = SessionLocal()
+    with session:
+        yield session
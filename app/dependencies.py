@@ -49,7 +49,7 @@ async def get_current_user(
         ) from None
 
 
-async def get_user(
+def get_user(
     username: Annotated[str, Depends(get_current_user)], session: Annotated[Session, Depends(get_db)]
 ) -> models.User:
     """
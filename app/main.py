@@ -1,3 +1,7 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from anyio import to_thread
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -6,7 +10,16 @@ from app.i18n import _
 from app.routers import applications, downloads, guest, lenders, statistics, users
 from app.settings import app_settings
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Synchronous routes and dependencies, and the iterators of streaming responses, run in AnyIO's default thread
+    # pool.
+    to_thread.current_default_thread_limiter().total_tokens = app_settings.thread_pool_size
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
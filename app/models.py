@@ -1,12 +1,13 @@
 import sys
-from datetime import UTC, datetime, timedelta, tzinfo
+from collections.abc import Sequence
+from datetime import UTC, date, datetime, timedelta, tzinfo
 from decimal import Decimal
 from enum import StrEnum
 from typing import Any, Self
 
-from sqlalchemy import Boolean, Column, DateTime, and_, desc, or_, select
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, and_, cast, desc, or_, select
 from sqlalchemy.dialects.postgresql import JSON
-from sqlalchemy.orm import Query, Session, joinedload
+from sqlalchemy.orm import Query, Session, declared_attr, deferred, joinedload, selectinload
 from sqlalchemy.sql import ColumnElement, Select, func
 from sqlalchemy.sql.expression import nulls_last, true
 from sqlmodel import Field, Relationship, SQLModel, col
@@ -26,14 +27,49 @@ def get_missing_data_keys(data: dict[str, Any]) -> dict[str, bool]:
     return {key: value == "" or value is None for key, value in data.items()}
 
 
-def get_order_by(sort_field: str, sort_order: str, model: type[SQLModel] | None = None) -> Any:
+def get_sort_column(sort_field: str, model: type[SQLModel] | None = None) -> Any:
     if "." in sort_field:
         model_name, field_name = sort_field.split(".", 1)
         # credere-frontend doesn't use any camelcase models, so capitalize() works.
-        column = getattr(getattr(sys.modules[__name__], model_name.capitalize()), field_name)
-    else:
-        column = getattr(model, sort_field)
-    return getattr(col(column), sort_order)()
+        return getattr(getattr(sys.modules[__name__], model_name.capitalize()), field_name)
+    return getattr(model, sort_field)
+
+
+def get_order_by(sort_field: str, sort_order: str, model: type[SQLModel] | None = None) -> Any:
+    return getattr(col(get_sort_column(sort_field, model)), sort_order)()
+
+
+def get_sort_value(instance: SQLModel, sort_field: str) -> Any:
+    """Return the value of the sort field for the instance, following a relationship if the field is qualified."""
+    if "." in sort_field:
+        model_name, field_name = sort_field.split(".", 1)
+        if model_name != instance.__tablename__:
+            instance = getattr(instance, model_name)
+        return getattr(instance, field_name)
+    return getattr(instance, sort_field)
+
+
+def after_keyset(column: Any, id_column: Any, sort_order: str, value: Any, id_value: int) -> ColumnElement[Boolean]:
+    """
+    Return a condition matching the rows that sort after the row with the value and ID, if sorting by the column then
+    by ID, in the same order. Nulls sort last in ascending order and first in descending order, like in PostgreSQL.
+
+    :param column: The sort column.
+    :param id_column: The ID column, to break ties.
+    :param sort_order: "asc" or "desc".
+    :param value: The sort column's value in the last row of the previous page.
+    :param id_value: The ID of the last row of the previous page.
+    :return: The condition.
+    """
+    column = col(column)
+    id_column = col(id_column)
+    if sort_order == "asc":
+        if value is None:
+            return and_(column.is_(None), id_column > id_value)
+        return or_(column > value, and_(column == value, id_column > id_value), column.is_(None))
+    if value is None:
+        return or_(and_(column.is_(None), id_column < id_value), column.isnot(None))
+    return or_(column < value, and_(column == value, id_column < id_value))
 
 
 # https://github.com/tiangolo/sqlmodel/issues/254
@@ -481,7 +517,7 @@ class AwardBase(SQLModel):
     # From data source
 
     #: The ID of the award (contract) in the data source.
-    source_contract_id: str = Field(default="", index=True)
+    source_contract_id: str = Field(default="", unique=True, index=True)
     title: str = Field(default="")
     description: str = Field(default="")
     award_date: datetime | None
@@ -544,13 +580,21 @@ class Award(AwardBase, ActiveRecordMixin, table=True):
 
     @classmethod
     def last_updated(cls, session: Session) -> datetime | None:
-        """Return the most recent ``source_last_updated_at`` value."""
+        """
+        Return the most recent ``source_last_updated_at`` value.
+
+        The query uses the ``ix_award_source_last_updated_at`` index.
+        """
         obj: Self | None = session.query(cls).order_by(nulls_last(desc(cls.source_last_updated_at))).first()
         if obj:
             return obj.source_last_updated_at
         return None
 
 
+# Match the ORDER BY clause in Award.last_updated, to read one row from the index.
+Index("ix_award_source_last_updated_at", nulls_last(desc(col(Award.source_last_updated_at))))
+
+
 class ApplicationBase(SQLModel):
     #: The secure identifier for the application, for passwordless login.
     uuid: str = Field(unique=True)
@@ -816,22 +860,38 @@ class Application(ApplicationPrivate, ActiveRecordMixin, table=True):
         sort_order: str,
         lender_id: int | None = None,
         search_value: str | None = None,
+        after: tuple[Any, int] | None = None,
+        columns: Sequence[Any] = (),
     ) -> "Query[Self]":
+        """
+        Return a query for :meth:`~app.models.Application.submitted` applications, sorted by the sort field then by ID.
+
+        :param after: The sort field's value and the ID of the last application of the previous page, if paginating by
+            keyset (see :func:`app.models.get_sort_value`).
+        :param columns: The columns to select, from the application, award, borrower, credit product and lender. If
+            empty, select the applications and load their relations.
+        """
+        sort_column = get_sort_column(sort_field, model=cls)
         query = (
             cls.submitted(session)
             .join(Award)
             .join(Borrower, cls.borrower_id == Borrower.id)
             .join(CreditProduct)
             .join(Lender)
-            .options(
+            .order_by(getattr(col(sort_column), sort_order)(), getattr(col(cls.id), sort_order)())
+        )
+
+        if columns:
+            query = query.with_entities(*columns)
+        else:
+            query = query.options(
                 joinedload(cls.award),
                 joinedload(cls.borrower),
-                joinedload(cls.borrower_documents),
+                # A joined collection would require LIMIT to be applied in a subquery.
+                selectinload(cls.borrower_documents),
                 joinedload(cls.credit_product),
                 joinedload(cls.lender),
             )
-            .order_by(get_order_by(sort_field, sort_order, model=cls))
-        )
 
         if search_value:
             like = f"%{search_value}%"
@@ -850,6 +910,9 @@ class Application(ApplicationPrivate, ActiveRecordMixin, table=True):
                 col(cls.lender_id).isnot(None),
             )
 
+        if after:
+            query = query.filter(after_keyset(sort_column, cls.id, sort_order, *after))
+
         return query
 
     @classmethod
@@ -947,6 +1010,83 @@ class Application(ApplicationPrivate, ActiveRecordMixin, table=True):
 
         return round(days)
 
+    @classmethod
+    def days_waiting_for_lenders(cls, session: Session) -> "Query[tuple[int, int, int, int | None]]":
+        """
+        Return a query for the ID, lender ID, number of days waiting for the lender, and lender's SLA days of STARTED
+        applications.
+
+        The number of days is calculated like :meth:`~app.models.Application.days_waiting_for_lender`, in one query.
+        """
+
+        def days(end: Any, start: Any) -> Any:
+            # Like `timedelta.days`.
+            return func.floor(func.extract("epoch", end - start) / 86_400)
+
+        def actions(action_type: ApplicationActionType) -> Any:
+            return (
+                session.query(
+                    ApplicationAction.application_id,
+                    ApplicationAction.created_at,
+                    func.row_number()
+                    .over(
+                        partition_by=col(ApplicationAction.application_id),
+                        order_by=(col(ApplicationAction.created_at), col(ApplicationAction.id)),
+                    )
+                    .label("number"),
+                    func.count().over(partition_by=col(ApplicationAction.application_id)).label("total"),
+                )
+                .filter(ApplicationAction.type == action_type)
+                .subquery()
+            )
+
+        requests = actions(ApplicationActionType.FI_REQUEST_INFORMATION)
+        responses = actions(ApplicationActionType.MSME_UPLOAD_ADDITIONAL_DOCUMENT_COMPLETED)
+        first_request = requests.alias("first_request")
+        next_request = requests.alias("next_request")
+        request_totals = (
+            session.query(requests.c.application_id, requests.c.total).filter(requests.c.number == 1).subquery()
+        )
+
+        # Pair the k-th response with the k+1-th request. Like the Python method, stop at the last response before the
+        # penultimate request, or at the first response if there are fewer than three requests.
+        response_days = (
+            session.query(
+                responses.c.application_id,
+                func.sum(days(func.coalesce(next_request.c.created_at, func.now()), responses.c.created_at)).label(
+                    "days"
+                ),
+            )
+            .outerjoin(
+                next_request,
+                and_(
+                    next_request.c.application_id == responses.c.application_id,
+                    next_request.c.number == responses.c.number + 1,
+                ),
+            )
+            .outerjoin(request_totals, request_totals.c.application_id == responses.c.application_id)
+            .filter(responses.c.number <= func.greatest(1, func.coalesce(request_totals.c.total, 0) - 1))
+            .group_by(responses.c.application_id)
+            .subquery()
+        )
+
+        return (
+            session.query(
+                cls.id,
+                cls.lender_id,
+                cast(
+                    days(func.coalesce(first_request.c.created_at, func.now()), cls.lender_started_at)
+                    + func.coalesce(response_days.c.days, 0),
+                    Integer,
+                ).label("days_waiting"),
+                Lender.sla_days,
+            )
+            .join(Lender, Lender.id == cls.lender_id)
+            .outerjoin(first_request, and_(first_request.c.application_id == cls.id, first_request.c.number == 1))
+            .outerjoin(response_days, response_days.c.application_id == cls.id)
+            .filter(cls.status == ApplicationStatus.STARTED)
+        )
+
     def stage_as_rejected(self, lender_rejected_data: dict[str, Any]) -> None:
         """Assign fields related to marking the application as REJECTED."""
         self.status = ApplicationStatus.REJECTED
@@ -962,6 +1102,10 @@ class Application(ApplicationPrivate, ActiveRecordMixin, table=True):
         self.lender_approved_data = lender_approved_data
 
 
+# Read the applications created since the last statistic snapshot from the index.
+Index("ix_application_created_at", col(Application.created_at))
+
+
 class BorrowerDocumentBase(SQLModel):
     id: int | None = Field(default=None, primary_key=True)
     #: The type of document.
@@ -990,12 +1134,52 @@ class BorrowerDocumentBase(SQLModel):
 class BorrowerDocument(BorrowerDocumentBase, ActiveRecordMixin, table=True):
     __tablename__ = "borrower_document"
 
-    #: The content of the document.
-    file: bytes
+    #: The content of the document, if not yet moved to a :class:`~app.models.DocumentContent` by
+    #: :typer:`python-m-app-move-documents-to-storage`.
+    file: bytes | None = None
+    #: The key of the document's :class:`~app.models.DocumentContent`.
+    storage_key: str | None = Field(default=None, foreign_key="document_content.key", index=True)
 
     # Relationships
     application: Application = Relationship(back_populates="borrower_documents")
 
+    # Don't load documents' contents when listing or rendering applications, as documents can be large. Use
+    # ``undefer(BorrowerDocument.file)`` to load the contents with the document, or access the attribute to load it
+    # lazily.
+    @declared_attr
+    def __mapper_args__(cls) -> dict[str, Any]:  # noqa: N805
+        return {"properties": {"file": deferred(cls.__table__.c.file)}}  # type: ignore[attr-defined]
+
+
+class DocumentContent(SQLModel, ActiveRecordMixin, table=True):
+    """
+    The content of borrower documents, stored once per SHA-256 digest, and shared by the documents with that content.
+
+    .. seealso:: :mod:`app.storage`
+    """
+
+    __tablename__ = "document_content"
+
+    #: The SHA-256 hex digest of the content.
+    key: str = Field(primary_key=True)
+    #: The number of borrower documents with this content. The content is deleted when it drops to zero.
+    refcount: int = Field(default=0)
+    #: The content, if ``DOCUMENT_STORAGE`` was "database" when it was stored. Otherwise, it is in document storage.
+    content: bytes | None = None
+
+    # Timestamps
+    created_at: datetime = Field(
+        default=datetime.utcnow(), sa_column=Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    )
+    updated_at: datetime = Field(
+        default=datetime.utcnow(), sa_column=Column(DateTime(timezone=True), nullable=False, onupdate=func.now())
+    )
+
+    # Don't load the content when counting references.
+    @declared_attr
+    def __mapper_args__(cls) -> dict[str, Any]:  # noqa: N805
+        return {"properties": {"content": deferred(cls.__table__.c.content)}}  # type: ignore[attr-defined]
+
 
 class Message(SQLModel, ActiveRecordMixin, table=True):
     id: int | None = Field(default=None, primary_key=True)
@@ -1041,6 +1225,150 @@ class EventLog(SQLModel, ActiveRecordMixin, table=True):
     )
 
 
+class IngestionRun(SQLModel, ActiveRecordMixin, table=True):
+    """
+    A run of :typer:`python-m-app-fetch-awards`, which is checkpointed after each page of awards, so that it can be
+    resumed.
+    """
+
+    __tablename__ = "ingestion_run"
+
+    id: int | None = Field(default=None, primary_key=True)
+    #: The start of the window of awards to retrieve.
+    from_date: datetime | None
+    #: The end of the window of awards to retrieve, if set by the user.
+    until_date: datetime | None
+    #: The index of the last page of awards that was processed, or -1.
+    last_page: int = Field(default=-1)
+    #: The position after the last page of awards that was processed, if paginating by keyset.
+    #:
+    #: .. seealso:: :func:`app.sources.colombia.get_cursor`
+    cursor: list[str | None] | None = Field(default=None, sa_type=JSON)
+    #: The most recent ``fecha_de_ultima_publicaci`` of the awards that were processed.
+    watermark: datetime | None
+    #: The number of awards that were processed.
+    total: int = Field(default=0)
+    #: The time at which the last page of awards was processed.
+    completed_at: datetime | None = Field(sa_column=Column(DateTime(timezone=True)))
+
+    # Timestamps
+    created_at: datetime = Field(
+        default=datetime.utcnow(), sa_column=Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    )
+    updated_at: datetime = Field(
+        default=datetime.utcnow(), sa_column=Column(DateTime(timezone=True), nullable=False, onupdate=func.now())
+    )
+
+    @classmethod
+    def incomplete(cls, session: Session) -> Self | None:
+        """
+        Return the most recent run without a user-set window, if it didn't complete.
+
+        Runs with a user-set window, like backfill shards, are ignored.
+        """
+        run: Self | None = session.query(cls).filter(col(cls.until_date).is_(None)).order_by(desc(cls.id)).first()
+        if run and run.completed_at is None:
+            return run
+        return None
+
+    @classmethod
+    def last_watermark(cls, session: Session) -> datetime | None:
+        """
+        Return the most recent watermark of the completed runs without a user-set window, falling back to
+        :meth:`app.models.Award.last_updated`.
+
+        Pages are ordered by most recent first, so an incomplete run's watermark can be above unprocessed awards.
+        """
+        watermark: datetime | None = (
+            session.query(func.max(cls.watermark))
+            .filter(col(cls.until_date).is_(None), col(cls.completed_at).isnot(None))
+            .scalar()
+        )
+        if watermark:
+            return watermark
+        return Award.last_updated(session)
+
+    def checkpoint(
+        self, session: Session, page: int, entries: list[dict[str, Any]], cursor: tuple[str | None, str] | None
+    ) -> None:
+        """
+        Record that a page of awards was processed.
+
+        :param session: The database session.
+        :param page: The index of the page.
+        :param entries: The awards in the page.
+        :param cursor: The return value of :func:`app.sources.colombia.get_cursor` for the page.
+        """
+        values = [
+            datetime.fromisoformat(e["fecha_de_ultima_publicaci"])
+            for e in entries
+            if e.get("fecha_de_ultima_publicaci")
+        ]
+        if values and (self.watermark is None or max(values) > self.watermark):
+            self.watermark = max(values)
+        self.last_page = page
+        self.cursor = list(cursor) if cursor else None
+        self.total += len(entries)
+        session.add(self)
+
+
+class StatisticSnapshot(SQLModel, ActiveRecordMixin, table=True):
+    """
+    The components of :func:`app.utils.statistics.get_general_statistics` for the applications created on a day and
+    assigned to a lender (if any), as of the last run of :typer:`python-m-app-update-statistics`.
+
+    Averages are stored as sums and counts, so that snapshots can be summed across days and lenders.
+    """
+
+    __tablename__ = "statistic_snapshot"
+
+    id: int | None = Field(default=None, primary_key=True)
+    #: The day on which the applications were created.
+    day: date = Field(index=True)
+    lender_id: int | None = Field(foreign_key="lender.id")
+
+    #: The number of submitted applications.
+    received: int = Field(default=0)
+    #: The number of REJECTED applications.
+    rejected: int = Field(default=0)
+    #: The number of INFORMATION_REQUESTED applications.
+    waiting_for_information: int = Field(default=0)
+    #: The number of STARTED or INFORMATION_REQUESTED applications.
+    in_progress: int = Field(default=0)
+    #: The number of APPROVED applications.
+    credit_disbursed: int = Field(default=0)
+    #: The number of overdue applications.
+    overdue: int = Field(default=0)
+    #: The sum of the amounts requested.
+    amount_requested_sum: Decimal = Field(default=0, max_digits=20, decimal_places=2)
+    #: The number of amounts requested.
+    amount_requested_count: int = Field(default=0)
+    #: The sum of the repayment periods, in months, of submitted loan applications.
+    repayment_period_sum: int = Field(default=0)
+    #: The number of repayment periods of submitted loan applications.
+    repayment_period_count: int = Field(default=0)
+    #: The sum of the processing times, in days, of APPROVED or REJECTED applications.
+    processing_time_sum: int = Field(default=0)
+    #: The number of processing times of APPROVED or REJECTED applications.
+    processing_time_count: int = Field(default=0)
+    #: The number of accepted applications.
+    accepted: int = Field(default=0)
+
+    # Timestamps
+    created_at: datetime = Field(
+        default=datetime.utcnow(), sa_column=Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    )
+    updated_at: datetime = Field(
+        default=datetime.utcnow(), sa_column=Column(DateTime(timezone=True), nullable=False, onupdate=func.now())
+    )
+
+    @classmethod
+    def last_day(cls, session: Session) -> date | None:
+        """Return the most recent day with a snapshot."""
+        day: date | None = session.query(func.max(cls.day)).scalar()
+        return day
+
+
 class UserBase(SQLModel):
     id: int | None = Field(default=None, primary_key=True)
     #: The authorization group of the user.
@@ -1,15 +1,16 @@
 from datetime import datetime
-from typing import Annotated, Any, cast
+from typing import Annotated, Any
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session, joinedload
 from sqlmodel import col
 
+import app.utils.statistics as statistics_utils
 from app import aws, dependencies, mail, models, parsers, serializers, util
-from app.db import get_db, rollback_on_error
+from app.db import get_db, get_read_db, rollback_on_error
 from app.i18n import _
-from app.util import SortOrder
+from app.util import CountMode, SortOrder
 
 router = APIRouter()
 
@@ -19,7 +20,7 @@ router = APIRouter()
     tags=[util.Tags.applications],
     response_model=models.ApplicationWithRelations,
 )
-async def reject_application(
+def reject_application(
     payload: parsers.LenderRejectedApplication,
     session: Annotated[Session, Depends(get_db)],
     client: Annotated[aws.Client, Depends(dependencies.get_aws_client)],
@@ -70,6 +71,7 @@ async def reject_application(
         mail.send(session, client.ses, models.MessageType.REJECTED_APPLICATION, application, options=options)
 
         session.commit()
+        statistics_utils.cache.clear()
         return application
 
 
@@ -78,7 +80,7 @@ async def reject_application(
     tags=[util.Tags.applications],
     response_model=models.ApplicationWithRelations,
 )
-async def approve_application(
+def approve_application(
     payload: parsers.LenderApprovedData,
     session: Annotated[Session, Depends(get_db)],
     client: Annotated[aws.Client, Depends(dependencies.get_aws_client)],
@@ -136,6 +138,7 @@ async def approve_application(
         mail.send(session, client.ses, models.MessageType.APPROVED_APPLICATION, application)
 
         session.commit()
+        statistics_utils.cache.clear()
         return application
 
 
@@ -144,7 +147,7 @@ async def approve_application(
     tags=[util.Tags.applications],
     response_model=models.ApplicationWithRelations,
 )
-async def verify_data_field(
+def verify_data_field(
     payload: parsers.UpdateDataField,
     session: Annotated[Session, Depends(get_db)],
     user: Annotated[models.User, Depends(dependencies.get_user)],
@@ -196,7 +199,7 @@ async def verify_data_field(
     tags=[util.Tags.applications],
     response_model=models.ApplicationWithRelations,
 )
-async def verify_document(
+def verify_document(
     document_id: int,
     payload: parsers.VerifyBorrowerDocument,
     session: Annotated[Session, Depends(get_db)],
@@ -237,7 +240,7 @@ async def verify_document(
     tags=[util.Tags.applications],
     response_model=models.ApplicationWithRelations,
 )
-async def update_application_award(
+def update_application_award(
     id: int,
     payload: parsers.AwardUpdate,
     user: Annotated[models.User, Depends(dependencies.get_user)],
@@ -285,7 +288,7 @@ async def update_application_award(
     tags=[util.Tags.applications],
     response_model=models.ApplicationWithRelations,
 )
-async def update_application_borrower(
+def update_application_borrower(
     id: int,
     payload: parsers.BorrowerUpdate,
     user: Annotated[models.User, Depends(dependencies.get_user)],
@@ -339,29 +342,33 @@ async def update_application_borrower(
     "/applications/admin-list",
     tags=[util.Tags.applications],
 )
-async def get_applications_list(
+def get_applications_list(
     admin: Annotated[models.User, Depends(dependencies.get_admin_user)],
-    session: Annotated[Session, Depends(get_db)],
+    session: Annotated[Session, Depends(get_read_db)],
+    primary_session: Annotated[Session, Depends(get_db)],
     page: Annotated[int, Query(ge=0)] = 0,
     page_size: Annotated[int, Query(gt=0)] = 10,
     sort_field: Annotated[str, Query()] = "application.borrower_submitted_at",
     sort_order: Annotated[SortOrder, Query()] = SortOrder.ASC,
     search_value: Annotated[str, Query()] = "",
+    cursor: Annotated[str | None, Query()] = None,
+    count: Annotated[CountMode, Query()] = CountMode.EXACT,
 ) -> serializers.ApplicationListResponse:
-    """Get a paginated list of submitted applications for administrative purposes."""
-    applications_query = models.Application.submitted_search(
-        session, search_value=search_value, sort_field=sort_field, sort_order=sort_order
-    )
-
-    total_count = applications_query.count()
-
-    applications = applications_query.limit(page_size).offset(page * page_size).all()
+    """
+    Get a paginated list of submitted applications for administrative purposes.
 
-    return serializers.ApplicationListResponse(
-        items=cast("list[models.ApplicationWithRelations]", applications),
-        count=total_count,
+    To paginate by keyset, set ``cursor`` to the previous response's ``next_cursor``.
+    """
+    return util.get_application_list(
+        session,
+        primary_session,
         page=page,
         page_size=page_size,
+        sort_field=sort_field,
+        sort_order=sort_order,
+        search_value=search_value,
+        cursor=cursor,
+        count=count,
     )
 
 
@@ -369,29 +376,34 @@ async def get_applications_list(
     "/applications",
     tags=[util.Tags.applications],
 )
-async def get_applications(
+def get_applications(
     user: Annotated[models.User, Depends(dependencies.get_user)],
-    session: Annotated[Session, Depends(get_db)],
+    session: Annotated[Session, Depends(get_read_db)],
+    primary_session: Annotated[Session, Depends(get_db)],
     page: Annotated[int, Query(ge=0)] = 0,
     page_size: Annotated[int, Query(gt=0)] = 10,
     sort_field: Annotated[str, Query()] = "application.borrower_submitted_at",
     sort_order: Annotated[SortOrder, Query()] = SortOrder.ASC,
     search_value: Annotated[str, Query()] = "",
+    cursor: Annotated[str | None, Query()] = None,
+    count: Annotated[CountMode, Query()] = CountMode.EXACT,
 ) -> serializers.ApplicationListResponse:
-    """Get a paginated list of submitted applications for a specific lender user."""
-    applications_query = models.Application.submitted_search(
-        session, search_value=search_value, sort_field=sort_field, sort_order=sort_order, lender_id=user.lender_id
-    )
-
-    total_count = applications_query.count()
-
-    applications = applications_query.limit(page_size).offset(page * page_size).all()
+    """
+    Get a paginated list of submitted applications for a specific lender user.
 
-    return serializers.ApplicationListResponse(
-        items=cast("list[models.ApplicationWithRelations]", applications),
-        count=total_count,
+    To paginate by keyset, set ``cursor`` to the previous response's ``next_cursor``.
+    """
+    return util.get_application_list(
+        session,
+        primary_session,
         page=page,
         page_size=page_size,
+        sort_field=sort_field,
+        sort_order=sort_order,
+        search_value=search_value,
+        cursor=cursor,
+        count=count,
+        lender_id=user.lender_id,
     )
 
 
@@ -400,7 +412,7 @@ async def get_applications(
     tags=[util.Tags.applications],
     response_model=models.ApplicationWithRelations,
 )
-async def get_application(
+def get_application(
     user: Annotated[models.User, Depends(dependencies.get_user)],
     session: Annotated[Session, Depends(get_db)],
     application: Annotated[
@@ -422,7 +434,7 @@ async def get_application(
     tags=[util.Tags.applications],
     response_model=models.ApplicationWithRelations,
 )
-async def start_application(
+def start_application(
     id: int,
     user: Annotated[models.User, Depends(dependencies.get_user)],
     session: Annotated[Session, Depends(get_db)],
@@ -450,6 +462,7 @@ async def start_application(
         application.lender_started_at = datetime.now(application.created_at.tzinfo)
 
         session.commit()
+        statistics_utils.cache.clear()
         return application
 
 
@@ -458,7 +471,7 @@ async def start_application(
     tags=[util.Tags.applications],
     response_model=models.ApplicationWithRelations,
 )
-async def email_borrower(
+def email_borrower(
     payload: parsers.ApplicationEmailBorrower,
     session: Annotated[Session, Depends(get_db)],
     client: Annotated[aws.Client, Depends(dependencies.get_aws_client)],
@@ -506,6 +519,7 @@ async def email_borrower(
         )
 
         session.commit()
+        statistics_utils.cache.clear()
         return application
 
 
@@ -513,7 +527,7 @@ async def email_borrower(
     "/applications/{id}/previous-awards",
     tags=[util.Tags.applications],
 )
-async def previous_contracts(
+def previous_contracts(
     user: Annotated[models.User, Depends(dependencies.get_user)],
     session: Annotated[Session, Depends(get_db)],
     application: Annotated[
@@ -535,7 +549,7 @@ async def previous_contracts(
     tags=[util.Tags.applications],
     response_model=models.ApplicationWithRelations,
 )
-async def lapse_application(
+def lapse_application(
     id: int,
     user: Annotated[models.User, Depends(dependencies.get_user)],
     session: Annotated[Session, Depends(get_db)],
@@ -566,4 +580,5 @@ async def lapse_application(
         )
 
         session.commit()
+        statistics_utils.cache.clear()
         return application
@@ -1,15 +1,16 @@
 import csv
 import io
-import zipfile
+from collections.abc import Generator, Iterator
 from typing import Annotated, Any
 
-from fastapi import APIRouter, Depends, Response
+from fastapi import APIRouter, Depends, Header, status
+from fastapi.responses import StreamingResponse
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
 from sqlalchemy.orm import Session
 
-from app import dependencies, models, util
-from app.db import get_db, rollback_on_error
+from app import dependencies, models, storage, util
+from app.db import get_db, get_read_db, rollback_on_error
 from app.dependencies import ApplicationScope
 from app.i18n import _
 from app.utils import tables
@@ -17,19 +18,25 @@ from reportlab_mods import styleSubTitle, styleTitle
 
 router = APIRouter()
 
+#: The number of rows to fetch from the server-side cursor at a time, when exporting applications.
+EXPORT_BATCH_SIZE = 1000
+
 
 @router.get(
     "/applications/documents/id/{document_id}",
     tags=[util.Tags.applications],
 )
-async def get_borrower_document(
+def get_borrower_document(
     document_id: int,
     session: Annotated[Session, Depends(get_db)],
     user: Annotated[models.User, Depends(dependencies.get_user)],
-) -> Response:
+    range_header: Annotated[str | None, Header(alias="Range")] = None,
+) -> StreamingResponse:
     """
     Retrieve a borrower document by its ID and stream the file content as a response.
 
+    If the request has a ``Range`` header with a single byte range, stream only that range.
+
     :param document_id: The ID of the borrower document to retrieve.
     :return: A streaming response with the borrower document file content.
     """
@@ -48,11 +55,28 @@ async def get_borrower_document(
             application_id=document.application.id,
         )
 
+        size = storage.get_document_size(document)
+        byte_range = util.parse_range(range_header, size)
+
         session.commit()
-        return Response(
-            content=document.file,
+
+        headers = {"Content-Disposition": f'attachment; filename="{document.name}"', "Accept-Ranges": "bytes"}
+        if byte_range:
+            start, stop = byte_range
+            headers["Content-Range"] = f"bytes {start}-{stop - 1}/{size}"
+            headers["Content-Length"] = str(stop - start)
+            return StreamingResponse(
+                storage.iter_document(document, start, stop),
+                status_code=status.HTTP_206_PARTIAL_CONTENT,
+                media_type="application/octet-stream",
+                headers=headers,
+            )
+
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(
+            storage.iter_document(document),
             media_type="application/octet-stream",
-            headers={"Content-Disposition": f'attachment; filename="{document.name}"'},
+            headers=headers,
         )
 
 
@@ -60,7 +84,7 @@ async def get_borrower_document(
     "/applications/{id}/download-application/{lang}",
     tags=[util.Tags.applications],
 )
-async def download_application(
+def download_application(
     lang: str,
     session: Annotated[Session, Depends(get_db)],
     user: Annotated[models.User, Depends(dependencies.get_user)],
@@ -72,7 +96,7 @@ async def download_application(
             )
         ),
     ],
-) -> Response:
+) -> StreamingResponse:
     """
     Retrieve all documents related to an application and stream them as a zip file.
 
@@ -109,11 +133,11 @@ async def download_application(
         name = _("Application Details", lang).replace(" ", "_")
         filename = f"{name}-{application.borrower.legal_identifier}-{application.award.source_contract_id}.pdf"
 
-        in_memory_zip = io.BytesIO()
-        with zipfile.ZipFile(in_memory_zip, "w") as zip_file:
-            zip_file.writestr(filename, buffer.getvalue())
+        def files() -> Generator[tuple[str, bytes | memoryview | Iterator[bytes]], None, None]:
+            yield filename, buffer.getbuffer()
+            # Read one chunk of one document's contents at a time.
             for document in documents:
-                zip_file.writestr(document.name, document.file)
+                yield document.name, storage.iter_document(document)
 
         models.ApplicationAction.create(
             session,
@@ -127,8 +151,8 @@ async def download_application(
         )
 
         session.commit()
-        return Response(
-            content=in_memory_zip.getvalue(),
+        return StreamingResponse(
+            util.stream_zip(files()),
             media_type="application/zip",
             headers={"Content-Disposition": f'attachment; filename="{filename}"'},
         )
@@ -138,46 +162,66 @@ async def download_application(
     "/applications/export/{lang}",
     tags=[util.Tags.applications],
 )
-async def export_applications(
+def export_applications(
     lang: str,
     user: Annotated[models.User, Depends(dependencies.get_user)],
-    session: Annotated[Session, Depends(get_db)],
-) -> Response:
-    stream = io.StringIO()
-
-    writer = csv.writer(stream)
-    writer.writerow(
-        [
-            _("Legal Name", lang),
-            _("National Tax ID", lang),
-            _("Email Address", lang),
-            _("Buyer Name", lang),
-            _("Award Value Currency & Amount", lang),
-            _("Amount requested", lang),
-            _("Submission Date", lang),
-            _("Stage", lang),
-        ]
+    session: Annotated[Session, Depends(get_read_db)],
+) -> StreamingResponse:
+    """
+    Stream the lender's submitted applications as a CSV file.
+
+    The rows are fetched from a server-side cursor in batches, so that memory use doesn't grow with the number of
+    applications. The session remains open while the response is streamed, as the exit code of dependencies with
+    ``yield`` runs after the response is sent.
+    """
+    query = models.Application.submitted_search(
+        session,
+        lender_id=user.lender_id,
+        sort_field="application.borrower_submitted_at",
+        sort_order="asc",
+        columns=(
+            models.Borrower.legal_name,
+            models.Borrower.legal_identifier,
+            models.Application.primary_email,
+            models.Award.buyer_name,
+            models.Award.award_amount,
+            models.Application.amount_requested,
+            models.Application.borrower_submitted_at,
+            models.Application.status,
+        ),
     )
-    writer.writerows(
-        [
-            application.borrower.legal_name,
-            application.borrower.legal_identifier,
-            application.primary_email,
-            application.award.buyer_name,
-            application.award.award_amount,
-            application.amount_requested,
-            application.borrower_submitted_at,
-            _(application.status, lang),
-        ]
-        for application in (
-            models.Application.submitted_search(
-                session, lender_id=user.lender_id, sort_field="application.borrower_submitted_at", sort_order="asc"
-            )
+
+    def rows() -> Generator[str, None, None]:
+        stream = io.StringIO()
+        writer = csv.writer(stream)
+
+        def flush() -> str:
+            value = stream.getvalue()
+            stream.seek(0)
+            stream.truncate()
+            return value
+
+        writer.writerow(
+            [
+                _("Legal Name", lang),
+                _("National Tax ID", lang),
+                _("Email Address", lang),
+                _("Buyer Name", lang),
+                _("Award Value Currency & Amount", lang),
+                _("Amount requested", lang),
+                _("Submission Date", lang),
+                _("Stage", lang),
+            ]
         )
-    )
+        yield flush()
+
+        result = session.execute(query.statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for partition in result.partitions():
+            writer.writerows([*row[:-1], _(row[-1], lang)] for row in partition)
+            yield flush()
 
-    return Response(
-        content=stream.getvalue(),
+    return StreamingResponse(
+        rows(),
         media_type="text/csv",
         headers={"Content-Disposition": "attachment; filename=export.csv; charset=utf-8"},
     )
@@ -1,3 +1,4 @@
+from collections import Counter
 from datetime import datetime
 from typing import Annotated, Any, cast
 
@@ -7,7 +8,8 @@ from sqlalchemy.orm import Session, joinedload
 from sqlmodel import col
 from starlette.responses import RedirectResponse
 
-from app import aws, dependencies, mail, models, parsers, serializers, util
+import app.utils.statistics as statistics_utils
+from app import aws, dependencies, mail, models, parsers, serializers, storage, util
 from app.db import get_db, rollback_on_error
 from app.i18n import _
 
@@ -18,7 +20,7 @@ router = APIRouter()
     "/applications/uuid/{uuid}",
     tags=[util.Tags.applications],
 )
-async def application_by_uuid(
+def application_by_uuid(
     session: Annotated[Session, Depends(get_db)],
     application: Annotated[
         models.Application,
@@ -47,7 +49,7 @@ async def application_by_uuid(
     "/applications/decline",
     tags=[util.Tags.applications],
 )
-async def decline(
+def decline(
     payload: parsers.ApplicationDeclinePayload,
     session: Annotated[Session, Depends(get_db)],
     application: Annotated[
@@ -84,6 +86,7 @@ async def decline(
             application.borrower.declined_at = current_time
 
         session.commit()
+        statistics_utils.cache.clear()
         return serializers.ApplicationResponse(
             application=cast("models.ApplicationRead", application),
             borrower=application.borrower,
@@ -95,7 +98,7 @@ async def decline(
     "/applications/rollback-decline",
     tags=[util.Tags.applications],
 )
-async def rollback_decline(
+def rollback_decline(
     payload: parsers.ApplicationBase,
     session: Annotated[Session, Depends(get_db)],
     application: Annotated[
@@ -126,6 +129,7 @@ async def rollback_decline(
             application.borrower.declined_at = None
 
         session.commit()
+        statistics_utils.cache.clear()
         return serializers.ApplicationResponse(
             application=cast("models.ApplicationRead", application),
             borrower=application.borrower,
@@ -137,7 +141,7 @@ async def rollback_decline(
     "/applications/decline-feedback",
     tags=[util.Tags.applications],
 )
-async def decline_feedback(
+def decline_feedback(
     payload: parsers.ApplicationDeclineFeedbackPayload,
     session: Annotated[Session, Depends(get_db)],
     application: Annotated[
@@ -163,6 +167,7 @@ async def decline_feedback(
         application.borrower_declined_preferences_data = borrower_declined_preferences_data
 
         session.commit()
+        statistics_utils.cache.clear()
         return serializers.ApplicationResponse(
             application=cast("models.ApplicationRead", application),
             borrower=application.borrower,
@@ -174,7 +179,7 @@ async def decline_feedback(
     "/applications/access-scheme",
     tags=[util.Tags.applications],
 )
-async def access_scheme(
+def access_scheme(
     payload: parsers.ApplicationBase,
     background_tasks: BackgroundTasks,
     session: Annotated[Session, Depends(get_db)],
@@ -204,6 +209,7 @@ async def access_scheme(
         application.expired_at = None
 
         session.commit()
+        statistics_utils.cache.clear()
 
         background_tasks.add_task(util.get_previous_awards_from_data_source, application.borrower_id)
 
@@ -218,7 +224,7 @@ async def access_scheme(
     "/applications/credit-product-options",
     tags=[util.Tags.applications],
 )
-async def credit_product_options(
+def credit_product_options(
     payload: parsers.ApplicationCreditOptions,
     session: Annotated[Session, Depends(get_db)],
     application: Annotated[
@@ -259,7 +265,7 @@ async def credit_product_options(
     "/applications/select-credit-product",
     tags=[util.Tags.applications],
 )
-async def select_credit_product(
+def select_credit_product(
     payload: parsers.ApplicationSelectCreditProduct,
     session: Annotated[Session, Depends(get_db)],
     application: Annotated[
@@ -318,7 +324,7 @@ async def select_credit_product(
     "/applications/rollback-select-credit-product",
     tags=[util.Tags.applications],
 )
-async def rollback_select_credit_product(
+def rollback_select_credit_product(
     payload: parsers.ApplicationBase,
     session: Annotated[Session, Depends(get_db)],
     application: Annotated[
@@ -370,7 +376,7 @@ async def rollback_select_credit_product(
     "/applications/confirm-credit-product",
     tags=[util.Tags.applications],
 )
-async def confirm_credit_product(
+def confirm_credit_product(
     payload: parsers.ApplicationBase,
     session: Annotated[Session, Depends(get_db)],
     application: Annotated[
@@ -423,7 +429,7 @@ async def confirm_credit_product(
             .limit(1)
             .scalar()
         ):
-            # Copy the documents into the database for the provided application.
+            # Copy the documents for the provided application. The copies share the documents' contents.
             for document in session.query(models.BorrowerDocument).filter(
                 models.BorrowerDocument.application_id == latest_application_id,
                 col(models.BorrowerDocument.type).in_(
@@ -436,7 +442,7 @@ async def confirm_credit_product(
                         application_id=application.id,
                         type=document.type,
                         name=document.name,
-                        file=document.file,
+                        storage_key=storage.copy_content(session, document),
                         verified=False,
                     )
                 )
@@ -448,6 +454,7 @@ async def confirm_credit_product(
         )
 
         session.commit()
+        statistics_utils.cache.clear()
         return serializers.ApplicationResponse(
             application=cast("models.ApplicationRead", application),
             borrower=application.borrower,
@@ -462,7 +469,7 @@ async def confirm_credit_product(
     "/applications/rollback-confirm-credit-product",
     tags=[util.Tags.applications],
 )
-async def rollback_confirm_credit_product(
+def rollback_confirm_credit_product(
     payload: parsers.ApplicationBase,
     session: Annotated[Session, Depends(get_db)],
     application: Annotated[
@@ -501,9 +508,13 @@ async def rollback_confirm_credit_product(
         application.payment_start_date = None
         application.pending_documents = False
 
-        # Delete the documents
+        # Delete the documents, and remove their references to their contents.
+        storage_keys: Counter[str] = Counter()
         for document in application.borrower_documents:
+            if document.storage_key:
+                storage_keys[document.storage_key] += 1
             session.delete(document)
+        storage.remove_references(session, storage_keys)
 
         models.ApplicationAction.create(
             session,
@@ -512,6 +523,7 @@ async def rollback_confirm_credit_product(
         )
 
         session.commit()
+        statistics_utils.cache.clear()
         return serializers.ApplicationResponse(
             application=cast("models.ApplicationRead", application),
             borrower=application.borrower,
@@ -526,7 +538,7 @@ async def rollback_confirm_credit_product(
     "/applications/submit",
     tags=[util.Tags.applications],
 )
-async def update_apps_send_notifications(
+def update_apps_send_notifications(
     payload: parsers.ApplicationBase,
     session: Annotated[Session, Depends(get_db)],
     client: Annotated[aws.Client, Depends(dependencies.get_aws_client)],
@@ -569,6 +581,7 @@ async def update_apps_send_notifications(
         mail.send(session, client.ses, models.MessageType.SUBMISSION_COMPLETED, application)
 
         session.commit()
+        statistics_utils.cache.clear()
         return serializers.ApplicationResponse(
             application=cast("models.ApplicationRead", application),
             borrower=application.borrower,
@@ -582,7 +595,7 @@ async def update_apps_send_notifications(
     tags=[util.Tags.applications],
     response_model=models.BorrowerDocumentBase,
 )
-async def upload_document(
+def upload_document(
     file: UploadFile,
     borrower_document_type: Annotated[str, Form(..., alias="type")],
     session: Annotated[Session, Depends(get_db)],
@@ -633,7 +646,7 @@ async def upload_document(
     "/applications/complete-information-request",
     tags=[util.Tags.applications],
 )
-async def complete_information_request(
+def complete_information_request(
     payload: parsers.ApplicationBase,
     client: Annotated[aws.Client, Depends(dependencies.get_aws_client)],
     session: Annotated[Session, Depends(get_db)],
@@ -670,6 +683,7 @@ async def complete_information_request(
         mail.send(session, client.ses, models.MessageType.BORROWER_DOCUMENT_UPDATED, application)
 
         session.commit()
+        statistics_utils.cache.clear()
         return serializers.ApplicationResponse(
             application=cast("models.ApplicationRead", application),
             borrower=application.borrower,
@@ -683,7 +697,7 @@ async def complete_information_request(
     "/applications/find-alternative-credit-option",
     tags=[util.Tags.applications],
 )
-async def find_alternative_credit_option(
+def find_alternative_credit_option(
     payload: parsers.ApplicationBase,
     session: Annotated[Session, Depends(get_db)],
     client: Annotated[aws.Client, Depends(dependencies.get_aws_client)],
@@ -753,6 +767,7 @@ async def find_alternative_credit_option(
         mail.send(session, client.ses, models.MessageType.APPLICATION_COPIED, new_application)
 
         session.commit()
+        statistics_utils.cache.clear()
         return serializers.ApplicationResponse(
             application=cast("models.ApplicationRead", new_application),
             borrower=new_application.borrower,
@@ -764,7 +779,7 @@ async def find_alternative_credit_option(
     "/applications/uuid/{uuid}/access-external-onboarding",
     tags=[util.Tags.applications],
 )
-async def access_external_onboarding(
+def access_external_onboarding(
     session: Annotated[Session, Depends(get_db)],
     application: Annotated[
         models.Application,
@@ -786,7 +801,7 @@ async def access_external_onboarding(
     "/applications/uuid/{uuid}/accessed-external-onboarding",
     tags=[util.Tags.applications],
 )
-async def accessed_external_onboarding(
+def accessed_external_onboarding(
     session: Annotated[Session, Depends(get_db)],
     application: Annotated[
         models.Application,
@@ -15,7 +15,7 @@ router = APIRouter()
     "/applications/change-email",
     tags=[util.Tags.applications],
 )
-async def change_email(
+def change_email(
     payload: parsers.ChangeEmail,
     session: Annotated[Session, Depends(get_db)],
     client: Annotated[aws.Client, Depends(dependencies.get_aws_client)],
@@ -64,7 +64,7 @@ async def change_email(
     "/applications/confirm-change-email",
     tags=[util.Tags.applications],
 )
-async def confirm_email(
+def confirm_email(
     payload: parsers.ConfirmNewEmail,
     session: Annotated[Session, Depends(get_db)],
     application: Annotated[models.Application, Depends(dependencies.get_application_as_guest_via_payload)],
@@ -6,7 +6,7 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, joinedload
 
 from app import dependencies, models, serializers, util
-from app.db import get_db, rollback_on_error
+from app.db import get_db, get_read_db, rollback_on_error
 from app.i18n import _
 from app.sources import colombia as data_access
 from app.util import get_object_or_404
@@ -18,7 +18,7 @@ router = APIRouter()
     "/lenders",
     tags=[util.Tags.lenders],
 )
-async def create_lender(
+def create_lender(
     payload: models.LenderCreate,
     admin: Annotated[models.User, Depends(dependencies.get_admin_user)],
     session: Annotated[Session, Depends(get_db)],
@@ -54,7 +54,7 @@ async def create_lender(
     "/lenders/{lender_id}/credit-products",
     tags=[util.Tags.lenders],
 )
-async def create_credit_products(
+def create_credit_products(
     lender_id: int,
     payload: models.CreditProduct,
     admin: Annotated[models.User, Depends(dependencies.get_admin_user)],
@@ -81,7 +81,7 @@ async def create_credit_products(
     tags=[util.Tags.lenders],
     response_model=models.LenderWithRelations,
 )
-async def get_lender(
+def get_lender(
     lender_id: int,
     session: Annotated[Session, Depends(get_db)],
 ) -> Any:
@@ -99,7 +99,7 @@ async def get_lender(
     "/lenders/{lender_id}",
     tags=[util.Tags.lenders],
 )
-async def update_lender(
+def update_lender(
     lender_id: int,
     payload: models.LenderBase,
     admin: Annotated[models.User, Depends(dependencies.get_admin_user)],
@@ -131,8 +131,8 @@ async def update_lender(
     "/lenders",
     tags=[util.Tags.lenders],
 )
-async def get_lenders_list(
-    session: Annotated[Session, Depends(get_db)],
+def get_lenders_list(
+    session: Annotated[Session, Depends(get_read_db)],
 ) -> serializers.LenderListResponse:
     """
     Get the list of all lenders.
@@ -168,7 +168,7 @@ async def get_procurement_categories_from_source() -> list[str]:
     tags=[util.Tags.lenders],
     response_model=models.CreditProductWithLender,
 )
-async def get_credit_product(
+def get_credit_product(
     credit_product_id: int,
     session: Annotated[Session, Depends(get_db)],
 ) -> Any:
@@ -198,7 +198,7 @@ async def get_credit_product(
     "/credit-products/{credit_product_id}",
     tags=[util.Tags.lenders],
 )
-async def update_credit_products(
+def update_credit_products(
     credit_product_id: int,
     payload: models.CreditProduct,
     admin: Annotated[models.User, Depends(dependencies.get_admin_user)],
@@ -6,20 +6,30 @@ from sqlalchemy.orm import Session
 
 import app.utils.statistics as statistics_utils
 from app import dependencies, serializers, util
-from app.db import get_db
+from app.db import get_db, get_read_db
 from app.models import User
+from app.settings import app_settings
 from app.util import StatisticRange
 
 router = APIRouter()
 
 
+def _get_general_statistics(
+    session: Session, initial_date: str | None, final_date: str | None, lender_id: int | None
+) -> dict[str, int | float]:
+    if app_settings.statistics_snapshots:
+        return statistics_utils.get_general_statistics_from_snapshots(session, initial_date, final_date, lender_id)
+    return statistics_utils.get_general_statistics(session, initial_date, final_date, lender_id)
+
+
 @router.get(
     "/statistics-ocp",
     tags=[util.Tags.statistics],
 )
-async def get_admin_statistics_by_lender(
+def get_admin_statistics_by_lender(
     admin: Annotated[User, Depends(dependencies.get_admin_user)],
-    session: Annotated[Session, Depends(get_db)],
+    session: Annotated[Session, Depends(get_read_db)],
+    primary_session: Annotated[Session, Depends(get_db)],
     initial_date: Annotated[str | None, Query()] = None,
     final_date: Annotated[str | None, Query()] = None,
     lender_id: Annotated[int | None, Query()] = None,
@@ -39,19 +49,24 @@ async def get_admin_statistics_by_lender(
     :param lender_id: The lender ID to filter the statistics for a specific lender (optional).
     :return: Response containing the admin statistics.
     """
-    if initial_date is None and final_date is None and custom_range is None:
-        statistics_kpis = statistics_utils.get_general_statistics(session, initial_date, final_date, lender_id)
-    else:
-        if custom_range is not None:
-            current_date = datetime.now().date()
-
-            if custom_range == StatisticRange.LAST_WEEK:
-                initial_date = (current_date - timedelta(days=7)).isoformat()
-            elif custom_range == StatisticRange.LAST_MONTH:
-                initial_date = (current_date - timedelta(days=30)).isoformat()
-            final_date = current_date.isoformat()
-
-        statistics_kpis = statistics_utils.get_general_statistics(session, initial_date, final_date, lender_id)
+    if custom_range is not None:
+        current_date = datetime.now().date()
+
+        if custom_range == StatisticRange.LAST_WEEK:
+            initial_date = (current_date - timedelta(days=7)).isoformat()
+        elif custom_range == StatisticRange.LAST_MONTH:
+            initial_date = (current_date - timedelta(days=30)).isoformat()
+        final_date = current_date.isoformat()
+
+    statistics_kpis = statistics_utils.get_cached(
+        ("statistics-ocp", initial_date, final_date, lender_id, custom_range),
+        _get_general_statistics,
+        session,
+        primary_session,
+        initial_date,
+        final_date,
+        lender_id,
+    )
 
     return serializers.StatisticResponse(
         statistics_kpis=statistics_kpis,
@@ -62,9 +77,10 @@ async def get_admin_statistics_by_lender(
     "/statistics-ocp/opt-in",
     tags=[util.Tags.statistics],
 )
-async def get_admin_statistics_opt_in(
+def get_admin_statistics_opt_in(
     admin: Annotated[User, Depends(dependencies.get_admin_user)],
-    session: Annotated[Session, Depends(get_db)],
+    session: Annotated[Session, Depends(get_read_db)],
+    primary_session: Annotated[Session, Depends(get_db)],
 ) -> serializers.StatisticOptInResponse:
     """
     Retrieve OCP statistics for borrower opt-in.
@@ -75,7 +91,12 @@ async def get_admin_statistics_opt_in(
     :return: Response containing the admin statistics for borrower opt-in.
     """
     return serializers.StatisticOptInResponse(
-        opt_in_stat=statistics_utils.get_borrower_opt_in_stats(session),
+        opt_in_stat=statistics_utils.get_cached(
+            ("statistics-ocp/opt-in", None, None, None, None),
+            statistics_utils.get_borrower_opt_in_stats,
+            session,
+            primary_session,
+        ),
     )
 
 
@@ -83,8 +104,9 @@ async def get_admin_statistics_opt_in(
     "/statistics-fi",
     tags=[util.Tags.statistics],
 )
-async def get_lender_statistics(
-    session: Annotated[Session, Depends(get_db)],
+def get_lender_statistics(
+    session: Annotated[Session, Depends(get_read_db)],
+    primary_session: Annotated[Session, Depends(get_db)],
     user: Annotated[User, Depends(dependencies.get_user)],
 ) -> serializers.StatisticResponse:
     """
@@ -97,5 +119,13 @@ async def get_lender_statistics(
     :return: Response containing the statistics for the lender.
     """
     return serializers.StatisticResponse(
-        statistics_kpis=statistics_utils.get_general_statistics(session, None, None, user.lender_id),
+        statistics_kpis=statistics_utils.get_cached(
+            ("statistics-fi", None, None, user.lender_id, None),
+            _get_general_statistics,
+            session,
+            primary_session,
+            None,
+            None,
+            user.lender_id,
+        ),
     )
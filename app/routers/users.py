@@ -1,12 +1,13 @@
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, joinedload
 
 from app import auth, aws, dependencies, mail, models, parsers, serializers, util
-from app.db import get_db, rollback_on_error
+from app.db import get_db, get_read_db, rollback_on_error
 from app.i18n import _
 from app.settings import app_settings
 from app.util import SortOrder, get_object_or_404
@@ -18,7 +19,7 @@ router = APIRouter()
     "/users",
     tags=[util.Tags.users],
 )
-async def create_user(
+def create_user(
     payload: models.UserBase,
     session: Annotated[Session, Depends(get_db)],
     client: Annotated[aws.Client, Depends(dependencies.get_aws_client)],
@@ -209,7 +210,10 @@ async def logout(
         # get_current_user
         username = credentials.claims["username"]
         # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/cognito-idp/client/admin_user_global_sign_out.html
-        client.cognito.admin_user_global_sign_out(UserPoolId=app_settings.cognito_pool_id, Username=username)
+        # Cognito is called in a thread, so as not to block the event loop.
+        await run_in_threadpool(
+            client.cognito.admin_user_global_sign_out, UserPoolId=app_settings.cognito_pool_id, Username=username
+        )
     # The user is not signed in.
     except (HTTPException, KeyError):
         pass
@@ -269,7 +273,7 @@ def forgot_password(
     "/users/{user_id}",
     tags=[util.Tags.users],
 )
-async def get_user(
+def get_user(
     user_id: int,
     admin: Annotated[models.User, Depends(dependencies.get_admin_user)],
     session: Annotated[Session, Depends(get_db)],
@@ -286,9 +290,9 @@ async def get_user(
     "/users",
     tags=[util.Tags.users],
 )
-async def get_all_users(
+def get_all_users(
     admin: Annotated[models.User, Depends(dependencies.get_admin_user)],
-    session: Annotated[Session, Depends(get_db)],
+    session: Annotated[Session, Depends(get_read_db)],
     page: Annotated[int, Query(ge=0)] = 0,
     page_size: Annotated[int, Query(gt=0)] = 10,
     sort_field: Annotated[str, Query()] = "created_at",
@@ -323,7 +327,7 @@ async def get_all_users(
     tags=[util.Tags.users],
     response_model=models.UserWithLender,
 )
-async def update_user(
+def update_user(
     user_id: int,
     payload: models.User,
     admin: Annotated[models.User, Depends(dependencies.get_admin_user)],
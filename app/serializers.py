@@ -30,6 +30,7 @@ class BasePagination(BaseModel):
 
 class ApplicationListResponse(BasePagination):
     items: list[models.ApplicationWithRelations]  # IApplication
+    next_cursor: str | None = None
 
 
 class LenderListResponse(BasePagination):
@@ -51,6 +51,38 @@ class Settings(BaseSettings):
     database_url: str = "postgresql:///credere_backend?application_name=credere_backend"
     #: PostgreSQL connection string that overrides ``DATABASE_URL`` (:ref:`tests<dev-tests>` drops the database).
     test_database_url: str = ""
+    #: The maximum number of threads in which to run synchronous routes and dependencies, like those that query the
+    #: database, so that they don't block the event loop.
+    thread_pool_size: int = 40
+
+    # Database
+
+    #: PostgreSQL connection string of a read-only replica, for reports and lists. If not set, or if the replica is
+    #: unavailable, ``DATABASE_URL`` is used.
+    #:
+    #: .. seealso:: :func:`app.db.get_read_db`
+    read_database_url: str = ""
+    #: The number of connections to keep open in the web application's pool (and the replica's pool).
+    #:
+    #: .. seealso:: `Connection Pooling <https://docs.sqlalchemy.org/en/20/core/pooling.html>`__
+    database_pool_size: int = 5
+    #: The number of connections that the web application can open beyond ``DATABASE_POOL_SIZE``.
+    database_max_overflow: int = 10
+    #: The number of connections to keep open in a command's pool.
+    batch_database_pool_size: int = 2
+    #: The number of connections that a command can open beyond ``BATCH_DATABASE_POOL_SIZE``.
+    batch_database_max_overflow: int = 2
+    #: The number of seconds to wait for a connection from a full pool, before raising an error.
+    database_pool_timeout: int = 30
+    #: The number of seconds after which to replace a connection, or -1 to never replace connections (set lower than
+    #: any idle timeout of the server or proxy).
+    database_pool_recycle: int = -1
+    #: Whether to test each connection when checked out of the pool, to replace connections that the server closed.
+    database_pool_pre_ping: bool = False
+    #: The number of milliseconds after which to cancel a statement by the web application, or 0 for no limit.
+    database_statement_timeout: int = 0
+    #: The number of milliseconds after which to cancel a statement by a command, or 0 for no limit.
+    batch_database_statement_timeout: int = 0
 
     # Security
 
@@ -65,6 +97,21 @@ class Settings(BaseSettings):
     #: .. seealso:: :func:`app.util.validate_file`
     max_file_size_mb: int = 20
 
+    # Document storage
+
+    #: Where to store the contents of borrower documents: "database" (in the ``document_content.content`` column),
+    #: "local" (in :attr:`~app.settings.Settings.document_storage_path`) or "s3" (in
+    #: :attr:`~app.settings.Settings.document_storage_bucket`).
+    #:
+    #: .. seealso:: :typer:`python-m-app-move-documents-to-storage`
+    document_storage: str = "database"
+    #: The directory in which to store the contents of borrower documents, if ``DOCUMENT_STORAGE`` is "local".
+    document_storage_path: str = ""
+    #: The S3 bucket in which to store the contents of borrower documents, if ``DOCUMENT_STORAGE`` is "s3".
+    document_storage_bucket: str = ""
+    #: The endpoint URL of an S3-compatible service, like MinIO, if not AWS.
+    document_storage_endpoint_url: str = ""
+
     # Timeline
 
     #: The number of days after the application is created, after which a PENDING or DECLINED application becomes
@@ -120,14 +167,58 @@ class Settings(BaseSettings):
     #: .. seealso:: :meth:`app.models.Application.archivable`
     days_to_erase_borrowers_data: int = 7
 
+    # Statistics
+
+    #: Whether the statistics endpoints sum the daily snapshots from :typer:`python-m-app-update-statistics`, plus the
+    #: applications created since the last snapshot, instead of querying all applications.
+    #:
+    #: .. seealso:: :func:`app.utils.statistics.get_general_statistics_from_snapshots`
+    statistics_snapshots: bool = False
+    #: The number of seconds for which to cache the results of the statistics endpoints, and the counts of the
+    #: application list endpoints if requested. The cache is cleared when an application changes status via the API.
+    #: For this many seconds after the cache is cleared, it is refilled from the primary database, instead of the read
+    #: replica, which can lag behind. Set to 0 to disable the cache.
+    #:
+    #: .. seealso:: :data:`app.utils.statistics.cache`
+    statistics_cache_ttl: int = 300
+    #: The maximum number of results of the statistics endpoints to cache.
+    statistics_cache_size: int = 1000
+
     # Data sources
 
     #: The application token to the `SECOP API <https://datos.gov.co/profile/edit/developer_settings>`__.
     colombia_secop_app_token: str = ""
     #: The number of items to retrieve at once in :typer:`python-m-app-fetch-awards`.
     secop_pagination_limit: int = 5
+    #: Whether :typer:`python-m-app-fetch-awards` pages by the last award's ``fecha_de_ultima_publicaci`` and ``:id``
+    #: (keyset pagination), instead of by offset. Keyset pagination has a constant cost per page, and doesn't skip or
+    #: repeat awards if the dataset changes during the run.
+    secop_keyset_pagination: bool = False
     #: The number of days of past items to retrieve the first time :typer:`python-m-app-fetch-awards` runs.
     secop_default_days_from_ultima_actualizacion: int = 365
+    #: The number of contracting processes whose contracts to retrieve at once in
+    #: :typer:`python-m-app-fetch-awards`. Set to 0 to retrieve each award's contracts separately.
+    secop_contracts_batch_size: int = 50
+    #: The maximum number of connections that an asynchronous client opens to the SECOP API.
+    secop_max_connections: int = 10
+    #: The maximum number of concurrent requests that an asynchronous client makes to the SECOP API.
+    secop_max_in_flight_requests: int = 10
+    #: Whether an asynchronous client negotiates HTTP/2 with the SECOP API.
+    secop_http2: bool = False
+    #: The maximum number of borrowers to cache in :typer:`python-m-app-fetch-awards`.
+    secop_borrower_cache_size: int = 10_000
+    #: The number of seconds for which to cache a borrower in :typer:`python-m-app-fetch-awards`.
+    secop_borrower_cache_ttl: int = 3600
+    #: Whether to request only the fields that Credere reads from the SECOP API (see
+    #: :data:`app.sources.colombia.FIELDS`), plus the fields in the settings below. This reduces the size of responses
+    #: and of the ``source_data*`` columns.
+    secop_select: bool = False
+    #: Additional fields to request from the contracts dataset and store in ``source_data_contracts``, as a JSON array.
+    secop_contracts_extra_fields: list[str] = []
+    #: Additional fields to request from the awards dataset and store in ``source_data_awards``, as a JSON array.
+    secop_awards_extra_fields: list[str] = []
+    #: Additional fields to request from the borrowers dataset and store in ``source_data``, as a JSON array.
+    secop_borrower_extra_fields: list[str] = []
 
     # Email addresses
 
@@ -1,7 +1,50 @@
+import asyncio
+from typing import Any
+
 import httpx
 
-# The reasons for this configuration were not documented in 427ce63. Assume server and certificate instability.
-client = httpx.Client(transport=httpx.HTTPTransport(retries=3, verify=False), timeout=60)
+from app.settings import app_settings
+
+
+def create_client() -> httpx.Client:
+    """Create a synchronous client, like :data:`app.sources.client`."""
+    # The reasons for this configuration were not documented in 427ce63. Assume server and certificate instability.
+    return httpx.Client(transport=httpx.HTTPTransport(retries=3, verify=False), timeout=60)
+
+
+client = create_client()
+
+
+class AsyncClient(httpx.AsyncClient):
+    """
+    An asynchronous client with the same configuration as :data:`app.sources.client`, plus connection pooling limits,
+    optional HTTP/2 and a maximum number of in-flight requests.
+
+    Use it as an async context manager, within a single event loop.
+
+    .. seealso::
+
+       -  :attr:`~app.settings.Settings.secop_max_connections`
+       -  :attr:`~app.settings.Settings.secop_max_in_flight_requests`
+       -  :attr:`~app.settings.Settings.secop_http2`
+    """
+
+    def __init__(self, **kwargs: Any):
+        limits = httpx.Limits(
+            max_connections=app_settings.secop_max_connections,
+            max_keepalive_connections=app_settings.secop_max_connections,
+        )
+        super().__init__(
+            transport=httpx.AsyncHTTPTransport(retries=3, verify=False, http2=app_settings.secop_http2, limits=limits),
+            timeout=60,
+            **kwargs,
+        )
+        # With HTTP/2, many requests can share one connection, so the connection limit doesn't limit requests.
+        self._semaphore = asyncio.Semaphore(app_settings.secop_max_in_flight_requests)
+
+    async def send(self, request: httpx.Request, **kwargs: Any) -> httpx.Response:
+        async with self._semaphore:
+            return await super().send(request, **kwargs)
 
 
 def make_request_with_retry(url: str, headers: dict[str, str]) -> httpx.Response:
@@ -15,3 +58,19 @@ def make_request_with_retry(url: str, headers: dict[str, str]) -> httpx.Response
     response = client.get(url, headers=headers)
     response.raise_for_status()
     return response
+
+
+async def make_request_with_retry_async(
+    async_client: httpx.AsyncClient, url: str, headers: dict[str, str]
+) -> httpx.Response:
+    """
+    Make an HTTP request with retry functionality, like :func:`app.sources.make_request_with_retry`.
+
+    :param async_client: The client with which to make the request.
+    :param url: The URL to make the request to.
+    :param headers: The headers to include in the request.
+    :return: The HTTP response from the request if successful.
+    """
+    response = await async_client.get(url, headers=headers)
+    response.raise_for_status()
+    return response
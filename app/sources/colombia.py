@@ -5,7 +5,7 @@ from urllib.parse import quote_plus
 import httpx
 
 from app import sources, util
-from app.exceptions import SkippedAwardError
+from app.exceptions import SkippedAwardError, SourceFormatError
 from app.settings import app_settings
 
 URLS = {
@@ -16,8 +16,56 @@ URLS = {
 
 HEADERS = {"X-App-Token": app_settings.colombia_secop_app_token}
 
+# The fields read by this module and by app.utils.statistics, if app_settings.secop_select is set.
+FIELDS = {
+    "CONTRACTS": (
+        "proceso_de_compra",
+        "documento_proveedor",
+        "id_contrato",
+        "habilita_pago_adelantado",
+        "valor_de_pago_adelantado",
+        "valor_facturado",
+        "valor_pendiente_de_pago",
+        "valor_pagado",
+        "fecha_de_inicio_del_contrato",
+        "fecha_de_fin_del_contrato",
+        "valor_del_contrato",
+        "g_nero_representante_legal",
+    ),
+    "AWARDS": (
+        "id_del_portafolio",
+        "nit_del_proveedor_adjudicado",
+        "codigoproveedor",
+        "urlproceso",
+        "nit_entidad",
+        "fecha_de_ultima_publicaci",
+        "modalidad_de_contratacion",
+        "entidad",
+        "tipo_de_contrato",
+        "descripci_n_del_procedimiento",
+        "fecha_adjudicacion",
+        "estado_del_procedimiento",
+        "nombre_del_procedimiento",
+    ),
+    "BORROWER": (
+        "nit_entidad",
+        "nombre_entidad",
+        "correo_electronico",
+        "tipo_entidad",
+        "regimen_tributario",
+        "tipo_de_documento",
+        "direccion",
+        "ciudad",
+        "departamento",
+        "es_pyme",
+    ),
+}
+
 SUPPLIER_TYPE_TO_EXCLUDE = "persona natural colombiana"
 
+# The maximum number of rows to request in a batched contracts query. If reached, the batch might be incomplete.
+CONTRACTS_BATCH_LIMIT = 1000
+
 # https://www.datos.gov.co/resource/p6dx-8zbt.json?$query=SELECT distinct `tipo_de_contrato`
 PROCUREMENT_CATEGORIES = [
     "Comodato",
@@ -48,21 +96,93 @@ PROCUREMENT_CATEGORIES = [
 ]
 
 
-def _get_remote_contract(
-    proceso_de_compra: str, proveedor_adjudicado: str, *, previous: bool = False
-) -> tuple[list[dict[str, str]], str]:
+def _select(dataset: str) -> str:
+    """
+    Return the ``$select`` parameter for the dataset, prefixed with ``&``, if
+    :attr:`~app.settings.Settings.secop_select` is set. Otherwise, return the empty string.
+
+    :param dataset: A key of :data:`URLS`.
+    """
+    if not app_settings.secop_select:
+        return ""
+    extra_fields = {
+        "CONTRACTS": app_settings.secop_contracts_extra_fields,
+        "AWARDS": app_settings.secop_awards_extra_fields,
+        "BORROWER": app_settings.secop_borrower_extra_fields,
+    }
+    return f"&$select={','.join(dict.fromkeys((*FIELDS[dataset], *extra_fields[dataset])))}"
+
+
+def _get_remote_contract_url(proceso_de_compra: str, proveedor_adjudicado: str, *, previous: bool = False) -> str:
     params = f"proceso_de_compra='{proceso_de_compra}' AND documento_proveedor='{proveedor_adjudicado}'"
     if previous:
         params = f"{params} AND fecha_de_firma IS NOT NULL"
-    contract_url = f"{URLS['CONTRACTS']}?$where={quote_plus(params)}"
+    return f"{URLS['CONTRACTS']}?$where={quote_plus(params)}{_select('CONTRACTS')}"
+
+
+def _get_remote_contract(
+    proceso_de_compra: str, proveedor_adjudicado: str, *, previous: bool = False
+) -> tuple[list[dict[str, str]], str]:
+    contract_url = _get_remote_contract_url(proceso_de_compra, proveedor_adjudicado, previous=previous)
     return util.loads(sources.make_request_with_retry(contract_url, HEADERS)), contract_url
 
 
+async def _get_remote_contract_async(
+    client: httpx.AsyncClient, proceso_de_compra: str, proveedor_adjudicado: str, *, previous: bool = False
+) -> tuple[list[dict[str, str]], str]:
+    contract_url = _get_remote_contract_url(proceso_de_compra, proveedor_adjudicado, previous=previous)
+    return util.loads(await sources.make_request_with_retry_async(client, contract_url, HEADERS)), contract_url
+
+
+def get_remote_contracts(entries: list[dict[str, Any]]) -> dict[str, tuple[list[dict[str, str]], str]]:
+    """
+    Get the remote contracts of many award entries, with one request per
+    :attr:`~app.settings.Settings.secop_contracts_batch_size` contracting processes.
+
+    If a response reaches the row limit, its contracting processes are omitted, so that :func:`get_award` looks up
+    their contracts individually.
+
+    :param entries: The dictionaries containing the award data.
+    :return: A dictionary in which keys are contracting process IDs (``proceso_de_compra``), and values are the
+        process' contracts and the URL of the request.
+    """
+    remote_contracts: dict[str, tuple[list[dict[str, str]], str]] = {}
+
+    batch_size = app_settings.secop_contracts_batch_size
+    if batch_size < 1:
+        return remote_contracts
+
+    # Skip entries without a contracting process ID. The caller raises SourceFormatError for these.
+    procesos_de_compra = list(
+        dict.fromkeys(entry["id_del_portafolio"] for entry in entries if entry.get("id_del_portafolio"))
+    )
+    for i in range(0, len(procesos_de_compra), batch_size):
+        batch = procesos_de_compra[i : i + batch_size]
+        values = ", ".join("'{}'".format(proceso_de_compra.replace("'", "''")) for proceso_de_compra in batch)
+        contract_url = (
+            f"{URLS['CONTRACTS']}?$limit={CONTRACTS_BATCH_LIMIT}"
+            f"&$where={quote_plus(f'proceso_de_compra IN ({values})')}{_select('CONTRACTS')}"
+        )
+        contract_response_json = util.loads(sources.make_request_with_retry(contract_url, HEADERS))
+        if len(contract_response_json) >= CONTRACTS_BATCH_LIMIT:
+            continue
+
+        found: dict[str, list[dict[str, str]]] = {proceso_de_compra: [] for proceso_de_compra in batch}
+        for remote_contract in contract_response_json:
+            if (proceso_de_compra := remote_contract.get("proceso_de_compra", "")) in found:
+                found[proceso_de_compra].append(remote_contract)
+        for proceso_de_compra, contracts in found.items():
+            remote_contracts[proceso_de_compra] = (contracts, contract_url)
+
+    return remote_contracts
+
+
 def get_award(
     entry: dict[str, Any],
     borrower_id: int | None = None,
     *,
     previous: bool = False,
+    remote_contracts: dict[str, tuple[list[dict[str, str]], str]] | None = None,
 ) -> dict[str, str | None]:
     """
     Create a new award and insert it into the database.
@@ -70,11 +190,20 @@ def get_award(
     :param entry: The dictionary containing the award data.
     :param borrower_id: The database ID of the borrower associated with the award. (default: None)
     :param previous: Whether the award is a previous award or not. (default: False)
+    :param remote_contracts: The return value of :func:`get_remote_contracts`, if not ``previous``. (default: None)
     :return: The newly created award data as a dictionary.
     """
     proceso_de_compra = entry["id_del_portafolio"]
     proveedor_adjudicado = entry["nit_del_proveedor_adjudicado"]
 
+    if remote_contracts and proceso_de_compra in remote_contracts:
+        contracts, contract_url = remote_contracts[proceso_de_compra]
+        # Match as the individual requests would, including the "No Adjudicado" retry.
+        contract_response_json = [c for c in contracts if c.get("documento_proveedor") == proveedor_adjudicado] or [
+            c for c in contracts if c.get("documento_proveedor") == "No Adjudicado"
+        ]
+        return _get_award_data(entry, contract_response_json, contract_url, borrower_id, previous=previous)
+
     contract_response_json, contract_url = _get_remote_contract(
         proceso_de_compra, proveedor_adjudicado, previous=previous
     )
@@ -83,8 +212,47 @@ def get_award(
         contract_response_json, contract_url = _get_remote_contract(
             proceso_de_compra, "No Adjudicado", previous=previous
         )
-        if not contract_response_json:
-            raise SkippedAwardError("No remote contracts found", url=contract_url, data={"previous": previous})
+
+    return _get_award_data(entry, contract_response_json, contract_url, borrower_id, previous=previous)
+
+
+async def get_award_async(
+    client: httpx.AsyncClient,
+    entry: dict[str, Any],
+    borrower_id: int | None = None,
+    *,
+    previous: bool = False,
+) -> dict[str, str | None]:
+    """
+    Like :func:`app.sources.colombia.get_award`, using an asynchronous client.
+
+    :param client: The client with which to make requests.
+    """
+    proceso_de_compra = entry["id_del_portafolio"]
+    proveedor_adjudicado = entry["nit_del_proveedor_adjudicado"]
+
+    contract_response_json, contract_url = await _get_remote_contract_async(
+        client, proceso_de_compra, proveedor_adjudicado, previous=previous
+    )
+    if not contract_response_json:
+        # Retry without proveedor_adjudicado, in case contract data is available, but not the supplier name.
+        contract_response_json, contract_url = await _get_remote_contract_async(
+            client, proceso_de_compra, "No Adjudicado", previous=previous
+        )
+
+    return _get_award_data(entry, contract_response_json, contract_url, borrower_id, previous=previous)
+
+
+def _get_award_data(
+    entry: dict[str, Any],
+    contract_response_json: list[dict[str, str]],
+    contract_url: str,
+    borrower_id: int | None = None,
+    *,
+    previous: bool = False,
+) -> dict[str, str | None]:
+    if not contract_response_json:
+        raise SkippedAwardError("No remote contracts found", url=contract_url, data={"previous": previous})
 
     remote_contract = contract_response_json[0]
 
@@ -98,7 +266,7 @@ def get_award(
         "source_last_updated_at": entry.get("fecha_de_ultima_publicaci"),
         "procurement_method": entry.get("modalidad_de_contratacion", ""),
         "buyer_name": entry.get("entidad", ""),
-        "contracting_process_id": proceso_de_compra,
+        "contracting_process_id": entry["id_del_portafolio"],
         "procurement_category": entry.get("tipo_de_contrato", ""),
         "previous": previous,
         "source_data_awards": entry,
@@ -126,15 +294,39 @@ def get_award(
     return new_award
 
 
-def get_new_awards(index: int, from_date: datetime | None, until_date: datetime | None = None) -> httpx.Response:
-    offset = index * app_settings.secop_pagination_limit
+def _get_new_awards_url(
+    index: int,
+    from_date: datetime | None,
+    until_date: datetime | None = None,
+    cursor: tuple[str | None, str] | None = None,
+) -> str:
     date_format = "%Y-%m-%dT%H:%M:%S.000"
 
-    base_url = (
-        f"{URLS['AWARDS']}?$limit={app_settings.secop_pagination_limit}&$offset={offset}"
-        "&$order=fecha_de_ultima_publicaci desc null last&$where="
-        " caseless_eq(`adjudicado`, 'Si')"
-    )
+    if app_settings.secop_keyset_pagination:
+        # The system field :id is a unique tie-breaker, but is returned only if selected.
+        select = _select("AWARDS")
+        select = f"{select},:id" if select else "&$select=:id,*"
+        base_url = (
+            f"{URLS['AWARDS']}?$limit={app_settings.secop_pagination_limit}{select}"
+            "&$order=fecha_de_ultima_publicaci desc null last,:id desc&$where="
+            " caseless_eq(`adjudicado`, 'Si')"
+        )
+        if cursor:
+            last_updated, row_id = (None if value is None else value.replace("'", "''") for value in cursor)
+            if last_updated is None:
+                base_url += f" AND fecha_de_ultima_publicaci IS NULL AND :id < '{row_id}'"
+            else:
+                base_url += (
+                    f" AND (fecha_de_ultima_publicaci < '{last_updated}' OR fecha_de_ultima_publicaci IS NULL"
+                    f" OR (fecha_de_ultima_publicaci = '{last_updated}' AND :id < '{row_id}'))"
+                )
+    else:
+        offset = index * app_settings.secop_pagination_limit
+        base_url = (
+            f"{URLS['AWARDS']}?$limit={app_settings.secop_pagination_limit}&$offset={offset}{_select('AWARDS')}"
+            "&$order=fecha_de_ultima_publicaci desc null last&$where="
+            " caseless_eq(`adjudicado`, 'Si')"
+        )
 
     if from_date and until_date:
         url = (
@@ -155,11 +347,63 @@ def get_new_awards(index: int, from_date: datetime | None, until_date: datetime
             f"OR fecha_adjudicacion > '{converted_date.strftime(date_format)}')"
         )
 
-    return sources.make_request_with_retry(url, HEADERS)
+    return url
+
+
+def get_cursor(entries: list[dict[str, Any]]) -> tuple[str | None, str] | None:
+    """
+    Return the position after which to request the next page of new awards, if
+    :attr:`~app.settings.Settings.secop_keyset_pagination` is set. Otherwise, return ``None``.
+
+    :param entries: The page of new awards.
+    :return: The ``fecha_de_ultima_publicaci`` and ``:id`` of the last award.
+    """
+    if not app_settings.secop_keyset_pagination or not entries:
+        return None
+    if ":id" not in entries[-1]:
+        raise SourceFormatError(f"Source award is missing the :id system field: data={entries[-1]}")
+    return entries[-1].get("fecha_de_ultima_publicaci"), entries[-1][":id"]
+
+
+def get_new_awards(
+    index: int,
+    from_date: datetime | None,
+    until_date: datetime | None = None,
+    cursor: tuple[str | None, str] | None = None,
+) -> httpx.Response:
+    """
+    Get a page of new awards.
+
+    :param index: The page number, if paginating by offset.
+    :param from_date: The date from which to get awards.
+    :param until_date: The date until which to get awards.
+    :param cursor: The return value of :func:`get_cursor` for the previous page, if paginating by keyset.
+    :return: The response object containing the new awards data.
+    """
+    return sources.make_request_with_retry(_get_new_awards_url(index, from_date, until_date, cursor), HEADERS)
+
+
+async def get_new_awards_async(
+    client: httpx.AsyncClient,
+    index: int,
+    from_date: datetime | None,
+    until_date: datetime | None = None,
+    cursor: tuple[str | None, str] | None = None,
+) -> httpx.Response:
+    """
+    Like :func:`app.sources.colombia.get_new_awards`, using an asynchronous client.
+
+    :param client: The client with which to make the request.
+    """
+    url = _get_new_awards_url(index, from_date, until_date, cursor)
+    return await sources.make_request_with_retry_async(client, url, HEADERS)
 
 
 def get_award_by_id_and_supplier(award_id: str, supplier_id: str) -> httpx.Response:
-    url = f"{URLS['AWARDS']}?$where=nit_del_proveedor_adjudicado = '{supplier_id}' AND id_adjudicacion = '{award_id}'"
+    url = (
+        f"{URLS['AWARDS']}?$where=nit_del_proveedor_adjudicado = '{supplier_id}' AND id_adjudicacion = '{award_id}'"
+        f"{_select('AWARDS')}"
+    )
     return sources.make_request_with_retry(url, HEADERS)
 
 
@@ -170,10 +414,27 @@ def get_previous_awards(supplier_id: str) -> httpx.Response:
     :param supplier_id: The document provider to get previous contracts data for.
     :return: The response object containing the previous awards data.
     """
-    url = f"{URLS['AWARDS']}?$where=nit_del_proveedor_adjudicado = '{supplier_id}'"
+    url = f"{URLS['AWARDS']}?$where=nit_del_proveedor_adjudicado = '{supplier_id}'{_select('AWARDS')}"
     return sources.make_request_with_retry(url, HEADERS)
 
 
+async def get_previous_awards_async(client: httpx.AsyncClient, supplier_id: str) -> httpx.Response:
+    """
+    Like :func:`app.sources.colombia.get_previous_awards`, using an asynchronous client.
+
+    :param client: The client with which to make the request.
+    """
+    url = f"{URLS['AWARDS']}?$where=nit_del_proveedor_adjudicado = '{supplier_id}'{_select('AWARDS')}"
+    return await sources.make_request_with_retry_async(client, url, HEADERS)
+
+
+def _get_borrower_url(supplier_id: str, entry: dict[str, str]) -> str:
+    return (
+        f"{URLS['BORROWER']}?nit_entidad={supplier_id}&codigo_entidad={entry.get('codigoproveedor', '')}"
+        f"{_select('BORROWER')}"
+    )
+
+
 def get_borrower(borrower_identifier: str, supplier_id: str, entry: dict[str, str]) -> dict[str, str]:
     """
     Get the borrower information from the source.
@@ -183,8 +444,25 @@ def get_borrower(borrower_identifier: str, supplier_id: str, entry: dict[str, st
     :param entry: The dictionary containing the borrower data.
     :return: The newly created borrower data as a dictionary.
     """
-    borrower_url = f"{URLS['BORROWER']}?nit_entidad={supplier_id}&codigo_entidad={entry.get('codigoproveedor', '')}"
+    borrower_url = _get_borrower_url(supplier_id, entry)
     borrower_response_json = util.loads(sources.make_request_with_retry(borrower_url, HEADERS))
+    return _get_borrower_data(borrower_identifier, borrower_response_json, borrower_url)
+
+
+async def get_borrower_async(
+    client: httpx.AsyncClient, borrower_identifier: str, supplier_id: str, entry: dict[str, str]
+) -> dict[str, str]:
+    """
+    Like :func:`app.sources.colombia.get_borrower`, using an asynchronous client.
+
+    :param client: The client with which to make the request.
+    """
+    borrower_url = _get_borrower_url(supplier_id, entry)
+    borrower_response_json = util.loads(await sources.make_request_with_retry_async(client, borrower_url, HEADERS))
+    return _get_borrower_data(borrower_identifier, borrower_response_json, borrower_url)
+
+
+def _get_borrower_data(borrower_identifier: str, borrower_response_json: Any, borrower_url: str) -> dict[str, str]:
     len_borrower_response_json = len(borrower_response_json)
 
     if len_borrower_response_json != 1:
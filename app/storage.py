@@ -0,0 +1,402 @@
+"""
+Store the contents of borrower documents once per SHA-256 digest.
+
+The key of the contents is their SHA-256 hex digest. Each :class:`~app.models.DocumentContent` counts the borrower
+documents that reference its contents, so that copying a document adds a reference instead of copying its contents.
+:attr:`~app.settings.Settings.document_storage` selects where new contents are stored.
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from collections.abc import Iterator, Mapping
+from functools import cache
+from pathlib import Path
+from typing import Any, BinaryIO, Self, cast
+
+import boto3
+from botocore.exceptions import ClientError
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, object_session
+
+from app import models
+from app.settings import app_settings
+
+CHUNK_SIZE = 64 * 1024  # 64 KiB
+
+
+def get_key(content: bytes) -> str:
+    """Return the key of the contents."""
+    return hashlib.sha256(content).hexdigest()
+
+
+class HashedFile:
+    """A readable file whose key and size are known, like an upload validated by :func:`app.util.validate_file`."""
+
+    def __init__(self, stream: BinaryIO, key: str, size: int):
+        #: The file, positioned at the start of its contents.
+        self.stream = stream
+        #: The key of the contents.
+        self.key = key
+        #: The size of the contents in bytes.
+        self.size = size
+
+    @classmethod
+    def from_bytes(cls, content: bytes) -> Self:
+        return cls(io.BytesIO(content), get_key(content), len(content))
+
+
+class Storage(ABC):
+    """A content-addressed store of the contents of borrower documents."""
+
+    def put(self, content: bytes) -> str:
+        """
+        Store the contents.
+
+        :param content: The contents.
+        :return: The key of the contents.
+        """
+        return self.put_file(HashedFile.from_bytes(content))
+
+    def put_file(self, file: HashedFile) -> str:
+        """
+        Store the file's contents, reading the file in chunks.
+
+        :param file: The file.
+        :return: The key of the contents.
+        """
+        self._put(file.key, file.stream)
+        return file.key
+
+    def read(self, key: str) -> bytes:
+        """Return the contents for the key."""
+        return b"".join(self.iter_bytes(key))
+
+    @abstractmethod
+    def _put(self, key: str, stream: BinaryIO) -> None:
+        pass
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """Return whether contents are stored for the key."""
+
+    @abstractmethod
+    def size(self, key: str) -> int:
+        """Return the size in bytes of the contents for the key."""
+
+    @abstractmethod
+    def iter_bytes(self, key: str, start: int = 0, stop: int | None = None) -> Iterator[bytes]:
+        """
+        Yield the contents for the key in chunks.
+
+        :param key: The key.
+        :param start: The offset of the first byte to read.
+        :param stop: The offset after the last byte to read, or None to read to the end.
+        """
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Delete the contents for the key, if any."""
+
+
+class LocalStorage(Storage):
+    """Store contents in a directory, at ``<path>/<first two characters of key>/<key>``."""
+
+    def __init__(self, path: str | Path):
+        #: The directory in which to store contents.
+        self.path = Path(path)
+
+    def _path(self, key: str) -> Path:
+        return self.path / key[:2] / key
+
+    def _put(self, key: str, stream: BinaryIO) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file and rename it, so that readers never see partial contents.
+        with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as f:
+            try:
+                while chunk := stream.read(CHUNK_SIZE):
+                    f.write(chunk)
+            except BaseException:
+                f.close()
+                os.unlink(f.name)
+                raise
+        os.replace(f.name, path)
+
+    def exists(self, key: str) -> bool:
+        return self._path(key).is_file()
+
+    def size(self, key: str) -> int:
+        return self._path(key).stat().st_size
+
+    def iter_bytes(self, key: str, start: int = 0, stop: int | None = None) -> Iterator[bytes]:
+        with self._path(key).open("rb") as f:
+            f.seek(start)
+            remaining = None if stop is None else max(stop - start, 0)
+            while remaining is None or remaining > 0:
+                chunk = f.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def delete(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+
+
+class S3Storage(Storage):
+    """Store contents in an S3-compatible bucket, with the key as the object key."""
+
+    def __init__(self, bucket: str, client: Any):
+        #: The name of the bucket.
+        self.bucket = bucket
+        #: A boto3 client for S3.
+        self.client = client
+
+    def _put(self, key: str, stream: BinaryIO) -> None:
+        # Large files are uploaded in parts.
+        self.client.upload_fileobj(stream, self.bucket, key)
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in {"404", "NoSuchKey"}:
+                return False
+            raise
+        return True
+
+    def size(self, key: str) -> int:
+        return cast("int", self.client.head_object(Bucket=self.bucket, Key=key)["ContentLength"])
+
+    def iter_bytes(self, key: str, start: int = 0, stop: int | None = None) -> Iterator[bytes]:
+        if stop is not None and stop <= start:
+            return
+        kwargs: dict[str, Any] = {}
+        if start or stop is not None:
+            kwargs["Range"] = f"bytes={start}-{'' if stop is None else stop - 1}"
+        yield from self.client.get_object(Bucket=self.bucket, Key=key, **kwargs)["Body"].iter_chunks(CHUNK_SIZE)
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+
+@cache
+def get_storage() -> Storage | None:
+    """
+    Return the backend configured by :attr:`~app.settings.Settings.document_storage`, or None if contents are stored
+    in the database.
+
+    :raise ValueError: If the setting is not "database", "local" or "s3".
+    """
+    match app_settings.document_storage:
+        case "database":
+            return None
+        case "local":
+            return LocalStorage(app_settings.document_storage_path)
+        case "s3":
+            return S3Storage(
+                app_settings.document_storage_bucket,
+                boto3.client(
+                    "s3",
+                    region_name=app_settings.aws_region,
+                    aws_access_key_id=app_settings.aws_access_key,
+                    aws_secret_access_key=app_settings.aws_client_secret,
+                    endpoint_url=app_settings.document_storage_endpoint_url or None,
+                ),
+            )
+        case _:
+            raise ValueError(
+                f"DOCUMENT_STORAGE must be 'database', 'local' or 's3', not {app_settings.document_storage!r}"
+            )
+
+
+def get_storage_or_raise() -> Storage:
+    """
+    Return the configured backend.
+
+    :raise RuntimeError: If contents are stored in the database.
+    """
+    if storage := get_storage():
+        return storage
+    raise RuntimeError("Contents are in document storage, but DOCUMENT_STORAGE is 'database'")
+
+
+def _lock(session: Session, key: str) -> None:
+    # Serialize the storing and deleting of the same contents, until the end of the transaction.
+    session.execute(select(func.pg_advisory_xact_lock(func.hashtext(key))))
+
+
+def add_content(session: Session, file: HashedFile) -> str:
+    """
+    Add a reference to the file's contents, storing the contents if they have no other references.
+
+    Assign the key to a borrower document's ``storage_key``.
+
+    :param file: The contents of a borrower document.
+    :return: The key of the contents.
+    """
+    _lock(session, file.key)
+
+    storage = get_storage()
+    # Commit a row without references in another transaction, before storing the contents. If this transaction is
+    # rolled back, the row remains, so that delete_unreferenced_contents() deletes the contents. Skip this if a row
+    # exists, in which case the other transaction would wait for this transaction, if it updated the row.
+    exists = session.query(models.DocumentContent.key).filter(models.DocumentContent.key == file.key).first()
+    if storage and not exists:
+        with Session(session.get_bind()) as other_session:
+            other_session.execute(
+                insert(models.DocumentContent)
+                .values(key=file.key, refcount=0, updated_at=func.now())
+                .on_conflict_do_nothing(index_elements=[models.DocumentContent.key])
+            )
+            other_session.commit()
+
+    refcount = session.execute(
+        insert(models.DocumentContent)
+        .values(key=file.key, refcount=1, updated_at=func.now())
+        .on_conflict_do_update(
+            index_elements=[models.DocumentContent.key],
+            set_={"refcount": models.DocumentContent.refcount + 1, "updated_at": func.now()},
+        )
+        .returning(models.DocumentContent.refcount)
+    ).scalar_one()
+
+    # Store the contents even if a row existed with no references, in case its contents were being deleted.
+    if refcount == 1:
+        if storage:
+            storage.put_file(file)
+        else:
+            # The contents must be read into memory, to be stored in the database.
+            session.query(models.DocumentContent).filter(models.DocumentContent.key == file.key).update(
+                {models.DocumentContent.content: file.stream.read()}, synchronize_session=False
+            )
+
+    return file.key
+
+
+def copy_content(session: Session, document: models.BorrowerDocument) -> str:
+    """
+    Add a reference to the borrower document's contents, for a copy of the document.
+
+    If the contents are in the document's ``file`` column, they are first moved to a
+    :class:`~app.models.DocumentContent`.
+
+    :param document: The borrower document to copy.
+    :return: The key of the contents, to assign to the copy's ``storage_key``.
+    """
+    if not document.storage_key:
+        document.storage_key = add_content(session, HashedFile.from_bytes(document.file or b""))
+        document.file = None
+    add_references(session, {document.storage_key: 1})
+    return document.storage_key
+
+
+def add_references(session: Session, counts: Mapping[str, int]) -> None:
+    """
+    Add references to contents, like when copying borrower documents.
+
+    :param counts: The number of references to add, by key.
+    """
+    for key, count in counts.items():
+        session.query(models.DocumentContent).filter(models.DocumentContent.key == key).update(
+            {models.DocumentContent.refcount: models.DocumentContent.refcount + count}, synchronize_session=False
+        )
+
+
+def remove_references(session: Session, counts: Mapping[str, int]) -> None:
+    """
+    Remove references to contents, like when deleting borrower documents or replacing their contents.
+
+    Contents without references are deleted by :func:`app.storage.delete_unreferenced_contents`.
+
+    :param counts: The number of references to remove, by key.
+    """
+    add_references(session, {key: -count for key, count in counts.items()})
+
+
+def delete_unreferenced_contents(session: Session) -> None:
+    """
+    Delete the contents without references, and commit.
+
+    The rows are deleted in one transaction. The contents in document storage are deleted after, each while holding
+    the lock taken by :func:`app.storage.add_content`, unless the contents were added again in the meantime.
+    """
+    keys = (
+        session.execute(
+            delete(models.DocumentContent)
+            .where(models.DocumentContent.refcount <= 0)
+            .returning(models.DocumentContent.key)
+        )
+        .scalars()
+        .all()
+    )
+    session.commit()
+
+    if storage := get_storage():
+        for key in keys:
+            _lock(session, key)
+            if not session.query(models.DocumentContent.key).filter(models.DocumentContent.key == key).first():
+                storage.delete(key)
+            session.commit()
+
+
+def _get_session(document: models.BorrowerDocument) -> Session:
+    if isinstance(session := object_session(document), Session):
+        return session
+    raise RuntimeError("The document is not in a session")
+
+
+def get_document_size(document: models.BorrowerDocument) -> int:
+    """Return the size in bytes of the contents of the borrower document, without reading the contents."""
+    session = _get_session(document)
+    if document.storage_key:
+        size = (
+            session.query(func.length(models.DocumentContent.content))
+            .filter(models.DocumentContent.key == document.storage_key)
+            .scalar()
+        )
+        if size is None:
+            return get_storage_or_raise().size(document.storage_key)
+        return cast("int", size)
+    return cast(
+        "int",
+        session.query(func.length(models.BorrowerDocument.file))
+        .filter(models.BorrowerDocument.id == document.id)
+        .scalar(),
+    )
+
+
+def iter_document(document: models.BorrowerDocument, start: int = 0, stop: int | None = None) -> Iterator[bytes]:
+    """
+    Yield the contents of the borrower document in chunks, wherever they are stored.
+
+    Contents in the database are read one chunk per query, so that only one chunk is held in memory.
+
+    :param document: The borrower document.
+    :param start: The offset of the first byte to read.
+    :param stop: The offset after the last byte to read, or None to read to the end.
+    """
+    session = _get_session(document)
+    if document.storage_key:
+        column: Any = models.DocumentContent.content
+        condition: Any = models.DocumentContent.key == document.storage_key
+    else:
+        column = models.BorrowerDocument.file
+        condition = models.BorrowerDocument.id == document.id
+
+    size = session.query(func.length(column)).filter(condition).scalar()
+    if size is None:
+        if document.storage_key:
+            yield from get_storage_or_raise().iter_bytes(document.storage_key, start, stop)
+        return
+
+    end: int = size if stop is None else min(stop, size)
+    for offset in range(start, end, CHUNK_SIZE):
+        # PostgreSQL's substring() is 1-indexed.
+        chunk = session.query(func.substring(column, offset + 1, min(CHUNK_SIZE, end - offset))).filter(condition)
+        yield bytes(chunk.scalar())
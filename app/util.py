@@ -1,32 +1,48 @@
+import asyncio
 import base64
 import hashlib
 import hmac
+import io
 import os.path
 import uuid
-from collections.abc import Callable, Generator
+import zipfile
+from collections.abc import Callable, Generator, Iterable
 from contextlib import contextmanager
 from datetime import datetime
 from enum import Enum, StrEnum
-from typing import Any, TypeVar
+from typing import IO, TYPE_CHECKING, Any, TypeVar, cast
 
 import httpx
 import orjson
 from email_validator import EmailNotValidError, validate_email
 from fastapi import File, HTTPException, UploadFile, status
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from sqlmodel import col
 from starlette.responses import RedirectResponse
 
-from app import models
-from app.db import get_db, handle_skipped_award, rollback_on_error
+import app.utils.statistics as statistics_utils
+from app import models, serializers, storage
+from app.db import get_db, handle_skipped_award, rollback_on_error, violates_unique_constraint
 from app.exceptions import SkippedAwardError
 from app.i18n import _
 from app.settings import app_settings
+from app.sources import AsyncClient
 from app.sources import colombia as data_access
 
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Query
+
 T = TypeVar("T")
 MAX_FILE_SIZE = app_settings.max_file_size_mb * 1024 * 1024  # MB in bytes
 ALLOWED_EXTENSIONS = {".png", ".pdf", ".jpeg", ".jpg", ".zip"}
+# The first bytes of PNG, JPEG and ZIP (non-empty and empty) files.
+ALLOWED_SIGNATURES = (b"\x89PNG\r\n\x1a\n", b"\xff\xd8\xff", b"PK\x03\x04", b"PK\x05\x06")
+# PDF readers accept a PDF header anywhere in the first 1024 bytes.
+PDF_SIGNATURE = b"%PDF-"
+PDF_SIGNATURE_WINDOW = 1024
+UPLOAD_CHUNK_SIZE = 64 * 1024  # 64 KiB
+ZIP_CHUNK_SIZE = 64 * 1024  # 64 KiB
 
 
 # https://fastapi.tiangolo.com/tutorial/path-operation-configuration/#tags-with-enums
@@ -44,6 +60,15 @@ class SortOrder(StrEnum):
     DESC = "desc"
 
 
+class CountMode(StrEnum):
+    #: Count the matching items on every request.
+    EXACT = "exact"
+    #: Count the matching items, and cache the count until an application changes status or the cache expires.
+    #:
+    #: .. seealso:: :data:`app.utils.statistics.cache`
+    CACHED = "cached"
+
+
 class StatisticRange(StrEnum):
     CUSTOM_RANGE = "CUSTOM_RANGE"
     LAST_WEEK = "LAST_WEEK"
@@ -96,16 +121,25 @@ def is_valid_email(email: str) -> bool:
         return False
 
 
-def validate_file(file: UploadFile = File(...)) -> tuple[bytes, str | None]:
+def _has_allowed_signature(chunk: bytes) -> bool:
+    # The PDF header must start within the window.
+    pdf_end = PDF_SIGNATURE_WINDOW + len(PDF_SIGNATURE) - 1
+    return chunk.startswith(ALLOWED_SIGNATURES) or PDF_SIGNATURE in chunk[:pdf_end]
+
+
+def validate_file(file: UploadFile = File(...)) -> tuple[storage.HashedFile, str | None]:
     """
     Validate the uploaded file.
 
-    This function checks whether the file has an allowed format and whether its size is below the maximum allowed size.
+    This function checks whether the file has an allowed format, both by its extension and by its first bytes (or, for
+    PDF files, a header in its first 1024 bytes), and whether its size is below the maximum allowed size. The file is
+    read in chunks, and rejected as soon as it is too large. Its key is computed while reading. An empty file is
+    rejected.
 
     If the file does not pass these checks, raise an HTTPException. Otherwise, return the file and its filename.
 
     :param file: The uploaded file.
-    :return: A dictionary mapping the file to its filename.
+    :return: The file, rewound, and its filename.
     :raise HTTPException: If the file format is not allowed or if the file size is too large.
     """
     filename = file.filename
@@ -116,13 +150,205 @@ def validate_file(file: UploadFile = File(...)) -> tuple[bytes, str | None]:
             status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
             detail=_("Format not allowed. It must be a PNG, JPEG, PDF or ZIP file"),
         )
-    new_file = file.file.read()
-    if len(new_file) >= MAX_FILE_SIZE:
+
+    digest = hashlib.sha256()
+    size = 0
+    while chunk := file.file.read(UPLOAD_CHUNK_SIZE):
+        if not size and not _has_allowed_signature(chunk):
+            break
+        size += len(chunk)
+        if size >= MAX_FILE_SIZE:
+            raise HTTPException(
+                status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+                detail=_("File is too large"),
+            )
+        digest.update(chunk)
+    # The file is empty, or its first bytes aren't those of an allowed format.
+    if not size:
         raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=_("File is too large"),
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail=_("Format not allowed. It must be a PNG, JPEG, PDF or ZIP file"),
+        )
+
+    file.file.seek(0)
+    return storage.HashedFile(file.file, digest.hexdigest(), size), filename
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """
+    Parse an HTTP ``Range`` header with a single byte range.
+
+    :param header: The header's value.
+    :param size: The size in bytes of the resource.
+    :return: The offsets of the first byte and after the last byte, or None if the header is absent or unsupported.
+    :raise HTTPException: If the range is not satisfiable.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _sep, last = header.removeprefix("bytes=").strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            stop = min(int(last) + 1, size) if last else size
+        elif last:  # suffix range
+            start = max(size - int(last), 0)
+            stop = size
+        else:
+            return None
+    except ValueError:
+        return None
+    if start >= stop:
+        raise HTTPException(
+            status_code=status.HTTP_416_RANGE_NOT_SATISFIABLE,
+            detail=_("Range not satisfiable"),
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, stop
+
+
+class _ZipBuffer(io.RawIOBase):
+    """A write-only, unseekable stream, whose written bytes are removed by :meth:`~app.util._ZipBuffer.drain`."""
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b: Any) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(files: Iterable[tuple[str, bytes | memoryview | Iterable[bytes]]]) -> Generator[bytes, None, None]:
+    """
+    Yield the bytes of a ZIP file containing the files, as the files are written.
+
+    Only one file's contents are held at a time, if ``files`` is a generator, or only one chunk, if a file's contents
+    are an iterable of chunks. The files are stored without compression, and their sizes are written after their
+    contents, as the output isn't seekable.
+
+    :param files: The filenames and contents of the files.
+    """
+    buffer = _ZipBuffer()
+    with zipfile.ZipFile(cast("IO[bytes]", buffer), "w") as zip_file:
+        for filename, content in files:
+            if isinstance(content, bytes | memoryview):
+                view = memoryview(content)
+                chunks: Iterable[bytes | memoryview] = (
+                    view[start : start + ZIP_CHUNK_SIZE] for start in range(0, len(view), ZIP_CHUNK_SIZE)
+                )
+            else:
+                chunks = content
+            with zip_file.open(filename, "w") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield buffer.drain()
+            yield buffer.drain()
+    # The central directory.
+    yield buffer.drain()
+
+
+def encode_cursor(values: list[Any]) -> str:
+    """
+    Encode values as an opaque pagination cursor.
+
+    :param values: JSON-serializable values. Other values, like decimals, are serialized as strings.
+    :return: The cursor.
+    """
+    return base64.urlsafe_b64encode(orjson.dumps(values, default=str)).decode()
+
+
+def decode_cursor(cursor: str, length: int) -> list[Any]:
+    """
+    Decode a pagination cursor.
+
+    :param cursor: The cursor, from :func:`app.util.encode_cursor`.
+    :param length: The expected number of values.
+    :return: The values.
+    :raise HTTPException: If the cursor is invalid.
+    """
+    try:
+        values = orjson.loads(base64.urlsafe_b64decode(cursor))
+    except ValueError:  # binascii.Error and orjson.JSONDecodeError
+        values = None
+    if not isinstance(values, list) or len(values) != length:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_CONTENT, detail=_("Invalid cursor"))
+    return values
+
+
+def get_application_list(
+    session: Session,
+    primary_session: Session,
+    *,
+    page: int,
+    page_size: int,
+    sort_field: str,
+    sort_order: str,
+    search_value: str,
+    cursor: str | None,
+    count: CountMode,
+    lender_id: int | None = None,
+) -> serializers.ApplicationListResponse:
+    """
+    Return a page of submitted applications.
+
+    The applications are read with ``session``, typically on the read replica. The count is cached, if requested, and
+    is read with ``primary_session`` after the cache is cleared (see :func:`app.utils.statistics.get_cached`).
+
+    If a cursor is provided, return the applications after the cursor (keyset pagination), ignoring the page number.
+    Keyset pagination reads only the rows of the page, however deep the page. The response's ``next_cursor`` is the
+    cursor of the next page, or None if this is the last page.
+
+    :raise HTTPException: If the cursor is invalid, or if it was returned for a different sort field or order.
+    """
+    after = None
+    if cursor:
+        cursor_sort_field, cursor_sort_order, value, application_id = decode_cursor(cursor, 4)
+        if cursor_sort_field != sort_field or cursor_sort_order != sort_order:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_CONTENT, detail=_("Invalid cursor"))
+        after = (value, application_id)
+
+    def _search(session: Session, after: tuple[Any, int] | None = None) -> "Query[models.Application]":
+        return models.Application.submitted_search(
+            session,
+            search_value=search_value,
+            sort_field=sort_field,
+            sort_order=sort_order,
+            lender_id=lender_id,
+            after=after,
         )
-    return new_file, filename
+
+    # The count is not filtered by the cursor, so it doesn't change from page to page.
+    if count == CountMode.CACHED:
+        total_count = statistics_utils.get_cached(
+            ("applications", lender_id, search_value),
+            lambda session: _search(session).count(),
+            session,
+            primary_session,
+        )
+    else:
+        total_count = _search(session).count()
+
+    applications = _search(session, after).limit(page_size).offset(0 if after else page * page_size).all()
+
+    next_cursor = None
+    if len(applications) == page_size:
+        last = applications[-1]
+        next_cursor = encode_cursor([sort_field, sort_order, models.get_sort_value(last, sort_field), last.id])
+
+    return serializers.ApplicationListResponse(
+        items=cast("list[models.ApplicationWithRelations]", applications),
+        count=total_count,
+        page=page,
+        page_size=page_size,
+        next_cursor=next_cursor,
+    )
 
 
 def get_modified_data_fields(session: Session, application: models.Application) -> models.ApplicationWithRelations:
@@ -167,7 +393,12 @@ def get_modified_data_fields(session: Session, application: models.Application)
 
 
 def create_award_from_data_source(
-    session: Session, entry: dict[str, Any], borrower_id: int | None = None, *, previous: bool = False
+    session: Session,
+    entry: dict[str, Any],
+    borrower_id: int | None = None,
+    *,
+    previous: bool = False,
+    data: dict[str, Any] | None = None,
 ) -> models.Award:
     """
     Create a new award and insert it into the database.
@@ -175,9 +406,11 @@ def create_award_from_data_source(
     :param entry: The dictionary containing the award data.
     :param borrower_id: The ID of the borrower associated with the award. (default: None)
     :param previous: Whether the award is a previous award or not. (default: False)
+    :param data: The award data, if already retrieved with :func:`app.sources.colombia.get_award`. (default: None)
     :return: The inserted award.
     """
-    data = data_access.get_award(entry, borrower_id, previous=previous)
+    if data is None:
+        data = data_access.get_award(entry, borrower_id, previous=previous)
     if award := models.Award.first_by(session, "source_contract_id", data["source_contract_id"]):
         raise SkippedAwardError(
             "Award already exists",
@@ -188,7 +421,19 @@ def create_award_from_data_source(
             },
         )
 
-    return models.Award.create(session, **data)
+    try:
+        return models.Award.create(session, **data)
+    except IntegrityError as e:
+        # Another transaction created the award after the check.
+        if not violates_unique_constraint(e, "ix_award_source_contract_id"):
+            raise
+        raise SkippedAwardError(
+            "Award already exists",
+            data={
+                "lookup": {"source_contract_id": data["source_contract_id"]},
+                "create": {"entry": entry, "borrower_id": borrower_id, "previous": previous},
+            },
+        ) from None
 
 
 # A background task.
@@ -205,23 +450,37 @@ def get_previous_awards_from_data_source(
     with contextmanager(db_provider)() as session:
         borrower = models.Borrower.get(session, borrower_id)
 
-    awards_response_json = loads(data_access.get_previous_awards(borrower.legal_identifier))
-    if not awards_response_json:
-        return
-
-    for entry in awards_response_json:
+    # Request the contracts of all awards concurrently, then create the awards serially, in the original order.
+    for entry, data in asyncio.run(_get_previous_awards(borrower.legal_identifier, borrower_id)):
         with contextmanager(db_provider)() as session, handle_skipped_award(session, "Error creating award"):
-            create_award_from_data_source(session, entry, borrower.id, previous=True)
+            if isinstance(data, BaseException):
+                raise data
+            create_award_from_data_source(session, entry, borrower.id, previous=True, data=data)
 
             session.commit()
 
 
+async def _get_previous_awards(
+    supplier_id: str, borrower_id: int
+) -> list[tuple[dict[str, Any], dict[str, Any] | BaseException]]:
+    async with AsyncClient() as client:
+        awards_response_json = loads(await data_access.get_previous_awards_async(client, supplier_id))
+        results = await asyncio.gather(
+            *(
+                data_access.get_award_async(client, entry, borrower_id, previous=True)
+                for entry in awards_response_json
+            ),
+            return_exceptions=True,
+        )
+    return list(zip(awards_response_json, results, strict=True))
+
+
 def create_or_update_borrower_document(
     session: Session,
     filename: str | None,
     application: models.Application,
     borrower_document_type: models.BorrowerDocumentType,
-    file: bytes,
+    file: storage.HashedFile,
     *,
     verified: bool | None = False,
 ) -> models.BorrowerDocument:
@@ -231,6 +490,7 @@ def create_or_update_borrower_document(
     This function first checks if a document of the same type already exists for the application in the session.
     If it does, it updates the existing document's file, name, verified status, and submission time with the provided
     values. If it doesn't, it creates a new BorrowerDocument with the provided values and adds it to the session.
+    The file's contents are stored once per SHA-256 digest (see :mod:`app.storage`).
 
     :param filename: The name of the file to be added or updated.
     :param application: The application associated with the document.
@@ -248,10 +508,15 @@ def create_or_update_borrower_document(
         .first()
     )
 
+    storage_key = storage.add_content(session, file)
+
     if existing_document:
+        if existing_document.storage_key:
+            storage.remove_references(session, {existing_document.storage_key: 1})
         return existing_document.update(
             session,
-            file=file,
+            file=None,
+            storage_key=storage_key,
             name=filename,
             verified=verified,
             submitted_at=datetime.utcnow(),
@@ -261,7 +526,7 @@ def create_or_update_borrower_document(
         session,
         application_id=application.id,
         type=borrower_document_type,
-        file=file,
+        storage_key=storage_key,
         name=filename,
         verified=verified,
     )
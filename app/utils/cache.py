@@ -0,0 +1,95 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from concurrent.futures import Future
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """
+    A thread-safe, bounded cache of function results, evicting the least recently used entry when full, and expiring
+    entries some seconds after they are set.
+
+    If the function raises one of the ``cached_exceptions``, the exception is cached like a result. Concurrent calls
+    for the same key wait for the first call to complete, instead of calling the function again.
+
+    Each call is logged at the DEBUG level, with the running numbers of hits and misses.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        cached_exceptions: tuple[type[BaseException], ...] = (),
+    ):
+        #: The maximum number of entries.
+        self.maxsize = maxsize
+        #: The number of seconds after which an entry expires.
+        self.ttl = ttl
+        #: The number of calls that returned a cached result or exception.
+        self.hits = 0
+        #: The number of calls that called the function.
+        self.misses = 0
+
+        self._cached_exceptions = cached_exceptions
+        self._cleared_at = float("-inf")
+        self._entries: OrderedDict[Hashable, tuple[float, Future[Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, function: Callable[..., Any], *args: Any) -> Any:
+        """
+        Return the cached result for the key, or call the function with the arguments and cache its result.
+
+        :param key: The cache key.
+        :param function: The function to call on a miss.
+        :return: The result of the function.
+        :raises: The cached exception, if any.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                future = entry[1]
+                owner = False
+            else:
+                future = Future()
+                self._entries[key] = (time.monotonic() + self.ttl, future)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                self.misses += 1
+                owner = True
+            hits, misses = self.hits, self.misses
+
+        logger.debug("Cache %s for %r (%d hits, %d misses)", "miss" if owner else "hit", key, hits, misses)
+
+        if owner:
+            try:
+                future.set_result(function(*args))
+            except self._cached_exceptions as e:
+                future.set_exception(e)
+            except BaseException as e:
+                # Don't cache unexpected exceptions, like network errors.
+                with self._lock:
+                    if self._entries.get(key, (None, None))[1] is future:
+                        del self._entries[key]
+                future.set_exception(e)
+                raise
+
+        return future.result()
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+            self._cleared_at = time.monotonic()
+
+    def cleared_recently(self) -> bool:
+        """Return whether the cache was cleared less than ``ttl`` seconds ago."""
+        with self._lock:
+            return time.monotonic() - self._cleared_at < self.ttl
@@ -1,44 +1,98 @@
-from collections.abc import Callable
-from datetime import datetime
+from collections.abc import Callable, Hashable
+from datetime import date, datetime, time, timedelta
+from decimal import ROUND_DOWN, ROUND_HALF_UP, Decimal
 from typing import Any
 
-from sqlalchemy import Integer, distinct, func, text, true
+from sqlalchemy import Boolean, and_, cast, distinct, func, true
 from sqlalchemy.orm import Query, Session
+from sqlalchemy.sql.elements import ColumnElement, Label
 from sqlmodel import col
 
-from app.models import Application, ApplicationStatus, Award, Borrower, BorrowerSize, CreditProduct, CreditType, Lender
+from app.models import (
+    Application,
+    ApplicationStatus,
+    Award,
+    Borrower,
+    BorrowerSize,
+    CreditProduct,
+    CreditType,
+    Lender,
+    StatisticSnapshot,
+)
 from app.serializers import StatisticData
+from app.settings import app_settings
+from app.utils.cache import TTLCache
 
+#: The results of the statistics endpoints, keyed by ``(endpoint, initial_date, final_date, lender_id, custom_range)``,
+#: and the counts of the application list endpoints (see :class:`app.util.CountMode`). The cache is per process. Its
+#: ``hits`` and ``misses`` attributes count the calls that used or filled the cache, and are logged on each call by the
+#: ``app.utils.cache`` logger, at the DEBUG level.
+#:
+#: .. seealso:: :attr:`~app.settings.Settings.statistics_cache_ttl`
+cache = TTLCache(maxsize=app_settings.statistics_cache_size, ttl=app_settings.statistics_cache_ttl)
 
-def _get_base_query(
-    session_base: "Query[Application]",
+
+def get_cached(
+    key: Hashable, function: Callable[..., Any], read_session: Session, session: Session, *args: Any
+) -> Any:
+    """
+    Return the cached result for the key, or call the function with a session and the arguments and cache its result.
+
+    The cache is cleared when an application changes status, after the change is committed on the primary. The read
+    replica can lag behind the primary, so the function is called with the session on the primary if the cache was
+    cleared less than ``ttl`` seconds ago, and with the read session, otherwise. That way, a result from before the
+    change isn't cached for the full TTL.
+
+    :param key: The cache key.
+    :param function: The function to call on a miss, with a session as its first argument.
+    :param read_session: A session on the read replica.
+    :param session: A session on the primary.
+    :return: The result of the function.
+    """
+
+    def fill(*args: Any) -> Any:
+        if cache.cleared_recently():
+            return function(session, *args)
+        return function(read_session, *args)
+
+    return cache.get(key, fill, *args)
+
+
+#: The reasons that a borrower can give for declining an invitation, in the order in which they are displayed.
+DECLINED_REASONS = (
+    "dont_need_access_credit",
+    "already_have_acredit",
+    "preffer_to_go_to_bank",
+    "dont_want_access_credit",
+    "suspicious_email",
+    "other",
+)
+
+
+def _get_base_filter(
     start_date: datetime | str | None,
     end_date: datetime | str | None,
     lender_id: int | None,
-) -> "Query[Application]":
+) -> ColumnElement[Boolean]:
     """
-    Create the base query for filtering applications based on the provided start_date, end_date, and lender_id.
-
-    This function creates the base query for filtering applications from the database. The filtering is based on
-    the provided start_date, end_date, and lender_id (if available).
+    Create the condition for filtering applications based on the provided start_date, end_date, and lender_id.
 
-    :param session_base: The base query representing the Application model.
     :param start_date: The start date for filtering applications. (default: None)
     :param end_date: The end date for filtering applications. (default: None)
     :param lender_id: The ID of the lender for filtering applications. (default: None)
-    :return: The base query for filtering applications.
+    :return: The condition for filtering applications.
     """
-    base_query = session_base
+    conditions = []
 
     if start_date:
-        base_query = base_query.filter(col(Application.created_at) >= start_date)
+        conditions.append(col(Application.created_at) >= start_date)
     if end_date:
-        base_query = base_query.filter(col(Application.created_at) <= end_date)
+        conditions.append(col(Application.created_at) <= end_date)
 
     if lender_id:
-        base_query = base_query.filter(Application.lender_id == lender_id)
+        conditions.append(col(Application.lender_id) == lender_id)
 
-    return base_query
+    return and_(true(), *conditions)
 
 
 def _truncate_round(number: float) -> int | float:
@@ -48,13 +102,85 @@ def _truncate_round(number: float) -> int | float:
     return int(number)
 
 
-def _scalar_or_zero(
-    query: Query[Application] | Query[Borrower], formatter: Callable[[float], int | float] | None = None
-) -> int | float:
-    scalar = query.scalar() or 0
-    if formatter:
-        return formatter(scalar)
-    return scalar
+def get_general_statistics_columns(condition: ColumnElement[Boolean]) -> list[Label[Any]]:
+    """
+    Return the components of the general statistics, for the applications matching the condition.
+
+    The components are counts and sums, which can be added across queries. Their labels match the fields of
+    :class:`app.models.StatisticSnapshot`. A query with these columns must outer join
+    :class:`~app.models.CreditProduct`.
+
+    :param condition: The condition for filtering applications.
+    :return: The labelled columns.
+    """
+    accepted = col(Application.borrower_accepted_at).isnot(None)
+    submitted = col(Application.borrower_submitted_at).isnot(None)
+    loan = and_(submitted, CreditProduct.type == CreditType.LOAN)
+    completed = col(Application.status).in_((ApplicationStatus.APPROVED, ApplicationStatus.REJECTED))
+    in_progress = col(Application.status).in_((ApplicationStatus.STARTED, ApplicationStatus.INFORMATION_REQUESTED))
+    repayment_period = col(Application.repayment_years) * 12 + col(Application.repayment_months)
+
+    return [
+        func.count(Application.id).filter(condition, submitted).label("received"),
+        func.count(Application.id)
+        .filter(condition, Application.status == ApplicationStatus.REJECTED)
+        .label("rejected"),
+        func.count(Application.id)
+        .filter(condition, Application.status == ApplicationStatus.INFORMATION_REQUESTED)
+        .label("waiting_for_information"),
+        func.count(Application.id).filter(condition, in_progress).label("in_progress"),
+        func.count(Application.id)
+        .filter(condition, Application.status == ApplicationStatus.APPROVED)
+        .label("credit_disbursed"),
+        func.count(Application.id).filter(condition, col(Application.overdued_at).isnot(None)).label("overdue"),
+        func.coalesce(func.sum(Application.amount_requested).filter(condition), 0).label("amount_requested_sum"),
+        func.count(Application.amount_requested).filter(condition).label("amount_requested_count"),
+        func.coalesce(func.sum(repayment_period).filter(condition, loan), 0).label("repayment_period_sum"),
+        func.count(repayment_period).filter(condition, loan).label("repayment_period_count"),
+        func.coalesce(func.sum(Application.completed_in_days).filter(condition, completed), 0).label(
+            "processing_time_sum"
+        ),
+        func.count(Application.completed_in_days).filter(condition, completed).label("processing_time_count"),
+        func.count(Application.id).filter(condition, accepted).label("accepted"),
+    ]
+
+
+def _average(total: Decimal | int, count: int, rounding: str = ROUND_DOWN) -> int:
+    if not count:
+        return 0
+    return int((Decimal(total) / count).quantize(Decimal(1), rounding=rounding))
+
+
+def _format_general_statistics(components: dict[str, Any]) -> dict[str, int | float]:
+    return {
+        "applications_received_count": components["received"],
+        "applications_rejected_count": components["rejected"],
+        "applications_waiting_for_information_count": components["waiting_for_information"],
+        "applications_in_progress_count": components["in_progress"],
+        "applications_with_credit_disbursed_count": components["credit_disbursed"],
+        "average_amount_requested": _average(components["amount_requested_sum"], components["amount_requested_count"]),
+        # PostgreSQL rounds half away from zero when casting to an integer.
+        "average_repayment_period": _average(
+            components["repayment_period_sum"], components["repayment_period_count"], ROUND_HALF_UP
+        ),
+        "applications_overdue_count": components["overdue"],
+        "average_processing_time": _average(components["processing_time_sum"], components["processing_time_count"]),
+        "proportion_of_submitted_out_of_opt_in": (
+            round((components["received"] / components["opt_in"]) * 100, 2) if components["opt_in"] else 0.0
+        ),
+    }
+
+
+def _query_general_statistics(
+    session: Session, condition: ColumnElement[Boolean], lender_id: int | None
+) -> Query[Any]:
+    # The denominator of the proportion is not filtered by date or lender.
+    column = Application.borrower_accepted_at if lender_id is None else Application.borrower_submitted_at
+
+    return session.query(
+        *get_general_statistics_columns(condition),
+        func.count(Application.id).filter(col(column).isnot(None)).label("opt_in"),
+    ).outerjoin(CreditProduct, CreditProduct.id == Application.credit_product_id)
 
 
 def get_general_statistics(
@@ -74,63 +200,82 @@ def get_general_statistics(
     :param lender_id: The ID of the lender for filtering applications. (default: None)
     :return: A dictionary containing the general statistics about applications.
     """
-    base_query = _get_base_query(session.query(Application.id), start_date, end_date, lender_id)
+    # Calculate all statistics in a single scan, instead of one query per statistic.
+    row = _query_general_statistics(session, _get_base_filter(start_date, end_date, lender_id), lender_id).one()
 
-    application_received_count = base_query.filter(col(Application.borrower_submitted_at).isnot(None)).count()
+    return _format_general_statistics(row._asdict())
 
-    applications_with_credit_disbursed_count = base_query.filter(
-        Application.status == ApplicationStatus.APPROVED
-    ).count()
 
-    column = Application.borrower_accepted_at if lender_id is None else Application.borrower_submitted_at
-    application_submitted_count = session.query(Application.id).filter(col(column).isnot(None)).count()
-    if application_submitted_count:
-        proportion_of_submitted_out_of_opt_in = round(
-            (application_received_count / application_submitted_count) * 100, 2
-        )
-    else:
-        proportion_of_submitted_out_of_opt_in = 0.0
+def _as_day(value: datetime | str | None) -> date | None:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value is None or value.time() != time():
+        return None
+    return value.date()
 
-    return {
-        "applications_received_count": application_received_count,
-        "applications_rejected_count": base_query.filter(Application.status == ApplicationStatus.REJECTED).count(),
-        "applications_waiting_for_information_count": base_query.filter(
-            Application.status == ApplicationStatus.INFORMATION_REQUESTED
-        ).count(),
-        "applications_in_progress_count": base_query.filter(
-            col(Application.status).in_((ApplicationStatus.STARTED, ApplicationStatus.INFORMATION_REQUESTED))
-        ).count(),
-        "applications_with_credit_disbursed_count": applications_with_credit_disbursed_count,
-        "average_amount_requested": _scalar_or_zero(
-            _get_base_query(
-                session.query(func.avg(Application.amount_requested)), start_date, end_date, lender_id
-            ).filter(col(Application.amount_requested).isnot(None)),
-            formatter=int,
-        ),
-        "average_repayment_period": _scalar_or_zero(
-            _get_base_query(
-                session.query(
-                    func.avg(col(Application.repayment_years) * 12 + col(Application.repayment_months)).cast(Integer)
-                ),
-                start_date,
-                end_date,
-                lender_id,
-            )
-            .join(CreditProduct, CreditProduct.id == Application.credit_product_id)
-            .filter(
-                col(Application.borrower_submitted_at).isnot(None),
-                CreditProduct.type == CreditType.LOAN,
-            )
-        ),
-        "applications_overdue_count": base_query.filter(col(Application.overdued_at).isnot(None)).count(),
-        "average_processing_time": _scalar_or_zero(
-            _get_base_query(
-                session.query(func.avg(Application.completed_in_days)), start_date, end_date, lender_id
-            ).filter(col(Application.status).in_((ApplicationStatus.APPROVED, ApplicationStatus.REJECTED))),
-            formatter=int,
+
+def get_general_statistics_from_snapshots(
+    session: Session,
+    start_date: datetime | str | None = None,
+    end_date: datetime | str | None = None,
+    lender_id: int | None = None,
+) -> dict[str, int | float]:
+    """
+    Get general statistics about applications, like :func:`~app.utils.statistics.get_general_statistics`, by summing
+    the :class:`~app.models.StatisticSnapshot` rows for the days up to the last snapshot, and querying the applications
+    created since.
+
+    Snapshots reflect the applications' state at the time of the last run of
+    :typer:`python-m-app-update-statistics`.
+
+    If there are no snapshots, or if a date has a time other than midnight, this function falls back to
+    :func:`~app.utils.statistics.get_general_statistics`.
+
+    :param start_date: The start date for filtering applications. (default: None)
+    :param end_date: The end date for filtering applications. (default: None)
+    :param lender_id: The ID of the lender for filtering applications. (default: None)
+    :return: A dictionary containing the general statistics about applications.
+    """
+    last_day = StatisticSnapshot.last_day(session)
+    start_day = _as_day(start_date)
+    end_day = _as_day(end_date)
+    if last_day is None or (start_date and start_day is None) or (end_date and end_day is None):
+        return get_general_statistics(session, start_date, end_date, lender_id)
+
+    first_live_day = last_day + timedelta(days=1)
+
+    conditions = []
+    if start_day:
+        conditions.append(col(StatisticSnapshot.day) >= start_day)
+    # Like get_general_statistics(), exclude applications created on the end date (after midnight).
+    if end_day:
+        conditions.append(col(StatisticSnapshot.day) < end_day)
+    if lender_id:
+        conditions.append(col(StatisticSnapshot.lender_id) == lender_id)
+    condition = and_(true(), *conditions)
+
+    columns = get_general_statistics_columns(true())
+    # The denominator of the proportion is not filtered by date or lender.
+    opt_in = StatisticSnapshot.accepted if lender_id is None else StatisticSnapshot.received
+
+    snapshot = session.query(
+        *(
+            func.sum(getattr(StatisticSnapshot, column.name)).filter(condition).label(column.name)
+            for column in columns
         ),
-        "proportion_of_submitted_out_of_opt_in": proportion_of_submitted_out_of_opt_in,
-    }
+        func.sum(opt_in).label("opt_in"),
+    ).one()
+
+    live = (
+        _query_general_statistics(session, _get_base_filter(start_date, end_date, lender_id), lender_id)
+        .filter(col(Application.created_at) >= first_live_day)
+        .one()
+    )
+
+    live_values = live._asdict()
+    return _format_general_statistics(
+        {name: (snapshot_value or 0) + live_values[name] for name, snapshot_value in snapshot._asdict().items()}
+    )
 
 
 # Group of Stat only for OCP USER (opt in stats)
@@ -144,15 +289,6 @@ def get_borrower_opt_in_stats(session: Session) -> dict[str, Any]:
 
     :return: A dictionary containing the statistics specific opt-in applications.
     """
-
-    def _rejected_reason(reason: str) -> StatisticData:
-        return StatisticData(
-            name=reason,
-            value=base_application.filter(declined)
-            .filter(text(f"(borrower_declined_preferences_data->>'{reason}')::boolean is True"))
-            .count(),
-        )
-
     # Filters
 
     # When filtering by dates, remember to query or join Application.
@@ -167,33 +303,66 @@ def get_borrower_opt_in_stats(session: Session) -> dict[str, Any]:
     # When filtering by woman-owned, remember to join Award.
     woman_owned = Award.source_data_contracts["g_nero_representante_legal"].astext.in_(("Femenino", "Mujer"))
 
-    # Base queries
-
-    base_application = session.query(Application.id)
-
-    base_borrower_distinct = session.query(func.count(distinct(Borrower.id))).join(Application)
-    base_borrower_group = session.query(Borrower.id).join(Application).group_by(Borrower.id)
-    base_borrower_group_with_award = base_borrower_group.join(Award, Award.id == Application.award_id)
+    def _rejected_reason(reason: str) -> Label[Any]:
+        return (
+            func.count(Application.id)
+            .filter(
+                declined,
+                cast(Application.borrower_declined_preferences_data[reason].astext, Boolean).is_(True),
+            )
+            .label(reason)
+        )
 
-    # Reused variables
+    # Calculate the application-level and borrower-level counters in a single scan, instead of one query per counter.
+    # Borrower-level counters count distinct borrowers, instead of grouping by borrower.
+    application_ids = func.count(Application.id)
+    borrower_ids = func.count(distinct(Borrower.id))
+    disbursed = Application.disbursed_final_amount
+
+    row = (
+        session.query(
+            application_ids.label("applications_count"),
+            application_ids.filter(accepted).label("accepted_count"),
+            borrower_ids.filter(accepted).label("accepted_count_unique"),
+            application_ids.filter(approved).label("approved_count"),
+            func.sum(disbursed).filter(approved).label("total_credit_disbursed"),
+            borrower_ids.filter(accepted, msme_from_source, woman_owned).label("msme_accepted_count_woman"),
+            borrower_ids.filter(submitted, msme_from_borrower, woman_owned).label("msme_submitted_count_woman"),
+            application_ids.filter(approved, msme_from_borrower, woman_owned).label("msme_approved_count_woman"),
+            application_ids.filter(approved, msme_from_borrower).label("msme_approved_count"),
+            func.sum(disbursed).filter(approved, msme_from_borrower).label("msme_total_credit_disbursed"),
+            borrower_ids.filter(approved, micro).label("approved_count_distinct_micro"),
+            borrower_ids.filter(approved, micro, woman_owned).label("approved_count_distinct_micro_woman"),
+            func.sum(disbursed).filter(approved, micro).label("total_credit_disbursed_micro"),
+            func.avg(disbursed).filter(approved, msme_from_borrower).label("msme_average_credit_disbursed"),
+            borrower_ids.filter(accepted, msme_from_source).label("msme_accepted_count_distinct"),
+            borrower_ids.filter(submitted, msme_from_borrower).label("msme_submitted_count_distinct"),
+            borrower_ids.filter(approved, msme_from_borrower).label("msme_approved_count_distinct"),
+            *(_rejected_reason(reason) for reason in DECLINED_REASONS),
+        )
+        .join(Borrower, Borrower.id == Application.borrower_id)
+        .join(Award, Award.id == Application.award_id)
+        .one()
+    )
 
-    applications_count = base_application.count()
-    accepted_count = base_application.filter(accepted).count()
+    borrowers = session.query(
+        func.count(Borrower.id).label("count"),
+        func.count(Borrower.id).filter(col(Borrower.is_msme).is_(True)).label("msme_count"),
+    ).one()
 
     return {
         #
         # General statistics - all suppliers
         #
-        "applications_created": applications_count,
-        "accepted_count": accepted_count,
-        "accepted_percentage": round((accepted_count / applications_count * 100), 2) if applications_count else 0,
-        "unique_businesses_contacted_by_credere": session.query(Borrower.id).count(),
-        "accepted_count_unique": base_borrower_group.filter(accepted).count(),
-        "approved_count": base_application.filter(approved).count(),
-        "total_credit_disbursed": _scalar_or_zero(
-            session.query(func.sum(Application.disbursed_final_amount)).filter(approved),
-            formatter=int,
+        "applications_created": row.applications_count,
+        "accepted_count": row.accepted_count,
+        "accepted_percentage": (
+            round((row.accepted_count / row.applications_count * 100), 2) if row.applications_count else 0
         ),
+        "unique_businesses_contacted_by_credere": borrowers.count,
+        "accepted_count_unique": row.accepted_count_unique,
+        "approved_count": row.approved_count,
+        "total_credit_disbursed": int(row.total_credit_disbursed or 0),
         #
         # Bar graphs
         #
@@ -207,46 +376,23 @@ def get_borrower_opt_in_stats(session: Session) -> dict[str, Any]:
             )
         ],
         # "Unique women-led SMEs that use Credere to access credit options"
-        "msme_accepted_count_woman": (
-            base_borrower_group_with_award.filter(accepted, msme_from_source, woman_owned).count()
-        ),
+        "msme_accepted_count_woman": row.msme_accepted_count_woman,
         # "Number of women-led SMEs that submit a credit application through Credere"
-        "msme_submitted_count_woman": (
-            base_borrower_group_with_award.filter(submitted, msme_from_borrower, woman_owned).count()
-        ),
-        # This query matches msme_approved_count, instead of msme_accepted_count_woman or msme_submitted_count_woman,
+        "msme_submitted_count_woman": row.msme_submitted_count_woman,
+        # This counter matches msme_approved_count, instead of msme_accepted_count_woman or msme_submitted_count_woman,
         # because it counts applications, not borrowers. The variable name is similar but the semantics are different.
         # "Number of women-led SMEs credit applications approved"
-        "msme_approved_count_woman": (
-            session.query(Application.id)
-            .join(Borrower)
-            .join(Award, Award.id == Application.award_id)
-            .filter(approved, msme_from_borrower, woman_owned)
-            .group_by(Application.id)
-            .count()
-        ),
+        "msme_approved_count_woman": row.msme_approved_count_woman,
         # "Number of SMEs applications approved"
-        "msme_approved_count": (
-            session.query(Application.id).join(Borrower).filter(approved, msme_from_borrower).count()
-        ),
-        "msme_total_credit_disbursed": _scalar_or_zero(
-            session.query(func.sum(Application.disbursed_final_amount))
-            .join(Borrower)
-            .filter(approved, msme_from_borrower),
-            formatter=int,
-        ),
-        "approved_count_distinct_micro": base_borrower_group.filter(approved, micro).count(),
-        "approved_count_distinct_micro_woman": (
-            base_borrower_group_with_award.filter(approved, micro, woman_owned).count()
-        ),
-        "total_credit_disbursed_micro": _scalar_or_zero(
-            session.query(func.sum(Application.disbursed_final_amount)).join(Borrower).filter(approved, micro),
-            formatter=int,
-        ),
+        "msme_approved_count": row.msme_approved_count,
+        "msme_total_credit_disbursed": int(row.msme_total_credit_disbursed or 0),
+        "approved_count_distinct_micro": row.approved_count_distinct_micro,
+        "approved_count_distinct_micro_woman": row.approved_count_distinct_micro_woman,
+        "total_credit_disbursed_micro": int(row.total_credit_disbursed_micro or 0),
         #
         # MSMEs statistics
         #
-        "unique_smes_contacted_by_credere": session.query(Borrower.id).filter(col(Borrower.is_msme).is_(True)).count(),
+        "unique_smes_contacted_by_credere": borrowers.msme_count,
         "sector_statistics": [
             StatisticData(name=name, value=value)
             for name, value in (
@@ -260,26 +406,16 @@ def get_borrower_opt_in_stats(session: Session) -> dict[str, Any]:
         # Count of Declined reasons bars chart
         #
         "rejected_reasons_count_by_reason": [
-            _rejected_reason("dont_need_access_credit"),
-            _rejected_reason("already_have_acredit"),
-            _rejected_reason("preffer_to_go_to_bank"),
-            _rejected_reason("dont_want_access_credit"),
-            _rejected_reason("suspicious_email"),
-            _rejected_reason("other"),
+            StatisticData(name=reason, value=getattr(row, reason)) for reason in DECLINED_REASONS
         ],
         #
         # Average credit disbursed
         #
-        "msme_average_credit_disbursed": _scalar_or_zero(
-            session.query(func.avg(Application.disbursed_final_amount))
-            .join(Borrower)
-            .filter(approved, msme_from_borrower),
-            formatter=_truncate_round,
-        ),
+        "msme_average_credit_disbursed": _truncate_round(row.msme_average_credit_disbursed or 0),
         #
         # Unique number of SMEs who accessed
         #
-        "msme_accepted_count_distinct": _scalar_or_zero(base_borrower_distinct.filter(accepted, msme_from_source)),
-        "msme_submitted_count_distinct": _scalar_or_zero(base_borrower_distinct.filter(submitted, msme_from_borrower)),
-        "msme_approved_count_distinct": _scalar_or_zero(base_borrower_distinct.filter(approved, msme_from_borrower)),
+        "msme_accepted_count_distinct": row.msme_accepted_count_distinct,
+        "msme_submitted_count_distinct": row.msme_submitted_count_distinct,
+        "msme_approved_count_distinct": row.msme_approved_count_distinct,
     }
@@ -0,0 +1,28 @@
+"""
+document contents storage external
+
+Revision ID: a4c8e2f6b1d9
+Revises: 5d2e7a9c1f3b
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "a4c8e2f6b1d9"
+down_revision = "5d2e7a9c1f3b"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Store new contents out of line and uncompressed, so that substring() reads only the chunks it needs. (PNG, JPEG,
+    # PDF and ZIP files are already compressed.)
+    op.execute("ALTER TABLE document_content ALTER COLUMN content SET STORAGE EXTERNAL")
+    op.execute("ALTER TABLE borrower_document ALTER COLUMN file SET STORAGE EXTERNAL")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE document_content ALTER COLUMN content SET STORAGE EXTENDED")
+    op.execute("ALTER TABLE borrower_document ALTER COLUMN file SET STORAGE EXTENDED")
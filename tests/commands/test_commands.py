@@ -1,4 +1,4 @@
-from datetime import datetime, timedelta
+from datetime import UTC, datetime, timedelta
 
 import pytest
 from typer.testing import CliRunner
@@ -128,8 +128,9 @@ def test_send_reminders_external_onboarding(
         )
 
 
+@pytest.mark.parametrize("args", [[], ["--batch-size", "1"]])
 @pytest.mark.parametrize(("seconds", "lapsed"), [(negative_offset, True), (positive_offset, False)])
-def test_set_lapsed_applications(session, pending_application, seconds, lapsed):
+def test_set_lapsed_applications(session, pending_application, seconds, lapsed, args):
     pending_application.created_at = (
         datetime.now(pending_application.tz)
         - timedelta(days=app_settings.days_to_change_to_lapsed)
@@ -137,7 +138,7 @@ def test_set_lapsed_applications(session, pending_application, seconds, lapsed):
     )
     session.commit()
 
-    result = runner.invoke(__main__.app, ["update-applications-to-lapsed"])
+    result = runner.invoke(__main__.app, ["update-applications-to-lapsed", *args])
     session.expire_all()
 
     assert_success(result)
@@ -184,6 +185,65 @@ def test_send_overdue_reminders(
         assert (started_application.overdued_at is not None) == overdue
 
 
+def test_send_overdue_reminders_no_sla(
+    reset_database, session, mock_send_templated_email, started_application, lender_header
+):
+    started_application.lender_started_at = datetime.now(started_application.tz) - timedelta(days=8)
+    started_application.lender.sla_days = None
+    session.commit()
+
+    with assert_change(mock_send_templated_email, "call_count", 0):
+        result = runner.invoke(__main__.app, ["sla-overdue-applications"])
+        session.expire_all()
+
+        assert_success(result)
+        assert started_application.overdued_at is None
+
+
+@pytest.mark.parametrize(
+    "actions",
+    [
+        [],
+        [("FI_REQUEST_INFORMATION", 15)],
+        [("FI_REQUEST_INFORMATION", 15), ("MSME_UPLOAD_ADDITIONAL_DOCUMENT_COMPLETED", 10)],
+        [
+            ("FI_REQUEST_INFORMATION", 15),
+            ("MSME_UPLOAD_ADDITIONAL_DOCUMENT_COMPLETED", 10),
+            ("FI_REQUEST_INFORMATION", 5),
+        ],
+        [
+            ("FI_REQUEST_INFORMATION", 18),
+            ("MSME_UPLOAD_ADDITIONAL_DOCUMENT_COMPLETED", 16.5),
+            ("FI_REQUEST_INFORMATION", 12),
+            ("MSME_UPLOAD_ADDITIONAL_DOCUMENT_COMPLETED", 10),
+            ("FI_REQUEST_INFORMATION", 5),
+            ("MSME_UPLOAD_ADDITIONAL_DOCUMENT_COMPLETED", 3),
+        ],
+    ],
+)
+def test_days_waiting_for_lenders(reset_database, session, started_application, actions):
+    now = datetime.now(UTC)
+    started_application.lender_started_at = now - timedelta(days=20)
+    for action_type, days in actions:
+        models.ApplicationAction.create(
+            session,
+            type=getattr(models.ApplicationActionType, action_type),
+            application_id=started_application.id,
+            created_at=now - timedelta(days=days),
+        )
+    session.commit()
+    session.expire_all()
+
+    assert models.Application.days_waiting_for_lenders(session).all() == [
+        (
+            started_application.id,
+            started_application.lender_id,
+            started_application.days_waiting_for_lender(session),
+            started_application.lender.sla_days,
+        )
+    ]
+
+
 def test_remove_data(session, declined_application):
     declined_application.borrower_declined_at = datetime.now(declined_application.tz) - timedelta(
         days=app_settings.days_to_erase_borrowers_data + 1
@@ -205,6 +265,62 @@ def test_remove_data(session, declined_application):
     assert declined_application.borrower.source_data == {}
 
 
+@pytest.mark.parametrize(
+    ("active", "args"), [(False, ["--batch-size", "1"]), (True, []), (True, ["--batch-size", "1"])]
+)
+def test_remove_data_batch(session, declined_application, application_payload, active, args):
+    declined_at = datetime.now(declined_application.tz) - timedelta(days=app_settings.days_to_erase_borrowers_data + 1)
+    declined_application.borrower_declined_at = declined_at
+    other_application = models.Application.create(
+        session,
+        **{**application_payload, "uuid": f"other-{declined_application.uuid}"},
+        status=models.ApplicationStatus.PENDING if active else models.ApplicationStatus.DECLINED,
+    )
+    other_application.borrower_declined_at = declined_at
+    models.BorrowerDocument.create(
+        session, application=declined_application, type=models.BorrowerDocumentType.BANK_NAME, name="x", file=b"x"
+    )
+    session.commit()
+
+    result = runner.invoke(__main__.app, ["remove-dated-application-data", *args])
+    session.expire_all()
+
+    assert_success(result)
+    assert declined_application.archived_at is not None
+    assert declined_application.borrower_documents == []
+    assert (other_application.archived_at is None) == active
+    assert (declined_application.borrower.email == "") != active
+    assert (declined_application.borrower.legal_identifier == "") != active
+
+
+def test_move_documents_to_storage(reset_database, session, local_storage, declined_application):
+    document = models.BorrowerDocument.create(
+        session, application=declined_application, type=models.BorrowerDocumentType.BANK_NAME, name="x", file=b"x"
+    )
+    session.commit()
+
+    result = runner.invoke(__main__.app, ["move-documents-to-storage", "--batch-size", "1"])
+    session.expire_all()
+
+    assert_success(result, f"Moved 1 documents (up to ID {document.id})\n")
+    assert document.file is None
+    storage_key = document.storage_key
+    assert session.get(models.DocumentContent, storage_key).refcount == 1
+    assert local_storage.read(storage_key) == b"x"
+
+    declined_application.borrower_declined_at = datetime.now(declined_application.tz) - timedelta(
+        days=app_settings.days_to_erase_borrowers_data + 1
+    )
+    session.commit()
+
+    result = runner.invoke(__main__.app, ["remove-dated-application-data"])
+    session.expire_all()
+
+    assert_success(result)
+    assert session.get(models.DocumentContent, storage_key) is None
+    assert not local_storage.exists(storage_key)
+
+
 def test_remove_data_no_dated_application(session, pending_application):
     result = runner.invoke(__main__.app, ["remove-dated-application-data"])
     session.expire_all()
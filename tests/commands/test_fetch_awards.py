@@ -1,9 +1,15 @@
 from contextlib import contextmanager
+from datetime import datetime
 from unittest.mock import MagicMock, patch
+from urllib.parse import quote_plus
 
+import httpx
+import pytest
 from typer.testing import CliRunner
 
 from app import __main__, models, util
+from app.settings import app_settings
+from app.sources import colombia
 from tests import MockResponse, assert_success, load_json_file
 
 AWARD_ID = "TEST_AWARD_ID"
@@ -28,8 +34,8 @@ def mock_function_response(content: dict, function_path: str):
 
 @contextmanager
 def mock_response(status_code: int, content: dict, function_path: str):
-    mock = MagicMock(return_value=MockResponse(status_code, content))
-    with patch(function_path, mock):
+    # patch() creates an AsyncMock if the function is asynchronous.
+    with patch(function_path, return_value=MockResponse(status_code, content)) as mock:
         yield mock
 
 
@@ -88,7 +94,7 @@ def test_fetch_previous_borrower_awards_empty(reset_database, sessionmaker, sess
         mock_response(
             200,
             [],  # changed
-            "app.sources.colombia.get_previous_awards",
+            "app.sources.colombia.get_previous_awards_async",
         ),
         mock_response(
             200,
@@ -119,7 +125,7 @@ def test_fetch_previous_borrower_awards(reset_database, sessionmaker, session):
         mock_response(
             200,
             award,  # changed
-            "app.sources.colombia.get_previous_awards",
+            "app.sources.colombia.get_previous_awards_async",
         ),
         mock_response(
             200,
@@ -127,7 +133,7 @@ def test_fetch_previous_borrower_awards(reset_database, sessionmaker, session):
             "app.sources.colombia.get_award_by_id_and_supplier",
         ),
         patch(
-            "app.sources.colombia._get_remote_contract",
+            "app.sources.colombia._get_remote_contract_async",
             return_value=([previous_contract], "url"),
         ),
         mock_whole_process(
@@ -150,7 +156,7 @@ def test_fetch_empty_contracts(reset_database):
     with mock_response(200, [], "app.sources.colombia.get_new_awards"):
         result = runner.invoke(__main__.app, ["fetch-awards"])
 
-        assert_success(result, "Fetched 0 contracts\n")
+        assert_success(result, "Fetched 0 contracts\nBorrower lookups: 0 cached, 0 requested\n")
 
 
 def test_fetch_new_awards_from_date(reset_database, session):
@@ -176,7 +182,7 @@ def test_fetch_new_awards_from_date(reset_database, session):
         inserted_borrower = session.query(models.Borrower).one()
         inserted_application = session.query(models.Application).one()
 
-        assert_success(result, "Fetched 1 contracts\n")
+        assert_success(result, "Fetched 1 contracts\nBorrower lookups: 0 cached, 1 requested\n")
         compare_objects(inserted_award, expected_award)
         compare_objects(inserted_borrower, expected_borrower)
         compare_objects(inserted_application, expected_application)
@@ -230,3 +236,284 @@ def test_fetch_award_by_id_and_supplier(reset_database, session):
         compare_objects(inserted_award, expected_award)
         compare_objects(inserted_borrower, expected_borrower)
         compare_objects(inserted_application, expected_application)
+
+
+def test_fetch_new_awards_concurrency(reset_database, session):
+    def make_request_with_retry(url, headers):
+        return MockResponse(200, borrower if url.startswith(colombia.URLS["BORROWER"]) else contract)
+
+    with (
+        mock_response_second_empty(
+            200,
+            award * 2,  # changed
+            "app.sources.colombia.get_new_awards",
+        ),
+        patch("app.sources.make_request_with_retry", side_effect=make_request_with_retry),
+    ):
+        result = runner.invoke(__main__.app, ["fetch-awards", "--concurrency", "2"])
+
+        assert_success(result, "Fetched 2 contracts\nBorrower lookups: 1 cached, 1 requested\n")
+        assert session.query(models.Award).count() == 1
+        assert session.query(models.Application).count() == 1
+        assert session.query(models.EventLog).one().message == "Error creating application: Award already exists"
+
+
+@pytest.mark.parametrize(("batch_limit", "contract_requests"), [(1000, 1), (1, 3)])
+def test_fetch_new_awards_batch(reset_database, session, batch_limit, contract_requests):
+    other_award = award[0].copy()
+    other_award["id_del_portafolio"] = "CO1.other"
+    other_contract = contract[0].copy()
+    other_contract["proceso_de_compra"] = "CO1.other"
+    other_contract["id_contrato"] = "CO1.test.123456.other"
+
+    def make_request_with_retry(url, headers):
+        if url.startswith(colombia.URLS["BORROWER"]):
+            return MockResponse(200, borrower)
+        return MockResponse(
+            200, [c for c in (contract[0], other_contract) if quote_plus(c["proceso_de_compra"]) in url]
+        )
+
+    with (
+        mock_response_second_empty(
+            200,
+            [award[0], other_award],  # changed
+            "app.sources.colombia.get_new_awards",
+        ),
+        patch("app.sources.colombia.CONTRACTS_BATCH_LIMIT", batch_limit),
+        patch("app.sources.make_request_with_retry", side_effect=make_request_with_retry) as mock,
+    ):
+        result = runner.invoke(__main__.app, ["fetch-awards"])
+        urls = [call.args[0] for call in mock.call_args_list]
+
+        assert_success(result, "Fetched 2 contracts\nBorrower lookups: 1 cached, 1 requested\n")
+        assert session.query(models.Award).count() == 2
+        assert session.query(models.Application).count() == 2
+        assert len([url for url in urls if url.startswith(colombia.URLS["CONTRACTS"])]) == contract_requests
+        assert len([url for url in urls if url.startswith(colombia.URLS["BORROWER"])]) == 1
+
+
+def test_fetch_new_awards_select(reset_database, session):
+    def make_request_with_retry(url, headers):
+        return MockResponse(200, borrower if url.startswith(colombia.URLS["BORROWER"]) else contract)
+
+    with (
+        mock_response_second_empty(
+            200,
+            award,
+            "app.sources.colombia.get_new_awards",
+        ),
+        patch.object(app_settings, "secop_select", True),
+        patch.object(app_settings, "secop_contracts_extra_fields", ["numero_del_contrato"]),
+        patch("app.sources.make_request_with_retry", side_effect=make_request_with_retry) as mock,
+    ):
+        result = runner.invoke(__main__.app, ["fetch-awards"])
+        contracts_url, borrower_url = (call.args[0] for call in mock.call_args_list)
+
+        assert_success(result, "Fetched 1 contracts\nBorrower lookups: 0 cached, 1 requested\n")
+        assert contracts_url.endswith(f"&$select={','.join(colombia.FIELDS['CONTRACTS'])},numero_del_contrato")
+        assert borrower_url.endswith(f"&$select={','.join(colombia.FIELDS['BORROWER'])}")
+        assert session.query(models.Application).count() == 1
+
+
+def test_fetch_new_awards_keyset_pagination(reset_database, session):
+    entry = {**award[0], ":id": "row-1"}
+    pages = [[entry], []]
+
+    def make_request_with_retry(url, headers):
+        if url.startswith(colombia.URLS["AWARDS"]):
+            return MockResponse(200, pages.pop(0))
+        return MockResponse(200, borrower if url.startswith(colombia.URLS["BORROWER"]) else contract)
+
+    with (
+        patch.object(app_settings, "secop_keyset_pagination", True),
+        patch("app.sources.make_request_with_retry", side_effect=make_request_with_retry) as mock,
+    ):
+        result = runner.invoke(__main__.app, ["fetch-awards"])
+        first, second = (
+            call.args[0] for call in mock.call_args_list if call.args[0].startswith(colombia.URLS["AWARDS"])
+        )
+
+        assert_success(result, "Fetched 1 contracts\nBorrower lookups: 0 cached, 1 requested\n")
+        assert "$offset" not in first
+        assert "$select=:id,*" in first
+        assert ":id desc" in first
+        assert f"(fecha_de_ultima_publicaci = '{entry['fecha_de_ultima_publicaci']}' AND :id < 'row-1')" in second
+        assert session.query(models.Application).count() == 1
+
+
+def test_fetch_new_awards_resume(reset_database, session):
+    with (
+        patch(
+            "app.sources.colombia.get_new_awards",
+            side_effect=[MockResponse(200, award), httpx.ConnectError("boom")],
+        ),
+        mock_whole_process(200, contract, borrower, "app.sources.make_request_with_retry"),
+    ):
+        result = runner.invoke(__main__.app, ["fetch-awards"])
+
+        assert isinstance(result.exception, httpx.ConnectError)
+
+    run = session.query(models.IngestionRun).one()
+
+    assert run.last_page == 0
+    assert run.total == 1
+    assert run.watermark == datetime(2023, 1, 1)
+    assert run.completed_at is None
+
+    with mock_response(200, [], "app.sources.colombia.get_new_awards") as mock:
+        result = runner.invoke(__main__.app, ["fetch-awards", "--resume"])
+
+        assert_success(result, "Fetched 0 contracts\nBorrower lookups: 0 cached, 0 requested\n")
+        mock.assert_called_once_with(1, run.from_date, None, None)
+
+    session.refresh(run)
+
+    assert session.query(models.IngestionRun).count() == 1
+    assert run.completed_at is not None
+    assert models.IngestionRun.last_watermark(session) == datetime(2023, 1, 1)
+
+
+def test_backfill(reset_database, session):
+    # Each shard gets a different award, from a different supplier, so that the shards don't conflict.
+    def get_new_awards(index, from_date, until_date, cursor):
+        entry = {
+            **award[0],
+            "id_del_portafolio": f"P{from_date:%d}",
+            "nit_del_proveedor_adjudicado": f"{from_date:%d}",
+        }
+        return MockResponse(200, [entry] if index == 0 else [])
+
+    def make_request_with_retry(url, headers):
+        if url.startswith(colombia.URLS["BORROWER"]):
+            return MockResponse(200, borrower)
+        return MockResponse(
+            200,
+            [
+                {**contract[0], "proceso_de_compra": f"P{day}", "documento_proveedor": day, "id_contrato": day}
+                for day in ("01", "03")
+                if f"P{day}" in url
+            ],
+        )
+
+    with (
+        patch("app.sources.colombia.get_new_awards", side_effect=get_new_awards),
+        patch("app.sources.make_request_with_retry", side_effect=make_request_with_retry),
+    ):
+        result = runner.invoke(
+            __main__.app, ["backfill", "--from-date", "2023-01-01", "--until-date", "2023-01-05", "--shards", "2"]
+        )
+
+        assert result.exit_code == 0, result.exc_info
+        assert "Fetched 1 contracts from 2023-01-01 00:00 to 2023-01-03 00:00\n" in result.stdout
+        assert "Fetched 1 contracts from 2023-01-03 00:00 to 2023-01-05 00:00\n" in result.stdout
+        assert result.stdout.endswith("Fetched 2 contracts\nCreated 2 awards and 2 applications\nSkipped 0 awards\n")
+        assert session.query(models.IngestionRun).filter(models.IngestionRun.completed_at.isnot(None)).count() == 2
+
+
+def test_backfill_conflict(reset_database, session):
+    # Both shards get the same award, and the second shard gets another award from the same supplier.
+    def get_new_awards(index, from_date, until_date, cursor):
+        entries = [{**award[0], "id_del_portafolio": "P1", "nit_del_proveedor_adjudicado": "1"}]
+        if from_date.day == 3:
+            entries.append({**award[0], "id_del_portafolio": "P2", "nit_del_proveedor_adjudicado": "1"})
+        return MockResponse(200, entries if index == 0 else [])
+
+    def make_request_with_retry(url, headers):
+        if url.startswith(colombia.URLS["BORROWER"]):
+            return MockResponse(200, borrower)
+        return MockResponse(
+            200,
+            [
+                {**contract[0], "proceso_de_compra": process, "documento_proveedor": "1", "id_contrato": process}
+                for process in ("P1", "P2")
+                if process in url
+            ],
+        )
+
+    with (
+        patch("app.sources.colombia.get_new_awards", side_effect=get_new_awards),
+        patch("app.sources.make_request_with_retry", side_effect=make_request_with_retry),
+    ):
+        result = runner.invoke(
+            __main__.app, ["backfill", "--from-date", "2023-01-01", "--until-date", "2023-01-05", "--shards", "2"]
+        )
+
+        assert result.exit_code == 0, result.exc_info
+        assert result.stdout.endswith(
+            "Fetched 3 contracts\n"
+            "Created 2 awards and 2 applications\n"
+            "Skipped 1 awards\n"
+            "  1\tError creating application: Award already exists\n"
+        )
+        assert session.query(models.Borrower).count() == 1
+
+
+def test_create_application_concurrent_borrower(reset_database, session, sessionmaker):
+    first_by = models.Borrower.first_by
+    calls = []
+
+    # Another process creates the borrower after this process checks whether it exists.
+    def first_by_concurrently(session, field, value):
+        found = first_by(session, field, value)
+        if not calls:
+            with contextmanager(sessionmaker)() as other_session:
+                models.Borrower.create(other_session, borrower_identifier=value, legal_name="Other")
+                other_session.commit()
+        calls.append(value)
+        return found
+
+    def make_request_with_retry(url, headers):
+        return MockResponse(200, borrower if url.startswith(colombia.URLS["BORROWER"]) else contract)
+
+    with (
+        mock_response_second_empty(200, award, "app.sources.colombia.get_new_awards"),
+        patch.object(models.Borrower, "first_by", side_effect=first_by_concurrently),
+        patch("app.sources.make_request_with_retry", side_effect=make_request_with_retry) as mock,
+    ):
+        result = runner.invoke(__main__.app, ["fetch-awards"])
+
+    assert_success(result, "Fetched 1 contracts\nBorrower lookups: 0 cached, 1 requested\n")
+
+    instance = session.query(models.Borrower).one()
+
+    assert len(calls) == 2
+    assert instance.legal_name == expected_borrower["legal_name"]
+    assert session.query(models.Application).one().borrower_id == instance.id
+    # The lookups are not repeated.
+    assert len([call for call in mock.call_args_list if call.args[0].startswith(colombia.URLS["BORROWER"])]) == 1
+
+
+def test_ingestion_run_incomplete(reset_database, session):
+    crashed = models.IngestionRun.create(session, from_date=datetime(2023, 1, 1), watermark=datetime(2023, 1, 5))
+    models.IngestionRun.create(session, from_date=datetime(2023, 1, 1), until_date=datetime(2023, 1, 3))  # shard
+    session.commit()
+
+    assert models.IngestionRun.incomplete(session) == crashed
+    assert models.IngestionRun.last_watermark(session) is None
+
+    models.IngestionRun.create(
+        session, from_date=datetime(2023, 1, 1), watermark=datetime(2023, 1, 2), completed_at=datetime.now()
+    )
+    session.commit()
+
+    assert models.IngestionRun.incomplete(session) is None
+    assert models.IngestionRun.last_watermark(session) == datetime(2023, 1, 2)
+
+
+def test_fetch_new_awards_concurrency_existing_award(reset_database, session):
+    def make_request_with_retry(url, headers):
+        return MockResponse(200, borrower if url.startswith(colombia.URLS["BORROWER"]) else contract)
+
+    for borrower_requests in (1, 0):
+        with (
+            mock_response_second_empty(200, award, "app.sources.colombia.get_new_awards"),
+            patch("app.sources.make_request_with_retry", side_effect=make_request_with_retry) as mock,
+        ):
+            result = runner.invoke(__main__.app, ["fetch-awards", "--concurrency", "2"])
+
+            assert result.exit_code == 0, result.exc_info
+            urls = [call.args[0] for call in mock.call_args_list]
+            assert sum(url.startswith(colombia.URLS["BORROWER"]) for url in urls) == borrower_requests
+
+    assert session.query(models.Award).count() == 1
+    assert session.query(models.EventLog).one().message == "Error creating application: Award already exists"
@@ -15,9 +15,10 @@ from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 
-from app import aws, dependencies, main, models
-from app.db import get_db
+from app import aws, dependencies, main, models, storage
+from app.db import get_db, get_read_db
 from app.settings import app_settings
+from app.utils import statistics
 from tests import create_user, get_test_db
 
 
@@ -69,6 +70,21 @@ def mock_send_templated_email(mock_aws):
             assert "{{" not in json.loads(call.kwargs["TemplateData"])["CONTENT"]
 
 
+# The cache is per process, and the database is reset by some tests.
+@pytest.fixture(autouse=True)
+def clear_cache():
+    statistics.cache.clear()
+
+
+@pytest.fixture
+def local_storage(monkeypatch, tmp_path):
+    monkeypatch.setattr(app_settings, "document_storage", "local")
+    monkeypatch.setattr(app_settings, "document_storage_path", str(tmp_path))
+    storage.get_storage.cache_clear()
+    yield storage.get_storage()
+    storage.get_storage.cache_clear()
+
+
 @pytest.fixture(scope="session", autouse=True)
 def database(engine):
     models.SQLModel.metadata.create_all(engine)
@@ -135,6 +151,7 @@ def client(app: FastAPI, engine, aws_client) -> Generator[TestClient, Any, None]
     # Mock dependencies. aws.client is used only in get_aws_client().
     app.dependency_overrides[dependencies.get_aws_client] = lambda: aws_client
     app.dependency_overrides[get_db] = get_test_db(engine)
+    app.dependency_overrides[get_read_db] = get_test_db(engine)
 
     with TestClient(app) as client:
         yield client
@@ -287,6 +304,7 @@ def credit_product_external_onboarding(session, lender_external_onboarding):
 def award(session):
     instance = models.Award.create(
         session,
+        source_contract_id=str(uuid.uuid4()),
         award_amount="123456",
         award_currency="COP",
     )
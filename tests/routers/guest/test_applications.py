@@ -1,8 +1,11 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from unittest.mock import patch
 
 from fastapi import status
 
-from app import models
+from app import models, serializers
 from app.i18n import _
 from tests import assert_ok
 
@@ -85,3 +88,24 @@ def test_rollback_credit_product(client, accepted_application):
     assert response.json()["application"]["uuid"] == accepted_application.uuid
     assert response.json()["application"]["credit_product_id"] is None
     assert response.json()["application"]["borrower_credit_product_selected_at"] is None
+
+
+def test_application_by_uuid_concurrently(client, pending_application):
+    url = f"/applications/uuid/{pending_application.uuid}"
+    requests = 5
+    response_class = serializers.ApplicationResponse
+    # Each request waits for all the others. If each blocked the event loop, the first would time out.
+    barrier = threading.Barrier(requests, timeout=5)
+
+    def slow_response(**kwargs):
+        barrier.wait()  # like a slow query
+        return response_class(**kwargs)
+
+    with (
+        patch("app.serializers.ApplicationResponse", side_effect=slow_response),
+        ThreadPoolExecutor(requests) as executor,
+    ):
+        responses = list(executor.map(client.get, [url] * requests))
+
+    for response in responses:
+        assert_ok(response)
@@ -1,9 +1,16 @@
+import csv
+import io
 import os
+import zipfile
+from datetime import datetime
 from unittest.mock import patch
 
+import pytest
 from fastapi import status
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
-from app import models, util
+from app import models, storage, util
 from app.i18n import _
 from app.settings import app_settings
 from tests import BASEDIR, MockResponse, assert_ok, load_json_file
@@ -53,11 +60,11 @@ def test_approve_application_cycle(
     # this will mock the previous award get to return an empty array
     with (
         patch(
-            "app.sources.colombia.get_previous_awards",
+            "app.sources.colombia.get_previous_awards_async",
             return_value=MockResponse(status.HTTP_200_OK, source_award),
         ),
         patch(
-            "app.sources.colombia._get_remote_contract",
+            "app.sources.colombia._get_remote_contract_async",
             return_value=(load_json_file("fixtures/contract.json"), "url"),
         ),
     ):
@@ -360,6 +367,236 @@ def test_approve_application_with_external_onboarding(
     assert response.json()["status"] == models.ApplicationStatus.APPROVED
 
 
+@pytest.mark.parametrize(
+    ("content", "status_code", "detail"),
+    [
+        (b"%PDF-1.7", 200, None),
+        (b"\xef\xbb\xbf\r\n%PDF-1.7", 200, None),
+        (b"x" * 1024 + b"%PDF-1.7", 422, "Format not allowed. It must be a PNG, JPEG, PDF or ZIP file"),
+        (b"GIF89a", 422, "Format not allowed. It must be a PNG, JPEG, PDF or ZIP file"),
+        (b"", 422, "Format not allowed. It must be a PNG, JPEG, PDF or ZIP file"),
+        (b"%PDF-" + b"x" * 200_000, 413, "File is too large"),
+    ],
+)
+def test_upload_document_validation(client, session, accepted_application, content, status_code, detail):
+    accepted_application.pending_documents = True
+    session.commit()
+
+    with patch("app.util.MAX_FILE_SIZE", 100_000):
+        response = client.post(
+            "/applications/upload-document",
+            data={"uuid": accepted_application.uuid, "type": models.BorrowerDocumentType.INCORPORATION_DOCUMENT},
+            files={"file": ("file.pdf", content, "application/pdf")},
+        )
+
+    assert response.status_code == status_code, response.json()
+    if detail:
+        assert response.json() == {"detail": _(detail)}
+    else:
+        document = session.get(models.BorrowerDocument, response.json()["id"])
+        assert document.file is None
+        assert session.get(models.DocumentContent, document.storage_key).content == content
+
+
+@pytest.mark.parametrize(
+    ("sort_field", "sort_order"),
+    [
+        ("application.borrower_submitted_at", "asc"),
+        ("application.borrower_submitted_at", "desc"),
+        ("application.amount_requested", "asc"),
+        ("application.amount_requested", "desc"),
+        ("award.buyer_name", "desc"),
+    ],
+)
+def test_get_applications_cursor(
+    reset_database, client, session, lender_header, application_payload, credit_product, lender, sort_field, sort_order
+):
+    for index, amount in enumerate((None, 2000, 1000, None, 1000, 3000, 2000)):
+        models.Application.create(
+            session,
+            **(
+                application_payload
+                | {
+                    "uuid": f"{application_payload['uuid']}-{index}",
+                    "amount_requested": amount,
+                    "borrower_submitted_at": datetime(2024, 1, 1 + index // 3),
+                }
+            ),
+            status=models.ApplicationStatus.SUBMITTED,
+            credit_product_id=credit_product.id,
+            lender=lender,
+        )
+    session.commit()
+
+    url = f"/applications?page_size=2&sort_field={sort_field}&sort_order={sort_order}"
+
+    expected = []
+    for page in range(4):
+        response = client.get(f"{url}&page={page}", headers=lender_header)
+        assert_ok(response)
+        expected.extend(item["id"] for item in response.json()["items"])
+
+    actual = []
+    cursor = None
+    while True:
+        response = client.get(f"{url}&count=cached" + (f"&cursor={cursor}" if cursor else ""), headers=lender_header)
+        assert_ok(response)
+        data = response.json()
+        assert data["count"] == 7
+        actual.extend(item["id"] for item in data["items"])
+        cursor = data["next_cursor"]
+        if not cursor:
+            break
+
+    assert len(expected) == 7
+    assert actual == expected
+
+    response = client.get(f"{url}&cursor=invalid", headers=lender_header)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+    assert response.json() == {"detail": _("Invalid cursor")}
+
+
+def test_get_applications_without_document_contents(client, session, admin_header, lender_header, pending_application):
+    pending_application.status = models.ApplicationStatus.SUBMITTED
+    document = models.BorrowerDocument.create(
+        session,
+        application=pending_application,
+        type=models.BorrowerDocumentType.INCORPORATION_DOCUMENT,
+        name="incorporation.pdf",
+        file=b"contents",
+    )
+    session.commit()
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        for url, headers in (
+            ("/applications/admin-list", admin_header),
+            ("/applications", lender_header),
+            (f"/applications/id/{pending_application.id}", lender_header),
+        ):
+            response = client.get(url, headers=headers)
+            assert_ok(response)
+    finally:
+        event.remove(Engine, "before_cursor_execute", before_cursor_execute)
+
+    assert statements
+    assert not [statement for statement in statements if "borrower_document.file" in statement]
+
+    response = client.get(f"/applications/documents/id/{document.id}", headers=lender_header)
+    assert_ok(response)
+    assert response.content == b"contents"
+
+
+def test_get_borrower_document_from_storage(client, session, lender_header, pending_application, local_storage):
+    document = util.create_or_update_borrower_document(
+        session,
+        "incorporation.pdf",
+        pending_application,
+        models.BorrowerDocumentType.INCORPORATION_DOCUMENT,
+        storage.HashedFile.from_bytes(b"contents"),
+    )
+    session.commit()
+
+    assert document.file is None
+    assert local_storage.read(document.storage_key) == b"contents"
+
+    url = f"/applications/documents/id/{document.id}"
+
+    response = client.get(url, headers=lender_header)
+    assert_ok(response)
+    assert response.content == b"contents"
+
+    response = client.get(url, headers={**lender_header, "Range": "bytes=2-4"})
+    assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert response.headers["content-range"] == "bytes 2-4/8"
+    assert response.content == b"nte"
+
+    response = client.get(url, headers={**lender_header, "Range": "bytes=8-"})
+    assert response.status_code == status.HTTP_416_RANGE_NOT_SATISFIABLE
+    assert response.headers["content-range"] == "bytes */8"
+    assert response.json() == {"detail": _("Range not satisfiable")}
+
+
+def test_confirm_credit_product_shares_document_contents(
+    reset_database, client, session, application_payload, accepted_application
+):
+    rejected_application = models.Application.create(
+        session, **application_payload | {"uuid": "rejected_uuid"}, status=models.ApplicationStatus.REJECTED
+    )
+    document = util.create_or_update_borrower_document(
+        session,
+        "incorporation.pdf",
+        rejected_application,
+        models.BorrowerDocumentType.INCORPORATION_DOCUMENT,
+        storage.HashedFile.from_bytes(b"contents"),
+    )
+    session.commit()
+
+    response = client.post("/applications/confirm-credit-product", json={"uuid": accepted_application.uuid})
+    session.expire_all()
+
+    assert_ok(response)
+    [copy] = accepted_application.borrower_documents
+    assert copy.file is None
+    assert copy.storage_key == document.storage_key
+    assert session.get(models.DocumentContent, document.storage_key).refcount == 2
+
+    response = client.post("/applications/rollback-confirm-credit-product", json={"uuid": accepted_application.uuid})
+    session.expire_all()
+
+    assert_ok(response)
+    assert accepted_application.borrower_documents == []
+    assert session.get(models.DocumentContent, document.storage_key).refcount == 1
+
+
+def test_export_applications(reset_database, client, session, lender_header, pending_application):
+    response = client.get("/applications/export/en", headers=lender_header)
+    assert_ok(response)
+    assert response.headers["content-type"] == "text/csv; charset=utf-8"
+    assert response.text.splitlines() == [
+        "Legal Name,National Tax ID,Email Address,Buyer Name,Award Value Currency & Amount,Amount requested,"
+        "Submission Date,Stage"
+    ]
+
+    pending_application.status = models.ApplicationStatus.SUBMITTED
+    session.commit()
+
+    response = client.get("/applications/export/en", headers=lender_header)
+    assert_ok(response)
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert len(rows) == 2
+    assert rows[1][1] == pending_application.borrower.legal_identifier
+    assert rows[1][-1] == "SUBMITTED"
+
+
+def test_download_application(client, session, lender_header, pending_application):
+    models.BorrowerDocument.create(
+        session,
+        application=pending_application,
+        type=models.BorrowerDocumentType.INCORPORATION_DOCUMENT,
+        name="incorporation.pdf",
+        file=b"contents",
+    )
+    session.commit()
+
+    response = client.get(f"/applications/{pending_application.id}/download-application/en", headers=lender_header)
+    assert_ok(response)
+    assert response.headers["content-type"] == "application/zip"
+
+    with zipfile.ZipFile(io.BytesIO(response.content)) as zip_file:
+        assert zip_file.testzip() is None
+        names = zip_file.namelist()
+        assert len(names) == 2
+        assert names[0].startswith("Application_Details-")
+        assert names[1] == "incorporation.pdf"
+        assert zip_file.read("incorporation.pdf") == b"contents"
+
+
 def test_get_applications(client, session, admin_header, lender_header, pending_application):
     appid = pending_application.id
 
@@ -1,7 +1,322 @@
-from tests import assert_ok
+import logging
+import uuid
+from datetime import UTC, date, datetime, timedelta
 
+import pytest
+from typer.testing import CliRunner
+
+from app import __main__, models
+from app.serializers import StatisticData
+from app.settings import app_settings
+from app.utils import statistics
+from tests import assert_change, assert_ok, assert_success
+
+runner = CliRunner()
+
+
+@pytest.fixture
+def statistics_lender_ids(session, application_payload, award, borrower, lender, credit_product):
+    other_lender = models.Lender.create(session, name=f"Other {uuid.uuid4()}", sla_days=7)
+    credit_line = models.CreditProduct.create(
+        session,
+        borrower_size=models.BorrowerSize.SMALL,
+        lower_limit=5000.00,
+        upper_limit=500000.00,
+        type=models.CreditType.CREDIT_LINE,
+        required_document_types={},
+        interest_rate=3.75,
+        other_fees_total_amount=1000,
+        other_fees_description="",
+        more_info_url="",
+        lender=other_lender,
+    )
+
+    borrowers = [
+        borrower,
+        models.Borrower.create(
+            session, borrower_identifier=str(uuid.uuid4()), sector="services", size=models.BorrowerSize.MICRO
+        ),
+        models.Borrower.create(
+            session,
+            borrower_identifier=str(uuid.uuid4()),
+            sector="construction",
+            size=models.BorrowerSize.BIG,
+            is_msme=False,
+        ),
+    ]
+    models.Borrower.create(session, borrower_identifier=str(uuid.uuid4()), is_msme=False)
+    awards = [
+        award,
+        models.Award.create(
+            session,
+            source_contract_id=str(uuid.uuid4()),
+            award_amount=1,
+            source_data_contracts={"g_nero_representante_legal": "Femenino"},
+        ),
+    ]
+    declined_preferences = [{"dont_need_access_credit": True, "other": True}, {"suspicious_email": True}]
+
+    submitted = datetime(2024, 1, 10)
+    # status, lender, credit product, submitted, amount, years, months, overdue, days, created
+    for index, row in enumerate(
+        (
+            ("PENDING", None, None, False, None, None, None, False, None, datetime(2023, 12, 1)),
+            ("DECLINED", None, None, False, None, None, None, False, None, datetime(2024, 1, 1)),
+            ("DECLINED", None, None, False, None, None, None, False, None, datetime(2024, 1, 2)),
+            ("ACCEPTED", lender, credit_product, False, 20000, 1, 0, False, None, datetime(2024, 1, 5)),
+            ("SUBMITTED", lender, credit_product, True, 15000, 1, 6, False, None, datetime(2024, 1, 10)),
+            ("STARTED", lender, credit_product, True, 30000, 2, 3, True, None, datetime(2024, 2, 1)),
+            ("INFORMATION_REQUESTED", lender, credit_product, True, 12345, 0, 9, True, None, datetime(2024, 2, 15)),
+            ("APPROVED", lender, credit_product, True, 50000, 3, 0, False, 12, datetime(2024, 3, 1)),
+            ("REJECTED", lender, credit_product, True, None, None, None, False, 5, datetime(2024, 3, 20)),
+            ("APPROVED", other_lender, credit_line, True, 70000, 1, 1, False, 20, datetime(2024, 4, 1)),
+            ("STARTED", other_lender, credit_line, True, 8000, 0, 4, False, None, datetime(2024, 4, 10)),
+            ("REJECTED", other_lender, credit_line, True, 9999, 2, 2, True, 8, datetime(2024, 5, 1)),
+        ),
+        start=1,
+    ):
+        status, row_lender, product, is_submitted, amount, years, months, overdue, days, created_at = row
+        models.Application.create(
+            session,
+            **(
+                application_payload
+                | {
+                    "uuid": str(uuid.uuid4()),
+                    "status": models.ApplicationStatus[status],
+                    "award_id": awards[index // 2 % 2].id,
+                    "borrower": borrowers[index % 3],
+                    "lender": row_lender,
+                    "credit_product_id": product.id if product else None,
+                    "amount_requested": amount,
+                    "repayment_years": years,
+                    "repayment_months": months,
+                    "borrower_accepted_at": submitted if row_lender else None,
+                    "borrower_submitted_at": submitted if is_submitted else None,
+                    "borrower_declined_at": submitted if status == "DECLINED" else None,
+                    "borrower_declined_preferences_data": (
+                        declined_preferences[index % 2] if status == "DECLINED" else {}
+                    ),
+                    "lender_approved_at": submitted if status == "APPROVED" else None,
+                    "disbursed_final_amount": amount if status == "APPROVED" else None,
+                    "overdued_at": submitted if overdue else None,
+                    "completed_in_days": days,
+                    "created_at": created_at,
+                }
+            ),
+        )
+    session.commit()
+
+    return {"lender": lender.id, "other_lender": other_lender.id}
+
+
+@pytest.mark.parametrize(
+    ("start_date", "end_date", "lender_key", "expected"),
+    [
+        (
+            None,
+            None,
+            None,
+            {
+                "applications_received_count": 8,
+                "applications_rejected_count": 2,
+                "applications_waiting_for_information_count": 1,
+                "applications_in_progress_count": 3,
+                "applications_with_credit_disbursed_count": 2,
+                "average_amount_requested": 26918,
+                "average_repayment_period": 23,
+                "applications_overdue_count": 3,
+                "average_processing_time": 11,
+                "proportion_of_submitted_out_of_opt_in": 88.89,
+            },
+        ),
+        (
+            "2024-02-01",
+            "2024-04-01",
+            None,
+            {
+                "applications_received_count": 5,
+                "applications_rejected_count": 1,
+                "applications_waiting_for_information_count": 1,
+                "applications_in_progress_count": 2,
+                "applications_with_credit_disbursed_count": 2,
+                "average_amount_requested": 40586,
+                "average_repayment_period": 24,
+                "applications_overdue_count": 2,
+                "average_processing_time": 12,
+                "proportion_of_submitted_out_of_opt_in": 55.56,
+            },
+        ),
+        (
+            None,
+            None,
+            "lender",
+            {
+                "applications_received_count": 5,
+                "applications_rejected_count": 1,
+                "applications_waiting_for_information_count": 1,
+                "applications_in_progress_count": 2,
+                "applications_with_credit_disbursed_count": 1,
+                "average_amount_requested": 25469,
+                "average_repayment_period": 23,
+                "applications_overdue_count": 2,
+                "average_processing_time": 8,
+                "proportion_of_submitted_out_of_opt_in": 62.5,
+            },
+        ),
+        (
+            "2024-01-01",
+            "2024-03-01",
+            "lender",
+            {
+                "applications_received_count": 4,
+                "applications_rejected_count": 0,
+                "applications_waiting_for_information_count": 1,
+                "applications_in_progress_count": 2,
+                "applications_with_credit_disbursed_count": 1,
+                "average_amount_requested": 25469,
+                "average_repayment_period": 23,
+                "applications_overdue_count": 2,
+                "average_processing_time": 12,
+                "proportion_of_submitted_out_of_opt_in": 50.0,
+            },
+        ),
+        (
+            None,
+            None,
+            "other_lender",
+            {
+                "applications_received_count": 3,
+                "applications_rejected_count": 1,
+                "applications_waiting_for_information_count": 0,
+                "applications_in_progress_count": 1,
+                "applications_with_credit_disbursed_count": 1,
+                "average_amount_requested": 29333,
+                "average_repayment_period": 0,
+                "applications_overdue_count": 1,
+                "average_processing_time": 14,
+                "proportion_of_submitted_out_of_opt_in": 37.5,
+            },
+        ),
+        (
+            "2025-01-01",
+            None,
+            "lender",
+            {
+                "applications_received_count": 0,
+                "applications_rejected_count": 0,
+                "applications_waiting_for_information_count": 0,
+                "applications_in_progress_count": 0,
+                "applications_with_credit_disbursed_count": 0,
+                "average_amount_requested": 0,
+                "average_repayment_period": 0,
+                "applications_overdue_count": 0,
+                "average_processing_time": 0,
+                "proportion_of_submitted_out_of_opt_in": 0.0,
+            },
+        ),
+    ],
+)
+def test_get_general_statistics(
+    reset_database, session, statistics_lender_ids, start_date, end_date, lender_key, expected
+):
+    lender_id = statistics_lender_ids[lender_key] if lender_key else None
+
+    assert statistics.get_general_statistics(session, start_date, end_date, lender_id) == expected
+
+
+@pytest.mark.parametrize(
+    ("start_date", "end_date", "lender_key"),
+    [
+        (None, None, None),
+        ("2024-02-01", "2024-04-05", None),
+        (None, None, "lender"),
+        ("2024-01-01", "2024-03-02", "lender"),
+        (None, None, "other_lender"),
+        ("2024-03-01", (date.today() + timedelta(days=1)).isoformat(), "lender"),
+        (date.today().isoformat(), None, None),
+        ("2024-02-01T12:00:00", None, None),
+    ],
+)
+def test_get_general_statistics_from_snapshots(
+    reset_database, session, application_payload, statistics_lender_ids, start_date, end_date, lender_key
+):
+    lender_id = statistics_lender_ids[lender_key] if lender_key else None
+
+    result = runner.invoke(__main__.app, ["update-statistics"])
+
+    assert_success(result)
+    assert session.query(models.StatisticSnapshot).count() == 12
+
+    # Applications created today are not snapshotted.
+    models.Application.create(
+        session,
+        **(
+            application_payload
+            | {
+                "status": models.ApplicationStatus.STARTED,
+                "lender_id": statistics_lender_ids["lender"],
+                "amount_requested": 1000,
+                "borrower_accepted_at": datetime.now(UTC),
+                "borrower_submitted_at": datetime.now(UTC),
+                "created_at": datetime.now(UTC),
+            }
+        ),
+    )
+    session.commit()
+
+    assert statistics.get_general_statistics_from_snapshots(
+        session, start_date, end_date, lender_id
+    ) == statistics.get_general_statistics(session, start_date, end_date, lender_id)
+
+
+def test_get_borrower_opt_in_stats(reset_database, session, statistics_lender_ids):
+    lender_name = session.get(models.Lender, statistics_lender_ids["lender"]).name
+    other_lender_name = session.get(models.Lender, statistics_lender_ids["other_lender"]).name
+
+    stats = statistics.get_borrower_opt_in_stats(session)
+    stats["fis_chosen_by_supplier"].sort(key=lambda data: data.value)
+
+    assert stats == {
+        "applications_created": 12,
+        "accepted_count": 9,
+        "accepted_percentage": 75.0,
+        "unique_businesses_contacted_by_credere": 4,
+        "accepted_count_unique": 3,
+        "approved_count": 2,
+        "total_credit_disbursed": 120000,
+        "fis_chosen_by_supplier": [
+            StatisticData(name=other_lender_name, value=3),
+            StatisticData(name=lender_name, value=5),
+        ],
+        "msme_accepted_count_woman": 2,
+        "msme_submitted_count_woman": 2,
+        "msme_approved_count_woman": 1,
+        "msme_approved_count": 1,
+        "msme_total_credit_disbursed": 70000,
+        "approved_count_distinct_micro": 1,
+        "approved_count_distinct_micro_woman": 1,
+        "total_credit_disbursed_micro": 70000,
+        "unique_smes_contacted_by_credere": 2,
+        "sector_statistics": [StatisticData(name="services", value=3)],
+        "rejected_reasons_count_by_reason": [
+            StatisticData(name="dont_need_access_credit", value=1),
+            StatisticData(name="already_have_acredit", value=0),
+            StatisticData(name="preffer_to_go_to_bank", value=0),
+            StatisticData(name="dont_want_access_credit", value=0),
+            StatisticData(name="suspicious_email", value=1),
+            StatisticData(name="other", value=1),
+        ],
+        "msme_average_credit_disbursed": 70000,
+        "msme_accepted_count_distinct": 2,
+        "msme_submitted_count_distinct": 2,
+        "msme_approved_count_distinct": 1,
+    }
+
+
+@pytest.mark.parametrize("snapshots", [False, True])
+def test_statistics(monkeypatch, client, admin_header, lender_header, snapshots):
+    monkeypatch.setattr(app_settings, "statistics_snapshots", snapshots)
 
-def test_statistics(client, admin_header, lender_header):
     response = client.get("/statistics-ocp", headers=admin_header)
     assert_ok(response)
 
@@ -10,3 +325,49 @@ def test_statistics(client, admin_header, lender_header):
 
     response = client.get("/statistics-fi", headers=lender_header)
     assert_ok(response)
+
+
+def test_statistics_cache(caplog, client, session, lender_header, pending_application):
+    caplog.set_level(logging.DEBUG, logger="app.utils.cache")
+    pending_application.status = models.ApplicationStatus.STARTED
+    session.commit()
+
+    response = client.get("/statistics-fi", headers=lender_header)
+    assert_ok(response)
+    in_progress_count = response.json()["statistics_kpis"]["applications_in_progress_count"]
+
+    with assert_change(statistics.cache, "hits", 1):
+        response = client.get("/statistics-fi", headers=lender_header)
+    assert_ok(response)
+    assert response.json()["statistics_kpis"]["applications_in_progress_count"] == in_progress_count
+
+    # The counters are logged.
+    messages = [record.getMessage() for record in caplog.records if record.name == "app.utils.cache"]
+    assert messages[-2].startswith("Cache miss for ('statistics-fi', ")
+    assert messages[-1].startswith("Cache hit for ('statistics-fi', ")
+    assert messages[-1].endswith(f"({statistics.cache.hits} hits, {statistics.cache.misses} misses)")
+
+    # A status change clears the cache.
+    response = client.post(f"/applications/{pending_application.id}/lapse", headers=lender_header)
+    assert_ok(response)
+
+    with assert_change(statistics.cache, "misses", 1):
+        response = client.get("/statistics-fi", headers=lender_header)
+    assert_ok(response)
+    assert response.json()["statistics_kpis"]["applications_in_progress_count"] == in_progress_count - 1
+
+
+def test_get_cached_after_clear(monkeypatch):
+    def function(session, value):
+        return session, value
+
+    statistics.cache.clear()
+
+    assert statistics.get_cached("key", function, "read", "primary", 1) == ("primary", 1)
+    # The result is cached.
+    assert statistics.get_cached("key", function, "read", "primary", 2) == ("primary", 1)
+
+    # The read replica is used once the cache hasn't been cleared for the TTL.
+    monkeypatch.setattr(statistics.cache, "ttl", 0)
+    with assert_change(statistics.cache, "misses", 1):
+        assert statistics.get_cached("other", function, "read", "primary", 3) == ("read", 3)
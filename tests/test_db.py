@@ -0,0 +1,65 @@
+import os
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from app import db, models
+from app.settings import app_settings
+
+
+@pytest.mark.parametrize(
+    ("name", "pool_size", "statement_timeout"),
+    [
+        ("engine", "database_pool_size", "database_statement_timeout"),
+        ("batch_engine", "batch_database_pool_size", "batch_database_statement_timeout"),
+    ],
+)
+def test_engine(name, pool_size, statement_timeout):
+    engine = getattr(db, name)
+    statement_timeout = getattr(app_settings, statement_timeout)
+
+    with engine.connect() as connection:
+        assert connection.execute(text("SHOW statement_timeout")).scalar() == (
+            f"{statement_timeout}ms" if statement_timeout else "0"
+        )
+    assert engine.pool.size() == getattr(app_settings, pool_size)
+
+
+def test_use_batch_engine():
+    try:
+        db.use_batch_engine()
+
+        with db.SessionLocal() as session:
+            assert session.get_bind() is db.batch_engine
+    finally:
+        db.SessionLocal.configure(bind=db.engine)
+
+
+@pytest.mark.parametrize("available", [True, False])
+def test_get_read_db(monkeypatch, available):
+    # Nothing listens on port 1.
+    read_engine = create_engine(os.getenv("TEST_DATABASE_URL") if available else "postgresql://localhost:1/replica")
+    monkeypatch.setattr(db, "read_engine", read_engine)
+    monkeypatch.setattr(db, "ReadSessionLocal", sessionmaker(bind=read_engine))
+
+    try:
+        with contextmanager(db.get_read_db)() as session:
+            assert (session.get_bind() is read_engine) == available
+            assert session.execute(text("SELECT 1")).scalar() == 1
+    finally:
+        read_engine.dispose()
+
+
+def test_violates_unique_constraint(reset_database, session):
+    models.Borrower.create(session, borrower_identifier="same")
+    session.commit()
+
+    with pytest.raises(IntegrityError) as excinfo:
+        models.Borrower.create(session, borrower_identifier="same")
+    session.rollback()
+
+    assert db.violates_unique_constraint(excinfo.value, "borrower_borrower_identifier_key")
+    assert not db.violates_unique_constraint(excinfo.value, "ix_award_source_contract_id")
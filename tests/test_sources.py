@@ -0,0 +1,61 @@
+import asyncio
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from app import sources
+from app.settings import app_settings
+from app.sources import colombia
+from tests import load_json_file
+
+award = load_json_file("fixtures/award.json")
+borrower = load_json_file("fixtures/borrower.json")
+
+
+@pytest.mark.parametrize("http2", [False, True])
+def test_async_client_max_in_flight_requests(http2):
+    in_flight = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200, json=[])
+
+    async def main():
+        async with sources.AsyncClient(mounts={"all://": httpx.MockTransport(handler)}) as client:
+            return await asyncio.gather(
+                *(sources.make_request_with_retry_async(client, "https://example.com", {}) for _ in range(10))
+            )
+
+    with (
+        patch.object(app_settings, "secop_max_in_flight_requests", 3),
+        # HTTP/2 requires the h2 package.
+        patch.object(app_settings, "secop_http2", http2),
+    ):
+        responses = asyncio.run(main())
+
+    assert [response.status_code for response in responses] == [200] * 10
+    assert peak == 3
+
+
+def test_async_counterparts():
+    async def handler(request):
+        return httpx.Response(200, json=borrower if str(request.url).startswith(colombia.URLS["BORROWER"]) else award)
+
+    async def main():
+        async with sources.AsyncClient(mounts={"all://": httpx.MockTransport(handler)}) as client:
+            return (
+                await colombia.get_new_awards_async(client, 0, None),
+                await colombia.get_borrower_async(client, "hash", "123", award[0]),
+            )
+
+    awards_response, borrower_data = asyncio.run(main())
+
+    assert awards_response.json() == award
+    assert borrower_data["borrower_identifier"] == "hash"
+    assert borrower_data["source_data"] == borrower[0]
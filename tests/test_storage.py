@@ -0,0 +1,92 @@
+import io
+
+import boto3
+import pytest
+
+from app import models, storage, util
+
+
+@pytest.fixture(params=["local", "s3"])
+def backend(request, tmp_path, mock_aws):
+    if request.param == "local":
+        return storage.LocalStorage(tmp_path)
+
+    client = boto3.client("s3", region_name="us-east-1")
+    client.create_bucket(Bucket="documents")
+    return storage.S3Storage("documents", client)
+
+
+def test_storage(backend):
+    content = bytes(range(256)) * 1000
+    key = storage.get_key(content)
+
+    assert not backend.exists(key)
+    assert backend.put(content) == key
+    assert backend.put(content) == key
+    assert backend.exists(key)
+    assert backend.size(key) == len(content)
+    assert backend.read(key) == content
+    assert b"".join(backend.iter_bytes(key, 100, 70_000)) == content[100:70_000]
+    assert b"".join(backend.iter_bytes(key, 255_000)) == content[255_000:]
+
+    backend.delete(key)
+
+    assert not backend.exists(key)
+
+
+def test_local_storage_error(tmp_path):
+    class Stream(io.BytesIO):
+        def read(self, *args):
+            raise OSError("boom")
+
+    backend = storage.LocalStorage(tmp_path)
+
+    with pytest.raises(OSError, match="boom"):
+        backend.put_file(storage.HashedFile(Stream(), "ab" * 32, 1))
+
+    assert [path for path in tmp_path.rglob("*") if path.is_file()] == []
+
+
+def test_add_content_rollback(session, local_storage):
+    key = storage.add_content(session, storage.HashedFile.from_bytes(b"rollback"))
+
+    assert local_storage.exists(key)
+
+    session.rollback()
+
+    assert session.get(models.DocumentContent, key).refcount == 0
+
+    storage.delete_unreferenced_contents(session)
+    session.expire_all()
+
+    assert session.get(models.DocumentContent, key) is None
+    assert not local_storage.exists(key)
+
+
+@pytest.mark.parametrize("stored", [True, False])
+def test_iter_document(monkeypatch, session, accepted_application, stored):
+    content = bytes(range(256)) * 10
+    if stored:
+        document = util.create_or_update_borrower_document(
+            session,
+            "incorporation.pdf",
+            accepted_application,
+            models.BorrowerDocumentType.INCORPORATION_DOCUMENT,
+            storage.HashedFile.from_bytes(content),
+        )
+    else:
+        document = models.BorrowerDocument.create(
+            session,
+            application=accepted_application,
+            type=models.BorrowerDocumentType.INCORPORATION_DOCUMENT,
+            name="incorporation.pdf",
+            file=content,
+        )
+    session.commit()
+
+    monkeypatch.setattr(storage, "CHUNK_SIZE", 1000)
+
+    assert [len(chunk) for chunk in storage.iter_document(document)] == [1000, 1000, 560]
+    assert b"".join(storage.iter_document(document)) == content
+    assert b"".join(storage.iter_document(document, 100, 2100)) == content[100:2100]
+    assert b"".join(storage.iter_document(document, 2000, 9999)) == content[2000:]